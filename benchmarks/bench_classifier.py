@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from layout_autofix.classifier import LayoutClassifier
+from layout_autofix.detector import switch_layout
+
+# Held out from scripts/ngram_corpus: the model never saw these phrases.
+EN_SAMPLES = [
+    "see you tomorrow",
+    "where is the nearest station",
+    "please restart the service",
+    "happy birthday",
+    "the invoice is attached",
+    "what do you think about it",
+    "keyboard shortcut",
+    "download failed",
+    "let me check",
+    "interesting idea",
+    "summer vacation",
+    "deploy to production",
+    "good night",
+    "running late",
+    "new message",
+    "password reset",
+]
+RU_SAMPLES = [
+    "увидимся завтра",
+    "где ближайшая станция",
+    "перезапусти сервис пожалуйста",
+    "с днём рождения",
+    "счёт во вложении",
+    "что ты об этом думаешь",
+    "сочетание клавиш",
+    "загрузка не удалась",
+    "сейчас проверю",
+    "интересная идея",
+    "летний отпуск",
+    "выкатить в прод",
+    "спокойной ночи",
+    "опаздываю",
+    "новое сообщение",
+    "сброс пароля",
+]
+
+
+def labelled_cases() -> list[tuple[str, str, bool]]:
+    # (selection, target layout, selection is already correct)
+    cases: list[tuple[str, str, bool]] = []
+    for text in EN_SAMPLES:
+        cases.append((text, "RUS", True))
+        cases.append((switch_layout(text, to_layout="RUS"), "EN", False))
+    for text in RU_SAMPLES:
+        cases.append((text, "EN", True))
+        cases.append((switch_layout(text, to_layout="EN"), "RUS", False))
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Accuracy and throughput of the auto-direction classifier.")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    classifier = LayoutClassifier.load()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    cases = [(text, switch_layout(text, to_layout=target), correct) for text, target, correct in labelled_cases()]
+    errors = [
+        text
+        for text, converted, correct in cases
+        if (classifier.confidence_already_correct(text, converted) >= args.threshold) != correct
+    ]
+
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        for text, converted, _correct in cases:
+            classifier.confidence_already_correct(text, converted)
+    scored = args.repeats * len(cases)
+    per_call_us = (time.perf_counter() - started) / scored * 1_000_000
+
+    print(
+        json.dumps(
+            {
+                "load_ms": load_ms,
+                "cases": len(cases),
+                "accuracy": 1 - len(errors) / len(cases),
+                "errors": errors,
+                "score_us_per_selection": per_call_us,
+            },
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from layout_autofix.clipboard import ClipboardBackend, InMemoryClipboard, SubprocessClipboard
+
+
+def conversion_round_trip(clipboard: ClipboardBackend, payload: str, polls: int) -> None:
+    # Mirrors the clipboard traffic of one clipboard-path conversion: save, copy
+    # detection (change counter, or marker write plus content polling), paste and restore.
+    previous = clipboard.snapshot()
+    change_count = clipboard.change_count()
+    if change_count is None:
+        clipboard.write_text("__marker__")
+        for _ in range(polls):
+            clipboard.read_text()
+    else:
+        for _ in range(polls):
+            clipboard.change_count()
+        clipboard.read_text()
+    clipboard.write_text(payload)
+    if previous is not None:
+        clipboard.restore(previous)
+
+
+def measure(clipboard: ClipboardBackend, payload: str, polls: int, repeats: int) -> dict[str, float]:
+    durations_ms: list[float] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        conversion_round_trip(clipboard, payload, polls)
+        durations_ms.append((time.perf_counter() - started) * 1000)
+    durations_ms.sort()
+    return {
+        "repeats": repeats,
+        "median_ms": durations_ms[len(durations_ms) // 2],
+        "min_ms": durations_ms[0],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Clipboard cost of one conversion: in-process backend vs forking a process per access. "
+            "Off macOS the subprocess backend runs 'cat' as a stand-in for pbcopy/pbpaste."
+        )
+    )
+    parser.add_argument("--payload-bytes", type=int, default=1_000_000)
+    parser.add_argument("--polls", type=int, default=6)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = "x" * args.payload_bytes
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Path(tmp) / "clipboard.txt"
+        store.write_text("", encoding="utf-8")
+        subprocess_clipboard = SubprocessClipboard(
+            read_command=("cat", str(store)),
+            write_command=("sh", "-c", f"cat > '{store}'"),
+        )
+        results = {
+            "in_memory": measure(InMemoryClipboard(), payload, args.polls, args.repeats),
+            "subprocess": measure(subprocess_clipboard, payload, args.polls, args.repeats),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
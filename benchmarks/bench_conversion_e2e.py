@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import os
+
+# The simulated desktop never sends real keystrokes; pynput's dummy backend keeps
+# the import working on a headless Linux box.
+os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+
+import argparse  # noqa: E402
+import contextlib  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import subprocess  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Iterator  # noqa: E402
+
+from layout_autofix.app import AutoLayoutFixer  # noqa: E402
+from layout_autofix.detector import switch_layout  # noqa: E402
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer  # noqa: E402
+
+WORDS = {
+    "RUS": ("привет", "клавиатура", "раскладка", "сегодня хорошая погода"),
+    "EN": ("hello", "keyboard", "layout", "the weather is nice today"),
+}
+
+
+class SpawnCounter:
+    def __init__(self) -> None:
+        self.processes = 0
+        self.threads = 0
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator[SpawnCounter]:
+        counter = self
+        original_popen = subprocess.Popen
+        original_start = threading.Thread.start
+
+        class CountingPopen(original_popen):  # type: ignore[misc, valid-type]
+            def __init__(self, *args: object, **kwargs: object) -> None:
+                counter.processes += 1
+                super().__init__(*args, **kwargs)
+
+        def counting_start(thread: threading.Thread) -> None:
+            counter.threads += 1
+            original_start(thread)
+
+        subprocess.Popen = CountingPopen  # type: ignore[misc]
+        threading.Thread.start = counting_start  # type: ignore[method-assign]
+        try:
+            yield self
+        finally:
+            subprocess.Popen = original_popen  # type: ignore[misc]
+            threading.Thread.start = original_start  # type: ignore[method-assign]
+
+
+class ErrorCounter(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(level=logging.ERROR)
+        self.errors = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.errors += 1
+
+
+class OverlapTrackingFixer(SimulatedLayoutFixer):
+    def __init__(self, desktop: SimulatedDesktop, **kwargs: object) -> None:
+        super().__init__(desktop, **kwargs)
+        self.started = 0
+        self.active = 0
+        self.max_active = 0
+        self._overlap_lock = threading.Lock()
+
+    def _convert_selected_text_after_switch(self, target_layout: str, source_layout: str | None = None) -> None:
+        with self._overlap_lock:
+            self.started += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            super()._convert_selected_text_after_switch(target_layout, source_layout)
+        finally:
+            with self._overlap_lock:
+                self.active -= 1
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def mistyped(word: str, intended_layout: str) -> tuple[str, str]:
+    # The text a user gets when typing ``word`` with the other layout active.
+    typed_layout = "EN" if intended_layout == "RUS" else "RUS"
+    return switch_layout(word, to_layout=typed_layout, from_layout=intended_layout), typed_layout
+
+
+def wait_until(predicate: object, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():  # type: ignore[operator]
+            return True
+        time.sleep(0.0005)
+    return bool(predicate())  # type: ignore[operator]
+
+
+def replacement_landed(desktop: SimulatedDesktop) -> bool:
+    desktop.settle()
+    return desktop.replaced_at is not None
+
+
+def fixer_options(args: argparse.Namespace) -> dict[str, float]:
+    return {
+        "layout_poll_interval_seconds": args.poll_interval_ms / 1000,
+        "settle_delay_seconds": args.settle_ms / 1000,
+        "layout_switch_settle_delay_seconds": args.switch_settle_ms / 1000,
+        "selection_copy_wait_timeout_seconds": args.copy_timeout_ms / 1000,
+        "selection_copy_poll_interval_seconds": args.copy_poll_ms / 1000,
+        "paste_restore_delay_seconds": args.paste_restore_ms / 1000,
+    }
+
+
+def make_desktop(args: argparse.Namespace) -> SimulatedDesktop:
+    return SimulatedDesktop(
+        clipboard_text="user clipboard",
+        ax_read_supported=args.path == "ax",
+        ax_write_supported=args.path == "ax",
+        ax_latency_seconds=args.ax_latency_ms / 1000,
+        copy_latency_seconds=args.copy_latency_ms / 1000,
+        paste_latency_seconds=args.paste_latency_ms / 1000,
+    )
+
+
+def run_latency(args: argparse.Namespace) -> dict[str, object]:
+    desktop = make_desktop(args)
+    fixer = SimulatedLayoutFixer(desktop, initial_layout="EN", **fixer_options(args))
+    source = fixer.layout_source
+    baseline_threads = set(threading.enumerate())
+    latencies_ms: list[float] = []
+    failures = 0
+
+    with SpawnCounter().installed() as spawns:
+        runner = threading.Thread(target=fixer.run_forever, name="bench-watcher", daemon=True)
+        runner.start()
+        spawns_before = (spawns.processes, spawns.threads)
+        for index in range(args.conversions):
+            intended_layout = "RUS" if index % 2 == 0 else "EN"
+            words = WORDS[intended_layout]
+            word = words[index // 2 % len(words)]
+            typed, typed_layout = mistyped(word, intended_layout)
+            if source.current_layout() != typed_layout:
+                source.set_layout(typed_layout)
+                time.sleep(args.poll_interval_ms / 1000 * 2)
+            desktop.select(typed, prefix="> ")
+
+            started = time.monotonic()
+            source.set_layout(intended_layout)
+            replaced = wait_until(lambda: replacement_landed(desktop), args.timeout_s)
+            wait_until(lambda: not fixer._conversion_active.is_set(), args.timeout_s)
+            if not replaced or desktop.text != "> " + word:
+                failures += 1
+                continue
+            latencies_ms.append((desktop.replaced_at - started) * 1000)
+        spawns_after = (spawns.processes, spawns.threads)
+        fixer.stop()
+        runner.join(args.timeout_s)
+
+    time.sleep(args.leak_grace_ms / 1000)
+    leaked = [thread.name for thread in set(threading.enumerate()) - baseline_threads if thread.is_alive()]
+    latencies_ms.sort()
+    conversions = max(1, args.conversions)
+    return {
+        "conversions": args.conversions,
+        "failed_conversions": failures,
+        "latency_ms": {
+            "p50": percentile(latencies_ms, 0.50),
+            "p95": percentile(latencies_ms, 0.95),
+            "p99": percentile(latencies_ms, 0.99),
+            "max": latencies_ms[-1] if latencies_ms else float("nan"),
+            "mean": sum(latencies_ms) / len(latencies_ms) if latencies_ms else float("nan"),
+        },
+        "processes_per_conversion": (spawns_after[0] - spawns_before[0]) / conversions,
+        "threads_per_conversion": (spawns_after[1] - spawns_before[1]) / conversions,
+        "leaked_threads": sorted(leaked),
+        "clipboard_restored": desktop.read_clipboard() == "user clipboard",
+        "pipeline": fixer.metrics_snapshot(),
+    }
+
+
+def run_stress(args: argparse.Namespace) -> dict[str, object]:
+    # Bursts of switches arrive from several threads at once, the way a stream of
+    # input-source notifications can land while a conversion is still running.
+    # The selection stays put, so the text must end up in the last layout switched to.
+    desktop = make_desktop(args)
+    options = fixer_options(args)
+    options["layout_switch_settle_delay_seconds"] = args.stress_settle_ms / 1000
+    options["paste_restore_delay_seconds"] = min(options["paste_restore_delay_seconds"], args.stress_settle_ms / 1000)
+    fixer = OverlapTrackingFixer(desktop, **options)
+    baseline_threads = set(threading.enumerate())
+    errors = ErrorCounter()
+    app_logger = logging.getLogger("layout_autofix.app")
+    app_logger.addHandler(errors)
+    word = WORDS["RUS"][0]
+    typed, typed_layout = mistyped(word, "RUS")
+    desktop.select(typed)
+    expected = {"RUS": word, typed_layout: typed}
+    current_layout = [typed_layout]
+    switch_lock = threading.Lock()
+    barrier = threading.Barrier(args.stress_threads)
+
+    def switcher(worker: int) -> None:
+        barrier.wait()
+        for _index in range(args.stress_switches // args.stress_threads):
+            with switch_lock:
+                source_layout = current_layout[0]
+                target_layout = "EN" if source_layout == "RUS" else "RUS"
+                current_layout[0] = target_layout
+                fixer._schedule_selection_conversion(target_layout, source_layout=source_layout)
+
+    started = time.perf_counter()
+    with SpawnCounter().installed() as spawns:
+        workers = [
+            threading.Thread(target=switcher, args=(worker,), name=f"bench-switcher-{worker}")
+            for worker in range(args.stress_threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        drained = wait_until(lambda: fixer.active == 0 and not fixer._conversion_active.is_set(), args.timeout_s)
+    elapsed = time.perf_counter() - started
+    fixer.stop()
+    app_logger.removeHandler(errors)
+
+    time.sleep(args.leak_grace_ms / 1000)
+    leaked = [thread.name for thread in set(threading.enumerate()) - baseline_threads if thread.is_alive()]
+    desktop.settle()
+    switches = args.stress_switches // args.stress_threads * args.stress_threads
+    counters = fixer.metrics.snapshot()["counters"]
+    return {
+        "switches": switches,
+        "threads": args.stress_threads,
+        "elapsed_s": elapsed,
+        "conversions_started": fixer.started,
+        "switches_dropped": switches - fixer.started,
+        "switches_coalesced": counters.get("coalesced", 0),
+        "conversions_cancelled": counters.get("cancelled", 0),
+        "max_concurrent_conversions": fixer.max_active,
+        "processes_started": spawns.processes,
+        "threads_started": spawns.threads - args.stress_threads,
+        "errors_logged": errors.errors,
+        "drained": drained,
+        # The last switch must win: a dropped final switch leaves the wrong text on screen.
+        "final_switch_applied": desktop.text == expected[current_layout[0]],
+        "leaked_threads": sorted(leaked),
+    }
+
+
+def main() -> None:
+    defaults = AutoLayoutFixer
+    parser = argparse.ArgumentParser(
+        description=(
+            "Drive AutoLayoutFixer through scripted layout changes against a simulated desktop "
+            "(clipboard, accessibility and keystrokes with configurable latencies)."
+        )
+    )
+    parser.add_argument("--conversions", type=int, default=100)
+    parser.add_argument("--path", choices=("ax", "clipboard"), default="clipboard")
+    parser.add_argument("--ax-latency-ms", type=float, default=2.0)
+    parser.add_argument("--copy-latency-ms", type=float, default=15.0)
+    parser.add_argument("--paste-latency-ms", type=float, default=30.0)
+    parser.add_argument("--poll-interval-ms", type=float, default=defaults.layout_poll_interval_seconds * 1000)
+    parser.add_argument("--settle-ms", type=float, default=defaults.settle_delay_seconds * 1000)
+    parser.add_argument(
+        "--switch-settle-ms", type=float, default=defaults.layout_switch_settle_delay_seconds * 1000
+    )
+    parser.add_argument(
+        "--copy-timeout-ms", type=float, default=defaults.selection_copy_wait_timeout_seconds * 1000
+    )
+    parser.add_argument(
+        "--copy-poll-ms", type=float, default=defaults.selection_copy_poll_interval_seconds * 1000
+    )
+    parser.add_argument("--paste-restore-ms", type=float, default=defaults.paste_restore_delay_seconds * 1000)
+    parser.add_argument("--stress-switches", type=int, default=2000)
+    parser.add_argument("--stress-threads", type=int, default=8)
+    parser.add_argument("--stress-settle-ms", type=float, default=1.0)
+    parser.add_argument("--leak-grace-ms", type=float, default=200.0)
+    parser.add_argument("--timeout-s", type=float, default=5.0)
+    parser.add_argument("--output", type=Path, help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "latency": run_latency(args),
+        "stress": run_stress(args),
+    }
+    payload = json.dumps(results, indent=2)
+    if args.output is not None:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+    print(payload)
+
+
+if __name__ == "__main__":
+    main()
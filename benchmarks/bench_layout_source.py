@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from layout_autofix.app import AutoLayoutFixer
+from layout_autofix.layout_source import InMemoryLayoutSource
+
+
+class DetectionProbeFixer(AutoLayoutFixer):
+    def __init__(self, source: InMemoryLayoutSource, poll_interval: float) -> None:
+        super().__init__(layout_poll_interval_seconds=poll_interval, layout_source=source)
+        self.started = threading.Event()
+        self.detected = threading.Event()
+        self.detected_at = 0.0
+
+    def _check_ax_permission(self, *, prompt: bool) -> bool:
+        self.started.set()
+        return True
+
+    def _schedule_selection_conversion(self, target_layout: str, source_layout: str | None = None) -> None:
+        self.detected_at = time.perf_counter()
+        self.detected.set()
+
+
+def measure(*, push_notifications: bool, poll_interval: float, switches: int) -> dict[str, float]:
+    source = InMemoryLayoutSource(layout="EN", push_notifications=push_notifications)
+    fixer = DetectionProbeFixer(source, poll_interval)
+    watcher = threading.Thread(target=fixer.run_forever, daemon=True)
+    watcher.start()
+    fixer.started.wait()
+
+    latencies_ms: list[float] = []
+    layout = "EN"
+    for _ in range(switches):
+        layout = "RUS" if layout == "EN" else "EN"
+        fixer.detected.clear()
+        switched_at = time.perf_counter()
+        source.set_layout(layout)
+        fixer.detected.wait()
+        latencies_ms.append((fixer.detected_at - switched_at) * 1000)
+
+    fixer.stop()
+    watcher.join()
+    latencies_ms.sort()
+    return {
+        "switches": switches,
+        "p50_ms": statistics.median(latencies_ms),
+        "p95_ms": latencies_ms[int(len(latencies_ms) * 0.95) - 1],
+        "max_ms": latencies_ms[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Layout-change detection latency: pushed notifications vs interval polling."
+    )
+    parser.add_argument("--switches", type=int, default=50)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = {
+        "notification": measure(push_notifications=True, poll_interval=args.poll_interval, switches=args.switches),
+        "poll": measure(push_notifications=False, poll_interval=args.poll_interval, switches=args.switches),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
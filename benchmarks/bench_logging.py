@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+
+# The simulated desktop never sends real keystrokes; pynput's dummy backend keeps
+# the import working on a headless Linux box.
+os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from logging.handlers import RotatingFileHandler  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+from layout_autofix.logging_setup import configure_logging, dropped_log_records, stop_logging  # noqa: E402
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer  # noqa: E402
+
+
+class CountingHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records += 1
+
+
+def make_fixer(args: argparse.Namespace, trace_level: str) -> tuple[SimulatedLayoutFixer, SimulatedDesktop]:
+    # Clipboard path with no delays: what is left is the pipeline itself and its logging.
+    clipboard_text = "x" * args.clipboard_chars if args.clipboard_chars else "user clipboard"
+    desktop = SimulatedDesktop(clipboard_text=clipboard_text, ax_read_supported=False, ax_write_supported=False)
+    fixer = SimulatedLayoutFixer(
+        desktop,
+        settle_delay_seconds=0,
+        layout_switch_settle_delay_seconds=0,
+        selection_copy_wait_timeout_seconds=1.0,
+        selection_copy_poll_interval_seconds=0,
+        paste_restore_delay_seconds=0,
+        auto_direction_confidence_threshold=2.0,
+        trace_level=trace_level,
+    )
+    return fixer, desktop
+
+
+def measure(args: argparse.Namespace, trace_level: str) -> dict[str, float]:
+    fixer, desktop = make_fixer(args, trace_level)
+    durations_us: list[float] = []
+    for _ in range(args.conversions):
+        # Real conversions are at least a layout switch apart; the gap is not timed.
+        time.sleep(args.interval_ms / 1000)
+        desktop.select("ghbdtn")
+        started = time.perf_counter()
+        fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+        durations_us.append((time.perf_counter() - started) * 1e6)
+    durations_us.sort()
+    return {
+        "mean_us": sum(durations_us) / len(durations_us),
+        "p50_us": durations_us[len(durations_us) // 2],
+        "p99_us": durations_us[min(len(durations_us) - 1, int(len(durations_us) * 0.99))],
+        "max_us": durations_us[-1],
+    }
+
+
+def run_disabled(args: argparse.Namespace) -> dict[str, float]:
+    logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()], force=True)
+    return measure(args, "off")
+
+
+def run_synchronous(args: argparse.Namespace, log_file: Path) -> dict[str, float]:
+    # The previous setup: the rotating file handler runs on the conversion thread.
+    handler = RotatingFileHandler(log_file, maxBytes=args.max_bytes, backupCount=5, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    counter = CountingHandler()
+    logging.basicConfig(level=logging.DEBUG, handlers=[handler, counter], force=True)
+    try:
+        result = measure(args, "payload")
+    finally:
+        handler.close()
+    result["records_per_conversion"] = counter.records / args.conversions
+    return result
+
+
+def run_queued(args: argparse.Namespace, log_file: Path, trace_level: str) -> dict[str, float]:
+    configure_logging(
+        log_level="INFO",
+        log_file=str(log_file),
+        debug_events=True,
+        enable_console=False,
+        queue_size=args.queue_size,
+        trace_rate_limit=args.trace_rate_limit,
+    )
+    try:
+        result = measure(args, trace_level)
+        drain_started = time.perf_counter()
+    finally:
+        stop_logging()
+    result["drain_ms"] = (time.perf_counter() - drain_started) * 1000
+    result["dropped_records"] = dropped_log_records()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Per-conversion cost of debug event logging: records written by a rotating file "
+            "handler on the conversion thread vs handed to the queued background writer, "
+            "at the payload and stages trace levels."
+        )
+    )
+    parser.add_argument("--conversions", type=int, default=2000)
+    parser.add_argument("--interval-ms", type=float, default=2.0, help="pause between conversions")
+    parser.add_argument("--max-bytes", type=int, default=2_000_000, help="rollover size of the synchronous handler")
+    parser.add_argument("--queue-size", type=int, default=10_000)
+    parser.add_argument("--trace-rate-limit", type=float, default=0, help="per call site; 0 disables")
+    parser.add_argument(
+        "--clipboard-chars",
+        type=int,
+        default=0,
+        help="size of the user's clipboard contents; 0 keeps a short string",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "disabled": run_disabled(args),
+            "synchronous": run_synchronous(args, Path(tmp) / "sync.log"),
+            "queued": run_queued(args, Path(tmp) / "queued.log", "payload"),
+            "queued_stages": run_queued(args, Path(tmp) / "stages.log", "stages"),
+        }
+    logging.basicConfig(handlers=[logging.NullHandler()], force=True)
+    baseline = results["disabled"]["mean_us"]
+    for mode in ("synchronous", "queued", "queued_stages"):
+        results[mode]["overhead_mean_us"] = results[mode]["mean_us"] - baseline
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
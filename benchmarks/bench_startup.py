@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import os
+
+# Child processes inherit this: on a headless Linux box pynput needs its dummy backend.
+os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import statistics  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+
+# Frameworks worth watching even though they are not part of the package.
+HEAVY_MODULES = ("asyncio", "pynput", "objc", "Foundation", "AppKit", "Quartz", "HIServices")
+
+
+def import_times(module: str) -> dict[str, int]:
+    # Cumulative microseconds per module from ``python -X importtime``.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if name.startswith("layout_autofix") or name in HEAVY_MODULES:
+            try:
+                times[name] = int(cumulative)
+            except ValueError:
+                continue
+    return times
+
+
+def median_import_times(module: str, runs: int) -> dict[str, float]:
+    samples = [import_times(module) for _ in range(runs)]
+    names = {name for sample in samples for name in sample}
+    medians = {name: statistics.median(sample.get(name, 0) for sample in samples) / 1000 for name in names}
+    return dict(sorted(medians.items(), key=lambda item: item[1], reverse=True))
+
+
+def help_ms(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", module, "--help"], capture_output=True, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def time_to_log_event(command: list[str], log_file: Path, event: str, timeout: float) -> float | None:
+    # Wall time from spawning the process until ``event`` shows up in its log file.
+    log_file.unlink(missing_ok=True)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [*command, "--log-file", str(log_file)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if log_file.exists() and f"event={event}" in log_file.read_text(encoding="utf-8", errors="replace"):
+                return (time.perf_counter() - started) * 1000
+            if process.poll() is not None:
+                return None
+            time.sleep(0.002)
+        return None
+    finally:
+        process.terminate()
+        process.wait(5)
+
+
+def median_ms(samples: list[float | None]) -> float | None:
+    measured = [sample for sample in samples if sample is not None]
+    return statistics.median(measured) if measured else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Cold-start cost: import time per module, --help, time to the watcher's first "
+            "layout poll and, on macOS, time to the status bar item."
+        )
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-poll-budget-ms", type=float, default=400.0)
+    parser.add_argument("--status-item-budget-ms", type=float, default=600.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="per launch, seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = Path(tmp) / "startup.log"
+        first_poll = median_ms(
+            [
+                time_to_log_event([sys.executable, "-m", "layout_autofix"], log_file, "watcher_started", args.timeout)
+                for _ in range(args.runs)
+            ]
+        )
+        status_item = None
+        if sys.platform == "darwin":
+            status_item = median_ms(
+                [
+                    time_to_log_event(
+                        [sys.executable, "-m", "layout_autofix.macos_app"],
+                        log_file,
+                        "status_item_ready",
+                        args.timeout,
+                    )
+                    for _ in range(args.runs)
+                ]
+            )
+
+    results = {
+        "import_ms": median_import_times("layout_autofix.__main__", args.runs),
+        "help_ms": statistics.median(help_ms("layout_autofix") for _ in range(args.runs)),
+        "first_poll_ms": first_poll,
+        "first_poll_budget_ms": args.first_poll_budget_ms,
+        "status_item_ms": status_item,
+        "status_item_budget_ms": args.status_item_budget_ms,
+    }
+    results["within_budget"] = (first_poll is not None and first_poll <= args.first_poll_budget_ms) and (
+        sys.platform != "darwin" or (status_item is not None and status_item <= args.status_item_budget_ms)
+    )
+    print(json.dumps(results, indent=2))
+    if not results["within_budget"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
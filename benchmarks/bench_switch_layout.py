@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from layout_autofix.detector import EN_TO_RU, RU_TO_EN, switch_layout
+
+SIZES = {"1KB": 1_000, "1MB": 1_000_000, "50MB": 50_000_000}
+SAMPLE = "Ghbdtn, rfr ltkf? Ddtlbnt ntrcn d ytghfdbkmyjq hfcrkflrt. 1234 {}[] "
+
+
+def switch_layout_per_char(word: str, to_layout: str) -> str:
+    mapping = EN_TO_RU if to_layout == "RUS" else RU_TO_EN
+    converted: list[str] = []
+    for ch in word:
+        base = mapping.get(ch.lower())
+        if base is None:
+            converted.append(ch)
+            continue
+        converted.append(base.upper() if ch.isupper() else base)
+    return "".join(converted)
+
+
+def throughput(convert, text: str, repeats: int) -> dict[str, float]:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        convert(text, "RUS")
+        best = min(best, time.perf_counter() - started)
+    return {"seconds": best, "mb_per_second": len(text) / best / 1_000_000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="switch_layout throughput: translate tables vs per-char loop.")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--legacy-max-chars",
+        type=int,
+        default=1_000_000,
+        help="Skip the slow per-char loop above this input size.",
+    )
+    args = parser.parse_args()
+
+    results: dict[str, dict[str, object]] = {}
+    for name in args.sizes:
+        size = SIZES[name]
+        text = (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+        entry: dict[str, object] = {"translate": throughput(switch_layout, text, args.repeats)}
+        if size <= args.legacy_max_chars:
+            entry["per_char_loop"] = throughput(switch_layout_per_char, text, args.repeats)
+        results[name] = entry
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+
+from layout_autofix.detector import switch_layout, switch_layout_batch
+from layout_autofix.lazy_imports import optional_module
+
+QUERIES = (
+    "ghbdtn",
+    "rfr ltkf",
+    "re\\bnm lbdfy",
+    "Ntktajy Samsung",
+    "gjujlf vjcrdf",
+    "hello world",
+    "iPhone 15 ,e",
+    "cnjkbrb b cnekmz",
+)
+
+
+def make_queries(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [rng.choice(QUERIES)[: rng.randint(3, 16)] for _ in range(count)]
+
+
+def best_seconds(convert, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        convert()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(seconds: float, count: int, baseline: float | None = None) -> dict[str, float]:
+    result = {"seconds": seconds, "strings_per_second": count / seconds}
+    if baseline is not None:
+        result["speedup"] = baseline / seconds
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="switch_layout_batch vs a per-string switch_layout loop over many short queries."
+    )
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    queries = make_queries(args.count, args.seed)
+    expected = [switch_layout(query, "RUS") for query in queries]
+    assert switch_layout_batch(queries, "RUS") == expected
+
+    loop = best_seconds(lambda: [switch_layout(query, "RUS") for query in queries], args.repeats)
+    results: dict[str, object] = {
+        "count": args.count,
+        "per_string_loop": report(loop, args.count),
+        "batch_python": report(
+            best_seconds(lambda: switch_layout_batch(queries, "RUS"), args.repeats), args.count, loop
+        ),
+    }
+    numpy = optional_module("numpy")
+    if numpy is None:
+        results["batch_numpy_array"] = results["batch_numpy_list"] = None
+    else:
+        array = numpy.asarray(queries)
+        assert switch_layout_batch(array, "RUS").tolist() == expected
+        results["batch_numpy_array"] = report(
+            best_seconds(lambda: switch_layout_batch(array, "RUS"), args.repeats), args.count, loop
+        )
+        results["batch_numpy_list"] = report(
+            best_seconds(lambda: switch_layout_batch(queries, "RUS", backend="numpy"), args.repeats), args.count, loop
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Protocol
+
+from layout_autofix.lazy_imports import optional_module
+
+
+# AXError values, so fakes and callers do not need HIServices to speak them.
+AX_ERROR_SUCCESS = 0
+AX_ERROR_CANNOT_COMPLETE = -25204
+AX_ERROR_ATTRIBUTE_UNSUPPORTED = -25205
+AX_ERROR_API_DISABLED = -25211
+AX_ERROR_NO_VALUE = -25212
+
+_logger = logging.getLogger(__name__)
+
+
+class AccessibilityBackend(Protocol):
+    def is_trusted(self) -> bool: ...
+
+    def prompt_for_trust(self) -> None: ...
+
+    def focused_element(self) -> tuple[int, object | None]: ...
+
+    def selected_text(self, element: object) -> tuple[int, str | None]: ...
+
+    def set_selected_text(self, element: object, text: str) -> int: ...
+
+    # Selects ``length`` UTF-16 units ending at the caret (the end of the current selection).
+    def select_before_caret(self, element: object, length: int) -> int: ...
+
+    def same_element(self, first: object, second: object) -> bool: ...
+
+    def is_secure_text_field(self, element: object) -> bool: ...
+
+
+@dataclass
+class HIServicesAccessibility:
+    debug_event_logging: bool = False
+    _system: object | None = field(default=None, init=False)
+
+    def is_trusted(self) -> bool:
+        HIServices = optional_module("HIServices")
+        if HIServices is None:
+            return False
+        try:
+            return bool(HIServices.AXIsProcessTrusted())
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_trust_check_failed error=%r", exc)
+            return False
+
+    def prompt_for_trust(self) -> None:
+        HIServices = optional_module("HIServices")
+        if HIServices is None or not hasattr(HIServices, "AXIsProcessTrustedWithOptions"):
+            return
+        try:
+            HIServices.AXIsProcessTrustedWithOptions({HIServices.kAXTrustedCheckOptionPrompt: True})
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_prompt_failed error=%r", exc)
+
+    def focused_element(self) -> tuple[int, object | None]:
+        HIServices = optional_module("HIServices")
+        if HIServices is None:
+            return AX_ERROR_API_DISABLED, None
+        if self._system is None:
+            # The system-wide element is a constant handle; create it once.
+            self._system = HIServices.AXUIElementCreateSystemWide()
+        err, focused = HIServices.AXUIElementCopyAttributeValue(
+            self._system,
+            HIServices.kAXFocusedUIElementAttribute,
+            None,
+        )
+        return int(err), focused
+
+    def selected_text(self, element: object) -> tuple[int, str | None]:
+        HIServices = optional_module("HIServices")
+        err, selected = HIServices.AXUIElementCopyAttributeValue(
+            element,
+            HIServices.kAXSelectedTextAttribute,
+            None,
+        )
+        return int(err), None if selected is None else str(selected)
+
+    def set_selected_text(self, element: object, text: str) -> int:
+        HIServices = optional_module("HIServices")
+        return int(HIServices.AXUIElementSetAttributeValue(element, HIServices.kAXSelectedTextAttribute, text))
+
+    def select_before_caret(self, element: object, length: int) -> int:
+        HIServices = optional_module("HIServices")
+        err, value = HIServices.AXUIElementCopyAttributeValue(
+            element,
+            HIServices.kAXSelectedTextRangeAttribute,
+            None,
+        )
+        if err != AX_ERROR_SUCCESS or value is None:
+            return int(err) if err != AX_ERROR_SUCCESS else AX_ERROR_NO_VALUE
+        ok, selected = HIServices.AXValueGetValue(value, HIServices.kAXValueCFRangeType, None)
+        if not ok:
+            return AX_ERROR_CANNOT_COMPLETE
+        caret = selected.location + selected.length
+        if caret < length:
+            return AX_ERROR_CANNOT_COMPLETE
+        new_range = HIServices.AXValueCreate(HIServices.kAXValueCFRangeType, (caret - length, length))
+        return int(
+            HIServices.AXUIElementSetAttributeValue(element, HIServices.kAXSelectedTextRangeAttribute, new_range)
+        )
+
+    def same_element(self, first: object, second: object) -> bool:
+        # AXUIElementRef equality goes through CFEqual, which compares locally.
+        return first == second
+
+    def is_secure_text_field(self, element: object) -> bool:
+        HIServices = optional_module("HIServices")
+        err, subrole = HIServices.AXUIElementCopyAttributeValue(element, HIServices.kAXSubroleAttribute, None)
+        return err == AX_ERROR_SUCCESS and subrole == HIServices.kAXSecureTextFieldSubrole
+
+
+@dataclass
+class AccessibilityTrust:
+    backend: AccessibilityBackend
+    ttl_seconds: float = 5.0
+    clock: Callable[[], float] = time.monotonic
+    _trusted: bool | None = field(default=None, init=False)
+    _checked_at: float = field(default=0.0, init=False)
+
+    def is_trusted(self) -> bool:
+        now = self.clock()
+        if self._trusted is None or now - self._checked_at >= self.ttl_seconds:
+            self._trusted = self.backend.is_trusted()
+            self._checked_at = now
+        return self._trusted
+
+    def invalidate(self) -> None:
+        self._trusted = None
+
+
+@dataclass
+class AXSession:
+    # One conversion's view of the focused element: resolved once, shared by
+    # capture and replace, and re-checked before anything is written.
+    backend: AccessibilityBackend
+    debug_event_logging: bool = False
+    _focus: tuple[int, object | None] | None = field(default=None, init=False)
+    _selected_text_error: int | None = field(default=None, init=False)
+
+    @property
+    def focus_error(self) -> int | None:
+        return None if self._focus is None else self._focus[0]
+
+    def focused_element(self) -> object | None:
+        if self._focus is None:
+            try:
+                self._focus = self.backend.focused_element()
+            except Exception as exc:
+                if self.debug_event_logging:
+                    _logger.debug("event=ax_focused_element_exception error=%r", exc)
+                self._focus = (AX_ERROR_CANNOT_COMPLETE, None)
+            if self._focus[0] != AX_ERROR_SUCCESS or self._focus[1] is None:
+                if self.debug_event_logging:
+                    _logger.debug("event=ax_focused_element_failed error=%s", self._focus[0])
+        err, element = self._focus
+        return element if err == AX_ERROR_SUCCESS else None
+
+    def read_selected_text(self, *, keep_empty: bool = False) -> str | None:
+        # ``keep_empty`` tells an empty selection ("") apart from a failed read (None).
+        element = self.focused_element()
+        if element is None:
+            return None
+        try:
+            err, selected = self.backend.selected_text(element)
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_selected_text_exception error=%r", exc)
+            return None
+        self._selected_text_error = err
+        if err != AX_ERROR_SUCCESS:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_selected_text_failed error=%s", err)
+            return None
+        if keep_empty:
+            return selected or ""
+        return selected or None
+
+    def replace_selected_text(self, text: str) -> bool:
+        element = self.focused_element()
+        if element is None:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_replace_focus_failed error=%s", self.focus_error)
+            return False
+        if self._selected_text_error == AX_ERROR_ATTRIBUTE_UNSUPPORTED:
+            # An element without a readable selection will not accept a written one.
+            if self.debug_event_logging:
+                _logger.debug("event=ax_replace_skipped reason=attribute_unsupported")
+            return False
+        try:
+            err = self.backend.set_selected_text(element, text)
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_replace_exception error=%r", exc)
+            return False
+        if err != AX_ERROR_SUCCESS:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_replace_failed error=%s", err)
+            return False
+        return True
+
+    def select_before_caret(self, text: str) -> bool:
+        # Re-selects ``text`` right after it was written, without reading it back.
+        element = self.focused_element()
+        if element is None:
+            return False
+        try:
+            err = self.backend.select_before_caret(element, len(text.encode("utf-16-le")) // 2)
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_select_exception error=%r", exc)
+            return False
+        if err != AX_ERROR_SUCCESS:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_select_failed error=%s", err)
+            return False
+        return True
+
+    def focus_is_secure(self) -> bool:
+        element = self.focused_element()
+        if element is None:
+            return False
+        try:
+            return self.backend.is_secure_text_field(element)
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=ax_subrole_exception error=%r", exc)
+            return False
+
+    def focus_moved(self) -> bool:
+        # Only meaningful once a focused element was resolved; without one there
+        # is nothing to compare against.
+        element = None if self._focus is None else self.focused_element()
+        if element is None:
+            return False
+        try:
+            err, current = self.backend.focused_element()
+        except Exception:
+            return True
+        return err != AX_ERROR_SUCCESS or current is None or not self.backend.same_element(current, element)
+
+
+def create_accessibility_backend(*, debug_event_logging: bool = False) -> AccessibilityBackend:
+    from layout_autofix.x11 import X11PrimarySelection, x11_available
+
+    if x11_available():
+        return X11PrimarySelection(debug_event_logging=debug_event_logging)
+    return HIServicesAccessibility(debug_event_logging=debug_event_logging)
@@ -1,26 +1,93 @@
 from __future__ import annotations
 
 import logging
-import re
-import subprocess
+import sys
 import threading
 import time
+import unicodedata
 from dataclasses import dataclass, field
-from typing import Optional
-
-from pynput import keyboard
+from pathlib import Path
+from typing import Any, ClassVar
 
+from layout_autofix.accessibility import (
+    AX_ERROR_API_DISABLED,
+    AccessibilityBackend,
+    AccessibilityTrust,
+    AXSession,
+    create_accessibility_backend,
+)
+from layout_autofix.capability_cache import CapabilityCache
+from layout_autofix.classifier import LayoutClassifier, default_classifier
+from layout_autofix.clipboard import (
+    DEFAULT_SNAPSHOT_MAX_BYTES,
+    ClipboardBackend,
+    ClipboardSnapshot,
+    create_clipboard_backend,
+)
 from layout_autofix.detector import switch_layout
+from layout_autofix.flight_recorder import FlightRecorder
+from layout_autofix.frontmost import frontmost_application_id
+from layout_autofix.keystrokes import KeystrokeRecorder, TypedWord
+from layout_autofix.layout_source import LayoutSource, create_layout_source
+from layout_autofix.lazy_imports import optional_module
+from layout_autofix.logging_setup import dropped_log_records
+from layout_autofix.metrics import ConversionMetrics
+from layout_autofix.scheduler import Scheduler, SystemScheduler
+from layout_autofix.timing_profiles import TimingDelays, TimingProfileStore
+from layout_autofix.tracing import PREVIEW_LIMIT, TRACE_LEVELS, TextPreview
+
+
+ENGINE_KINDS = ("threaded", "asyncio")
+# Without accessibility a revert re-selects the text with Shift+Left, one keystroke per character.
+_REVERT_KEYSTROKE_LIMIT = 200
+# Copy and paste are Cmd+C/Cmd+V on macOS and Ctrl+C/Ctrl+V under X11.
+_SHORTCUT_MODIFIER = "cmd" if sys.platform == "darwin" else "ctrl"
+
+
+def _pynput_keyboard() -> Any:
+    # pynput loads Quartz and AppKit on macOS. The watcher thread pulls it in
+    # after the first poll, so neither --help nor the status item waits for it.
+    from pynput import keyboard
 
-try:  # pragma: no cover - optional runtime dependency
-    import Quartz
-except Exception:  # pragma: no cover
-    Quartz = None
+    return keyboard
 
-try:  # pragma: no cover - optional runtime dependency
-    import HIServices
-except Exception:  # pragma: no cover
-    HIServices = None
+
+class ConversionCancelled(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class LastConversion:
+    # What the most recent replacement wrote and where, so switching straight
+    # back can put the original back without capturing the selection again.
+    original: str
+    converted: str
+    target_layout: str
+    source_layout: str
+    focus: object | None
+    app: str | None
+    replaced_via: str | None
+    at: float
+
+    def reversed(self, at: float, replaced_via: str | None) -> LastConversion:
+        return LastConversion(
+            original=self.converted,
+            converted=self.original,
+            target_layout=self.source_layout,
+            source_layout=self.target_layout,
+            focus=self.focus,
+            app=self.app,
+            replaced_via=replaced_via,
+            at=at,
+        )
+
+
+def _keystroke_selectable(text: str) -> bool:
+    # One Shift+Left per character only holds for short text without line
+    # breaks that editors may count twice, astral characters or combining marks.
+    return len(text) <= _REVERT_KEYSTROKE_LIMIT and not any(
+        ch == "\r" or ord(ch) > 0xFFFF or unicodedata.combining(ch) for ch in text
+    )
 
 
 @dataclass
@@ -30,21 +97,97 @@ class AutoLayoutFixer:
     layout_switch_settle_delay_seconds: float = 0.12
     selection_copy_wait_timeout_seconds: float = 0.35
     selection_copy_poll_interval_seconds: float = 0.03
+    # Upper bound: the clipboard is restored as soon as the paste is seen to land.
     paste_restore_delay_seconds: float = 0.2
+    paste_poll_interval_seconds: float = 0.01
+    auto_direction_confidence_threshold: float = 0.9
+    # A switch back to the source layout within this window restores the original text; 0 disables.
+    revert_window_seconds: float = 2.0
+    # Clipboard contents above this are not kept for restoring; smaller types still are.
+    clipboard_snapshot_max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES
+    # Off: a selection that accessibility cannot read is left alone rather than
+    # copied with the copy shortcut, which a Linux terminal takes as Ctrl+C.
+    clipboard_capture: bool = True
     debug_event_logging: bool = False
-    _controller: keyboard.Controller = field(default_factory=keyboard.Controller, init=False)
+    # One of TRACE_LEVELS; unset means "payload" with debug_event_logging, else "off".
+    trace_level: str | None = None
+    layout_source: LayoutSource | None = None
+    clipboard: ClipboardBackend | None = None
+    classifier: LayoutClassifier | None = None
+    metrics: ConversionMetrics = field(default_factory=ConversionMetrics)
+    timing_profiles: TimingProfileStore | None = None
+    capabilities: CapabilityCache | None = None
+    accessibility: AccessibilityBackend | None = None
+    # Opt-in: with a recorder, a switch right after typing a word retypes that word.
+    keystroke_recorder: KeystrokeRecorder | None = None
+    flight_recorder: FlightRecorder = field(default_factory=FlightRecorder)
+    # Time source and sleeps of the threaded pipeline; a VirtualScheduler replays sessions in virtual time.
+    scheduler: Scheduler = field(default_factory=SystemScheduler)
+    engine: ClassVar[str] = "threaded"
+    _controller: Any = field(default=None, init=False)
     _conversion_active: threading.Event = field(default_factory=threading.Event, init=False)
     _stop_event: threading.Event = field(default_factory=threading.Event, init=False)
-    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+    _wakeup: threading.Condition = field(default_factory=threading.Condition, init=False)
+    _cancel_event: threading.Event = field(default_factory=threading.Event, init=False)
+    _pending_conversion: tuple[str, str | None] | None = field(default=None, init=False)
+    _worker: threading.Thread | None = field(default=None, init=False)
+    _replacement_sent: bool = field(default=False, init=False)
+    _replaced_via: str | None = field(default=None, init=False)
+    _last_conversion: LastConversion | None = field(default=None, init=False)
+    _saved_clipboard: ClipboardSnapshot | None = field(default=None, init=False)
+    _carried_clipboard: ClipboardSnapshot | None = field(default=None, init=False)
     _ax_warning_logged: bool = field(default=False, init=False)
+    _ax_trust: AccessibilityTrust | None = field(default=None, init=False)
+    _active_ax_session: AXSession | None = field(default=None, init=False)
+    _classifier_unavailable: bool = field(default=False, init=False)
+    _delays: TimingDelays | None = field(default=None, init=False)
+    _frontmost_app: str | None = field(default=None, init=False)
     _logger: logging.Logger = field(default_factory=lambda: logging.getLogger(__name__), init=False)
 
+    def __post_init__(self) -> None:
+        if self.trace_level is None:
+            self.trace_level = "payload" if self.debug_event_logging else "off"
+        if self.trace_level not in TRACE_LEVELS:
+            raise ValueError(f"trace_level must be one of {', '.join(TRACE_LEVELS)}")
+        self.debug_event_logging = self.trace_level != "off"
+        if self.layout_source is None:
+            self.layout_source = create_layout_source(debug_event_logging=self.debug_event_logging)
+        if self.clipboard is None:
+            self.clipboard = create_clipboard_backend(debug_event_logging=self.debug_event_logging)
+        if self.accessibility is None:
+            self.accessibility = create_accessibility_backend(debug_event_logging=self.debug_event_logging)
+        self._ax_trust = AccessibilityTrust(self.accessibility)
+        if self.metrics.flight_recorder is None:
+            self.metrics.flight_recorder = self.flight_recorder
+
     def run_forever(self) -> None:
+        self.layout_source.start()
         previous_layout = self._get_current_layout()
+        self._log_watcher_started(previous_layout)
+        self._check_ax_permission(prompt=True)
+        self._keyboard_controller()
+        self._start_keystroke_recorder()
+
+        try:
+            while not self._stop_event.is_set():
+                self.layout_source.wait_for_change(self.layout_poll_interval_seconds)
+                if self._stop_event.is_set():
+                    break
+                try:
+                    previous_layout = self._poll_layout_once(previous_layout)
+                except Exception:
+                    self._logger.exception("event=poll_iteration_exception")
+        finally:
+            self._shutdown_backends()
+
+        self._logger.info("event=watcher_stopped")
+
+    def _log_watcher_started(self, previous_layout: str | None) -> None:
         self._logger.info(
             "event=watcher_started initial_layout=%s poll_interval=%s settle_delay=%s "
             "layout_switch_settle_delay=%s selection_copy_wait_timeout=%s "
-            "selection_copy_poll_interval=%s paste_restore_delay=%s debug_events=%s",
+            "selection_copy_poll_interval=%s paste_restore_delay=%s paste_poll_interval=%s revert_window=%s "
+            "retype_last_word=%s clipboard_capture=%s trace_level=%s layout_source=%s clipboard=%s engine=%s",
             previous_layout,
             self.layout_poll_interval_seconds,
             self.settle_delay_seconds,
@@ -52,23 +195,49 @@ class AutoLayoutFixer:
             self.selection_copy_wait_timeout_seconds,
             self.selection_copy_poll_interval_seconds,
             self.paste_restore_delay_seconds,
-            self.debug_event_logging,
+            self.paste_poll_interval_seconds,
+            self.revert_window_seconds,
+            self.keystroke_recorder is not None,
+            self.clipboard_capture,
+            self.trace_level,
+            type(self.layout_source).__name__,
+            type(self.clipboard).__name__,
+            self.engine,
         )
-        self._check_ax_permission(prompt=True)
 
-        while not self._stop_event.is_set():
-            time.sleep(self.layout_poll_interval_seconds)
-            try:
-                previous_layout = self._poll_layout_once(previous_layout)
-            except Exception:
-                self._logger.exception("event=poll_iteration_exception")
+    def _start_keystroke_recorder(self) -> None:
+        if self.keystroke_recorder is not None:
+            self.keystroke_recorder.start()
 
-        self._logger.info("event=watcher_stopped")
+    def _shutdown_backends(self) -> None:
+        self.layout_source.stop()
+        if self.keystroke_recorder is not None:
+            self.keystroke_recorder.stop()
+        if self.timing_profiles is not None:
+            self.timing_profiles.save(force=True)
+        if self.capabilities is not None:
+            self.capabilities.save(force=True)
+        self.flight_recorder.close()
 
     def stop(self) -> None:
         self._stop_event.set()
+        with self._wakeup:
+            self._cancel_event.set()
+            self._wakeup.notify_all()
+        self.layout_source.stop()
         self._logger.info("event=watcher_stop_requested")
 
+    def dump_flight_recorder(self, reason: str = "manual") -> Path | None:
+        return self.flight_recorder.dump(reason)
+
+    def metrics_snapshot(self) -> dict[str, dict]:
+        snapshot = self.metrics.snapshot()
+        # Backends that fork (pbcopy/pbpaste, defaults read) count their own spawns.
+        spawns = getattr(self.clipboard, "spawns", 0) + getattr(self.layout_source, "spawns", 0)
+        snapshot["counters"]["subprocess_spawns"] = spawns
+        snapshot["counters"]["log_records_dropped"] = dropped_log_records()
+        return snapshot
+
     def _poll_layout_once(self, previous_layout: str | None) -> str | None:
         current_layout = self._get_current_layout()
         if current_layout is None:
@@ -80,195 +249,802 @@ class AutoLayoutFixer:
                 previous_layout,
                 current_layout,
             )
-            self._schedule_selection_conversion(current_layout)
+            self.flight_recorder.record("layout_changed", from_layout=previous_layout, to_layout=current_layout)
+            self._schedule_selection_conversion(current_layout, source_layout=previous_layout)
 
         return current_layout
 
-    def _schedule_selection_conversion(self, target_layout: str) -> None:
-        with self._lock:
+    def _schedule_selection_conversion(self, target_layout: str, source_layout: str | None = None) -> None:
+        with self._wakeup:
+            self._queue_conversion(target_layout, source_layout)
             if self._conversion_active.is_set():
-                if self.debug_event_logging:
-                    self._logger.debug(
-                        "event=selection_convert_skipped reason=already_active target_layout=%s",
-                        target_layout,
-                    )
-                return
+                # Latest wins: wake the running conversion out of its current sleep.
+                self._cancel_event.set()
             self._conversion_active.set()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._conversion_worker,
+                    name="layout-autofix-converter",
+                    daemon=True,
+                )
+                self._worker.start()
+            self._wakeup.notify()
             if self.debug_event_logging:
                 self._logger.debug("event=selection_convert_scheduled target_layout=%s", target_layout)
 
-        thread = threading.Thread(
-            target=self._convert_selected_text_after_switch,
-            args=(target_layout,),
-            daemon=True,
-        )
-        thread.start()
+    def _conversion_worker(self) -> None:
+        while True:
+            with self._wakeup:
+                while self._pending_conversion is None and not self._stop_event.is_set():
+                    self._wakeup.wait()
+                if self._stop_event.is_set():
+                    self._conversion_active.clear()
+                    return
+                target_layout, source_layout = self._pending_conversion
+                self._pending_conversion = None
+                self._cancel_event.clear()
+
+            self._convert_selected_text_after_switch(target_layout, source_layout)
+
+            with self._wakeup:
+                self._finish_conversion(source_layout)
+
+    def _queue_conversion(self, target_layout: str, source_layout: str | None) -> None:
+        if self._pending_conversion is not None:
+            # The earlier switch has not been applied yet: the text is still in its source layout.
+            source_layout = self._pending_conversion[1]
+            self.metrics.increment("coalesced")
+            if self.debug_event_logging:
+                self._logger.debug(
+                    "event=selection_convert_coalesced target_layout=%s source_layout=%s",
+                    target_layout,
+                    source_layout,
+                )
+        self._pending_conversion = (target_layout, source_layout)
+
+    def _finish_conversion(self, source_layout: str | None) -> None:
+        if self._pending_conversion is not None and not self._replacement_sent:
+            # Nothing was written, so the selection is still in the old source layout.
+            self._pending_conversion = (self._pending_conversion[0], source_layout)
+        if self._pending_conversion is None:
+            self._conversion_active.clear()
 
-    def _convert_selected_text_after_switch(self, target_layout: str) -> None:
-        previous_clipboard: str | None = None
+    def _sleep(self, seconds: float) -> None:
+        if self.scheduler.wait(self._cancel_event, seconds):
+            raise ConversionCancelled
+
+    def _convert_selected_text_after_switch(self, target_layout: str, source_layout: str | None = None) -> None:
+        previous_clipboard: ClipboardSnapshot | None = None
+        carried_clipboard, self._carried_clipboard = self._carried_clipboard, None
+        self._saved_clipboard = None
+        self._replacement_sent = False
+        self._replaced_via = None
+        cancelled = False
+        started = self.metrics.clock()
         try:
+            if not self._start_conversion(target_layout, source_layout):
+                return
+            delays = self._begin_app_context()
+            last_conversion, self._last_conversion = self._last_conversion, None
+            typed_word = self._typed_word()
+            if typed_word is not None:
+                self._retype_typed_word(typed_word, target_layout, source_layout, delays)
+                return
+            if self._can_revert(last_conversion, target_layout, source_layout):
+                if self._revert_conversion(last_conversion, delays):
+                    return
             if self.debug_event_logging:
                 self._logger.debug("event=selection_convert_started target_layout=%s", target_layout)
                 self._logger.debug(
                     "event=selection_convert_wait_before_capture seconds=%s",
-                    self.layout_switch_settle_delay_seconds,
+                    delays.layout_switch_settle_seconds,
                 )
-            time.sleep(self.layout_switch_settle_delay_seconds)
+            with self.metrics.time_stage("switch_settle"):
+                self._sleep(delays.layout_switch_settle_seconds)
             selected_text, previous_clipboard = self._capture_selected_text()
-            if not selected_text:
-                self._logger.info("event=no_selection")
+            if not self._selection_captured(selected_text, previous_clipboard):
                 return
-
-            if self.debug_event_logging:
-                self._logger.debug(
-                    "event=selection_captured text_len=%s text_preview=%r",
-                    len(selected_text),
-                    self._text_preview(selected_text),
-                )
-            converted = switch_layout(selected_text, to_layout=target_layout)
-            if converted == selected_text:
-                self._logger.info("event=selection_unchanged text=%r", selected_text)
+            converted = self._converted_text(selected_text, target_layout, source_layout)
+            if converted is None:
                 return
 
             replaced = self._replace_selected_text(converted)
-            self._logger.info(
-                "event=selection_converted target_layout=%s success=%s original=%r converted=%r",
-                target_layout,
-                replaced,
-                selected_text,
-                converted,
-            )
+            self._log_converted(selected_text, converted, target_layout, source_layout, replaced)
+            if replaced:
+                self._remember_conversion(selected_text, converted, target_layout, source_layout)
+        except ConversionCancelled:
+            cancelled = True
+            self._log_cancelled(target_layout)
         except Exception:
-            self._logger.exception("event=selection_convert_exception target_layout=%s", target_layout)
+            self._handle_conversion_exception(target_layout)
         finally:
+            previous_clipboard = self._clipboard_to_restore(previous_clipboard, carried_clipboard, cancelled)
             if previous_clipboard is not None:
-                self._write_clipboard(previous_clipboard)
-                if self.debug_event_logging:
-                    self._logger.debug(
-                        "event=clipboard_restored restored_len=%s restored_preview=%r",
-                        len(previous_clipboard),
-                        self._text_preview(previous_clipboard),
-                    )
-            self._conversion_active.clear()
+                self._restore_clipboard(previous_clipboard)
+            self._record_total(target_layout, started)
+            self._end_app_context()
+
+    def _start_conversion(self, target_layout: str, source_layout: str | None) -> bool:
+        if target_layout == source_layout:
+            # A quick toggle back to where the user started: nothing to convert.
+            self.metrics.increment("toggled_back")
+            self._logger.info("event=selection_convert_skipped reason=toggled_back target_layout=%s", target_layout)
+            return False
+        self.flight_recorder.record("convert_started", target_layout=target_layout, source_layout=source_layout)
+        return True
+
+    def _selection_captured(self, selected_text: str | None, previous_clipboard: ClipboardSnapshot | None) -> bool:
+        self._record_capture(selected_text, previous_clipboard)
+        if not selected_text:
+            self.metrics.increment("no_selection")
+            self._logger.info("event=no_selection")
+            return False
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=selection_captured text_len=%s text_preview=%r",
+                len(selected_text),
+                self._text_preview(selected_text),
+            )
+        return True
+
+    def _log_cancelled(self, target_layout: str) -> None:
+        self.metrics.increment("cancelled")
+        self._logger.info(
+            "event=selection_convert_cancelled target_layout=%s replacement_sent=%s",
+            target_layout,
+            self._replacement_sent,
+        )
+
+    def _converted_text(self, selected_text: str, target_layout: str, source_layout: str | None) -> str | None:
+        with self.metrics.time_stage("switch_layout"):
+            converted = switch_layout(selected_text, to_layout=target_layout, from_layout=source_layout)
+        if converted == selected_text:
+            self.metrics.increment("unchanged")
+            self._logger.info("event=selection_unchanged text=%r", selected_text)
+            return None
+
+        with self.metrics.time_stage("classify"):
+            confidence = self._already_correct_confidence(selected_text, converted, target_layout, source_layout)
+        if confidence is not None and confidence >= self.auto_direction_confidence_threshold:
+            self.metrics.increment("already_correct")
+            self._logger.info(
+                "event=selection_already_correct target_layout=%s confidence=%.3f text_len=%s",
+                target_layout,
+                confidence,
+                len(selected_text),
+            )
+            return None
+        return converted
+
+    def _typed_word(self) -> TypedWord | None:
+        return None if self.keystroke_recorder is None else self.keystroke_recorder.buffer.last_word()
+
+    def _retype_typed_word(
+        self,
+        typed_word: TypedWord,
+        target_layout: str,
+        source_layout: str | None,
+        delays: TimingDelays,
+    ) -> None:
+        converted = self._typed_word_conversion(typed_word, target_layout, source_layout)
+        if converted is None:
+            return
+        with self.metrics.time_stage("switch_settle"):
+            self._sleep(delays.layout_switch_settle_seconds)
+        retyped = self._send_retype(typed_word, converted)
+        self._log_retyped(typed_word, converted, target_layout, source_layout, retyped)
+
+    def _typed_word_conversion(
+        self,
+        typed_word: TypedWord,
+        target_layout: str,
+        source_layout: str | None,
+    ) -> str | None:
+        # A word still in the buffer cannot be selected: typing replaces a
+        # selection, and every way of making one empties the buffer. So there is
+        # nothing to capture, and the clipboard is never touched.
+        if self.keystroke_recorder.secure_input() or self._ax_session().focus_is_secure():
+            self.keystroke_recorder.buffer.clear()
+            self.metrics.increment("typed_word_secure")
+            self._logger.info("event=typed_word_skipped reason=secure_input")
+            return None
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=typed_word_captured text_len=%s text_preview=%r trailing_spaces=%s",
+                len(typed_word.word),
+                self._text_preview(typed_word.word),
+                len(typed_word.trailing),
+            )
+        return self._converted_text(typed_word.word, target_layout, source_layout)
+
+    def _send_retype(self, typed_word: TypedWord, converted: str) -> bool:
+        buffer = self.keystroke_recorder.buffer
+        if not buffer.unchanged_since(typed_word):
+            # Typed on during the settle: the backspaces would hit other characters.
+            return False
+        text = converted + typed_word.trailing
+        with self.metrics.time_stage("retype"), self.keystroke_recorder.own_input():
+            self._retype(typed_word.length, text)
+        self._replacement_sent = True
+        self._replaced_via = "keystrokes"
+        # Switching back right away converts the retyped word back the same way.
+        buffer.replace(typed_word, text)
+        return True
+
+    def _log_retyped(
+        self,
+        typed_word: TypedWord,
+        converted: str,
+        target_layout: str,
+        source_layout: str | None,
+        retyped: bool,
+    ) -> None:
+        self.metrics.increment("retyped" if retyped else "retype_skipped")
+        self.flight_recorder.record("typed_word_retyped", text_len=len(converted), success=retyped)
+        self._logger.info(
+            "event=typed_word_converted source_layout=%s target_layout=%s success=%s original=%r converted=%r",
+            source_layout,
+            target_layout,
+            retyped,
+            TextPreview(typed_word.word),
+            TextPreview(converted),
+        )
+
+    def _can_revert(
+        self,
+        last_conversion: LastConversion | None,
+        target_layout: str,
+        source_layout: str | None,
+    ) -> bool:
+        if last_conversion is None or (target_layout, source_layout) != (
+            last_conversion.source_layout,
+            last_conversion.target_layout,
+        ):
+            return False
+        reason = None
+        if self.scheduler.monotonic() - last_conversion.at > self.revert_window_seconds:
+            reason = "window_expired"
+        elif last_conversion.focus is not None:
+            current = self._ax_session().focused_element()
+            if current is None or not self.accessibility.same_element(current, last_conversion.focus):
+                reason = "focus_moved"
+        elif self._get_frontmost_app() != last_conversion.app:
+            reason = "app_changed"
+        if reason is None:
+            # The record only describes a collapsed caret right after the converted
+            # text; a new selection, or one that cannot be seen, is converted as usual.
+            selection = self._observed_selection()
+            if selection is None:
+                reason = "selection_unknown"
+            elif selection:
+                reason = "selection_changed"
+        if reason is not None:
             if self.debug_event_logging:
-                self._logger.debug("event=selection_convert_finished target_layout=%s", target_layout)
+                self._logger.debug("event=selection_revert_skipped reason=%s", reason)
+            return False
+        return True
+
+    def _revert_conversion(self, last_conversion: LastConversion, delays: TimingDelays) -> bool:
+        # The converted text sits just before the caret: select it again and
+        # write the original over it. False when it cannot be selected.
+        reselect = self._reselect_for_revert(last_conversion)
+        if reselect is None:
+            return False
+        if reselect == "keystrokes" or last_conversion.replaced_via != "ax":
+            # Keystrokes must not mix with the modifiers of the layout switch hotkey.
+            with self.metrics.time_stage("switch_settle"):
+                self._sleep(delays.layout_switch_settle_seconds)
+        if reselect == "keystrokes":
+            with self.metrics.time_stage("revert_select"):
+                self._extend_selection_left(len(last_conversion.converted))
+                self._sleep(delays.settle_seconds)
+        replaced = self._replace_selected_text(last_conversion.original)
+        self._log_reverted(last_conversion, replaced)
+        return True
+
+    def _reselect_for_revert(self, last_conversion: LastConversion) -> str | None:
+        # "ax" once the converted text is selected again, "keystrokes" when it
+        # still has to be selected with Shift+Left, None when it cannot be.
+        with self.metrics.time_stage("revert_select"):
+            selected = self._ax_session().select_before_caret(last_conversion.converted)
+        if selected:
+            return "ax" if self._reselected_converted(last_conversion) else None
+        return "keystrokes" if _keystroke_selectable(last_conversion.converted) else None
+
+    def _reselected_converted(self, last_conversion: LastConversion) -> bool:
+        # The caret may have moved inside the same field: only revert when the
+        # reselected text is the converted one, otherwise put the caret back.
+        if self._observed_selection() == last_conversion.converted:
+            return True
+        self._ax_session().select_before_caret("")
+        if self.debug_event_logging:
+            self._logger.debug("event=selection_revert_skipped reason=text_changed")
+        return False
 
-    def _capture_selected_text(self) -> tuple[str | None, str | None]:
-        selected_via_ax = self._read_selected_text_ax()
-        if selected_via_ax:
+    def _remember_conversion(
+        self,
+        original: str,
+        converted: str,
+        target_layout: str,
+        source_layout: str | None,
+    ) -> None:
+        if self.revert_window_seconds <= 0 or source_layout is None:
+            return
+        session = self._active_ax_session
+        # Only a focus already resolved by this run is reused; no extra AX call.
+        focus = None if session is None or session.focus_error is None else session.focused_element()
+        app = self._frontmost_app
+        if focus is None and app is None:
+            app = self._get_frontmost_app()
+            if app is None:
+                # Nothing to tell the same text field from another one later.
+                return
+        self._last_conversion = LastConversion(
+            original=original,
+            converted=converted,
+            target_layout=target_layout,
+            source_layout=source_layout,
+            focus=focus,
+            app=app,
+            replaced_via=self._replaced_via,
+            at=self.scheduler.monotonic(),
+        )
+
+    def _log_reverted(self, last_conversion: LastConversion, replaced: bool) -> None:
+        self.metrics.increment("reverted" if replaced else "replace_failed")
+        self.flight_recorder.record("selection_reverted", text_len=len(last_conversion.original), success=replaced)
+        self._logger.info(
+            "event=selection_reverted source_layout=%s target_layout=%s success=%s age_ms=%.0f original=%r",
+            last_conversion.target_layout,
+            last_conversion.source_layout,
+            replaced,
+            (self.scheduler.monotonic() - last_conversion.at) * 1000,
+            TextPreview(last_conversion.original),
+        )
+        if replaced and self.revert_window_seconds > 0:
+            # Switching forward again re-applies the conversion just as quickly.
+            self._last_conversion = last_conversion.reversed(self.scheduler.monotonic(), self._replaced_via)
+
+    def _record_capture(self, selected_text: str | None, previous_clipboard: ClipboardSnapshot | None) -> None:
+        self.flight_recorder.record(
+            "selection_captured",
+            text_len=0 if selected_text is None else len(selected_text),
+            clipboard_bytes=None if previous_clipboard is None else previous_clipboard.size,
+        )
+
+    def _handle_conversion_exception(self, target_layout: str) -> None:
+        self.metrics.increment("exceptions")
+        self._logger.exception("event=selection_convert_exception target_layout=%s", target_layout)
+        self.flight_recorder.record("exception_raised", type=type(sys.exc_info()[1]).__name__)
+        # The moments before a failure are exactly what the recorder is for.
+        self.flight_recorder.dump("exception")
+
+    def _log_converted(
+        self,
+        selected_text: str,
+        converted: str,
+        target_layout: str,
+        source_layout: str | None,
+        replaced: bool,
+    ) -> None:
+        self.metrics.increment("converted" if replaced else "replace_failed")
+        self.flight_recorder.record("selection_replaced", text_len=len(converted), success=replaced)
+        self._logger.info(
+            "event=selection_converted source_layout=%s target_layout=%s success=%s original=%r converted=%r",
+            source_layout,
+            target_layout,
+            replaced,
+            TextPreview(selected_text),
+            TextPreview(converted),
+        )
+
+    def _clipboard_to_restore(
+        self,
+        previous_clipboard: ClipboardSnapshot | None,
+        carried_clipboard: ClipboardSnapshot | None,
+        cancelled: bool,
+    ) -> ClipboardSnapshot | None:
+        # A run cancelled mid-capture has not returned its saved clipboard yet,
+        # and a paste after an AX capture saves it only when it is about to write.
+        if previous_clipboard is None:
+            previous_clipboard = self._saved_clipboard
+        if carried_clipboard is not None:
+            previous_clipboard = carried_clipboard
+        if previous_clipboard is not None and cancelled and not self._stop_event.is_set():
+            # A Cmd+C or Cmd+V may still be in flight; restoring now could race it.
+            # The next run restores the user's clipboard once its own work is done.
+            self._carried_clipboard = previous_clipboard
+            return None
+        return previous_clipboard
+
+    def _snapshot_clipboard(self) -> ClipboardSnapshot | None:
+        with self.metrics.time_stage("clipboard_snapshot"):
+            snapshot = self.clipboard.snapshot(self.clipboard_snapshot_max_bytes)
+        if snapshot is None:
             if self.debug_event_logging:
-                self._logger.debug(
-                    "event=selection_capture_success method=ax selected_len=%s selected_preview=%r",
-                    len(selected_via_ax),
-                    self._text_preview(selected_via_ax),
-                )
+                self._logger.debug("event=clipboard_snapshot_failed")
+            return None
+        if snapshot.dropped_types:
+            self.metrics.increment("clipboard_snapshot_truncated")
+            self._logger.info(
+                "event=clipboard_snapshot_truncated dropped_types=%s kept_bytes=%s limit_bytes=%s",
+                snapshot.dropped_types,
+                snapshot.size,
+                self.clipboard_snapshot_max_bytes,
+            )
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=clipboard_snapshot items=%s types=%s bytes=%s change_count=%s",
+                len(snapshot.items),
+                snapshot.types,
+                snapshot.size,
+                snapshot.change_count,
+            )
+        return snapshot
+
+    def _restore_clipboard(self, previous_clipboard: ClipboardSnapshot) -> None:
+        if (
+            previous_clipboard.change_count is not None
+            and self.clipboard.change_count() == previous_clipboard.change_count
+        ):
+            # Nothing was copied or pasted since the snapshot: the clipboard is still the user's.
+            self.metrics.increment("clipboard_restore_skipped")
+            if self.debug_event_logging:
+                self._logger.debug("event=clipboard_restore_skipped reason=unchanged")
+            return
+        with self.metrics.time_stage("clipboard_restore"):
+            restored = self.clipboard.restore(previous_clipboard)
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=clipboard_restored success=%s items=%s types=%s bytes=%s",
+                restored,
+                len(previous_clipboard.items),
+                previous_clipboard.types,
+                previous_clipboard.size,
+            )
+
+    def _record_total(self, target_layout: str, started: float) -> None:
+        duration = self.metrics.clock() - started
+        self.metrics.record("total", duration)
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=selection_convert_finished target_layout=%s duration_ms=%.1f",
+                target_layout,
+                duration * 1000,
+            )
+
+    def _configured_delays(self) -> TimingDelays:
+        return TimingDelays(
+            settle_seconds=self.settle_delay_seconds,
+            layout_switch_settle_seconds=self.layout_switch_settle_delay_seconds,
+            copy_wait_timeout_seconds=self.selection_copy_wait_timeout_seconds,
+            paste_restore_seconds=self.paste_restore_delay_seconds,
+        )
+
+    def _current_delays(self) -> TimingDelays:
+        return self._delays if self._delays is not None else self._configured_delays()
+
+    def _begin_app_context(self) -> TimingDelays:
+        self._active_ax_session = AXSession(self.accessibility, debug_event_logging=self.debug_event_logging)
+        self._frontmost_app = None
+        self._delays = self._configured_delays()
+        if self.timing_profiles is None and self.capabilities is None:
+            return self._delays
+        self._frontmost_app = self._get_frontmost_app()
+        if self.timing_profiles is None:
+            return self._delays
+        self._delays = self.timing_profiles.delays_for(self._frontmost_app, self._delays)
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=timing_profile_applied app=%s settle=%.3f layout_switch_settle=%.3f "
+                "copy_wait_timeout=%.3f paste_restore=%.3f",
+                self._frontmost_app,
+                self._delays.settle_seconds,
+                self._delays.layout_switch_settle_seconds,
+                self._delays.copy_wait_timeout_seconds,
+                self._delays.paste_restore_seconds,
+            )
+        return self._delays
+
+    def _end_app_context(self) -> None:
+        self._active_ax_session = None
+        self._delays = None
+        self._frontmost_app = None
+        if self.timing_profiles is not None:
+            self.timing_profiles.save()
+        if self.capabilities is not None:
+            self.capabilities.save()
+
+    def _known_method(self, operation: str) -> str | None:
+        if self.capabilities is None or self._frontmost_app is None:
+            return None
+        return self.capabilities.known_method(self._frontmost_app, operation)
+
+    def _remember_method(self, operation: str, method: str, known: str | None) -> None:
+        # Only a real probe teaches something: a method used because it was
+        # already known must not keep its entry from expiring.
+        if self.capabilities is None or self._frontmost_app is None or known == method:
+            return
+        self.capabilities.record(self._frontmost_app, operation, method)
+
+    def _record_copy_latency(self, seconds: float) -> None:
+        self.flight_recorder.record("copy_latency", ms=round(seconds * 1000, 3))
+        if self.timing_profiles is None or self._frontmost_app is None:
+            return
+        self.timing_profiles.record_copy_latency(self._frontmost_app, seconds)
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=timing_profile_sample app=%s copy_latency_ms=%.1f",
+                self._frontmost_app,
+                seconds * 1000,
+            )
+
+    def _record_paste_latency(self, seconds: float) -> None:
+        # Only a paste confirmed through Accessibility is a measurement; the
+        # restore delay of apps that cannot be observed is never shortened.
+        self.flight_recorder.record("paste_latency", ms=round(seconds * 1000, 3))
+        if self.timing_profiles is None or self._frontmost_app is None:
+            return
+        self.timing_profiles.record_paste_latency(self._frontmost_app, seconds)
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=timing_profile_sample app=%s paste_latency_ms=%.1f",
+                self._frontmost_app,
+                seconds * 1000,
+            )
+
+    def _already_correct_confidence(
+        self,
+        original: str,
+        converted: str,
+        target_layout: str,
+        source_layout: str | None,
+    ) -> float | None:
+        if self.auto_direction_confidence_threshold > 1 or self._classifier_unavailable:
+            return None
+        if self.classifier is None:
+            try:
+                self.classifier = default_classifier()
+            except Exception:
+                self._logger.exception("event=classifier_load_failed")
+                self._classifier_unavailable = True
+                return None
+        if not self.classifier.supports(target_layout):
+            return None
+        if source_layout is not None and not self.classifier.supports(source_layout):
+            return None
+        confidence = self.classifier.confidence_already_correct(original, converted)
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=selection_direction_scored target_layout=%s confidence=%.3f",
+                target_layout,
+                confidence,
+            )
+        return confidence
+
+    def _capture_selected_text(self) -> tuple[str | None, ClipboardSnapshot | None]:
+        known_capture = self._known_method("capture")
+        selected_via_ax: str | None = None
+        if not self._ax_skipped("capture", known_capture):
+            with self.metrics.time_stage("ax_read"):
+                selected_via_ax = self._read_selected_text_ax()
+        if self._captured_via_ax(selected_via_ax, known_capture):
             return selected_via_ax, None
+        if not self._clipboard_capture_allowed():
+            return None, None
+
+        previous_clipboard, change_count, marker = self._prepare_clipboard_capture()
+        if marker is not None:
+            if not self._write_capture_marker(marker):
+                return None, previous_clipboard
+            self._sleep(self._current_delays().settle_seconds)
+        copied = self._copy_selected_text_to_clipboard(change_count, marker)
+        return self._captured_via_clipboard(copied, known_capture), previous_clipboard
 
-        previous_clipboard = self._read_clipboard()
-        marker = f"__layout_autofix_marker_{time.monotonic_ns()}__"
+    def _ax_skipped(self, operation: str, known: str | None) -> bool:
+        # Apps known to fail over AX go straight to the clipboard.
+        if known != "clipboard":
+            return False
+        if operation == "capture":
+            self.metrics.increment("ax_read_skipped")
+            if self.debug_event_logging:
+                self._logger.debug("event=selection_capture_ax_skipped reason=capability_cache")
+        else:
+            self.metrics.increment("ax_replace_skipped")
+            if self.debug_event_logging:
+                self._logger.debug("event=selection_replace_ax_skipped reason=capability_cache")
+        return True
+
+    def _captured_via_ax(self, selected: str | None, known_capture: str | None) -> bool:
+        if not selected:
+            return False
+        self._remember_method("capture", "ax", known_capture)
+        self.metrics.increment("capture_ax")
         if self.debug_event_logging:
             self._logger.debug(
-                "event=selection_capture_started previous_clipboard_len=%s marker=%s",
-                None if previous_clipboard is None else len(previous_clipboard),
+                "event=selection_capture_success method=ax selected_len=%s selected_preview=%r",
+                len(selected),
+                self._text_preview(selected),
+            )
+        return True
+
+    def _clipboard_capture_allowed(self) -> bool:
+        if self.clipboard_capture:
+            return True
+        self.metrics.increment("capture_failed")
+        if self.debug_event_logging:
+            self._logger.debug("event=selection_capture_empty reason=clipboard_capture_disabled")
+        return False
+
+    def _prepare_clipboard_capture(self) -> tuple[ClipboardSnapshot | None, int | None, str | None]:
+        previous_clipboard = self._snapshot_clipboard()
+        self._saved_clipboard = previous_clipboard
+        change_count = self.clipboard.change_count()
+        marker: str | None = None
+        if change_count is None:
+            # Without a change counter the copy can only be noticed by overwriting a marker.
+            marker = f"__layout_autofix_marker_{time.monotonic_ns()}__"
+        if self.debug_event_logging:
+            self._logger.debug(
+                "event=selection_capture_started previous_clipboard_bytes=%s change_count=%s marker=%s",
+                None if previous_clipboard is None else previous_clipboard.size,
+                change_count,
                 marker,
             )
+        return previous_clipboard, change_count, marker
 
-        if not self._write_clipboard(marker):
-            if self.debug_event_logging:
-                self._logger.debug("event=selection_capture_failed reason=write_marker_failed")
-            return None, previous_clipboard
+    def _write_capture_marker(self, marker: str) -> bool:
+        with self.metrics.time_stage("marker_write"):
+            written = self._write_clipboard(marker)
+        if not written and self.debug_event_logging:
+            self._logger.debug("event=selection_capture_failed reason=write_marker_failed")
+        return written
 
-        time.sleep(self.settle_delay_seconds)
-        copied = self._copy_selected_text_to_clipboard(marker)
+    def _captured_via_clipboard(self, copied: str | None, known_capture: str | None) -> str | None:
+        self.metrics.increment("capture_clipboard" if copied is not None else "capture_failed")
         if copied is None:
             if self.debug_event_logging:
                 self._logger.debug("event=selection_capture_empty reason=clipboard_not_updated")
-            return None, previous_clipboard
+            return None
 
+        self._remember_method("capture", "clipboard", known_capture)
         if self.debug_event_logging:
             self._logger.debug(
                 "event=selection_capture_success copied_len=%s copied_preview=%r",
                 len(copied),
                 self._text_preview(copied),
             )
-        return copied, previous_clipboard
+        return copied
 
     def _replace_selected_text(self, text: str) -> bool:
-        replaced_via_ax = self._replace_selected_text_ax(text)
+        if self._focus_moved_before_replace():
+            return False
+
+        known_replace = self._known_method("replace")
+        replaced_via_ax = False
+        if not self._ax_skipped("replace", known_replace):
+            with self.metrics.time_stage("ax_replace"):
+                replaced_via_ax = self._replace_selected_text_ax(text)
         if replaced_via_ax:
-            if self.debug_event_logging:
-                self._logger.debug("event=selection_replace_done method=ax")
+            self._replaced_via_ax(known_replace)
             return True
 
+        self._begin_paste(text)
+        with self.metrics.time_stage("paste"):
+            if not self._write_replacement(text):
+                return False
+            self._sleep(self._current_delays().settle_seconds)
+            selection_before = self._selection_before_paste()
+            self._mark_replacement_sent("clipboard")
+            self._send_shortcut(_SHORTCUT_MODIFIER, "v")
+        self._replaced_via_clipboard(known_replace)
+        # Do not restore clipboard too early; target app may paste asynchronously.
+        with self.metrics.time_stage("paste_restore"):
+            self._wait_for_paste(selection_before)
+        if self.debug_event_logging:
+            self._logger.debug("event=selection_replace_done")
+        return True
+
+    def _focus_moved_before_replace(self) -> bool:
+        if not self._focus_moved_since_capture():
+            return False
+        # Whatever has focus now is not what the text was copied from.
+        self.metrics.increment("focus_moved")
+        self._logger.info("event=selection_replace_aborted reason=focus_moved")
+        return True
+
+    def _mark_replacement_sent(self, method: str) -> None:
+        # Set before the write goes out: a run cancelled meanwhile must not
+        # assume the text is still in the old layout.
+        self._replacement_sent = True
+        self._replaced_via = method
+
+    def _replaced_via_ax(self, known_replace: str | None) -> None:
+        self._mark_replacement_sent("ax")
+        self._remember_method("replace", "ax", known_replace)
+        self.metrics.increment("replace_ax")
+        if self.debug_event_logging:
+            self._logger.debug("event=selection_replace_done method=ax")
+
+    def _begin_paste(self, text: str) -> None:
         if self.debug_event_logging:
             self._logger.debug(
                 "event=selection_replace_started text_len=%s text_preview=%r",
                 len(text),
                 self._text_preview(text),
             )
-        if not self._write_clipboard(text):
-            if self.debug_event_logging:
-                self._logger.debug("event=selection_replace_failed reason=write_clipboard_failed")
-            return False
+        if self._saved_clipboard is None:
+            # Captured over AX: the clipboard is only now about to be overwritten.
+            self._saved_clipboard = self._snapshot_clipboard()
 
-        time.sleep(self.settle_delay_seconds)
-        self._send_shortcut(keyboard.Key.cmd, "v")
-        # Do not restore clipboard too early; target app may paste asynchronously.
-        time.sleep(self.paste_restore_delay_seconds)
+    def _write_replacement(self, text: str) -> bool:
+        if self._write_clipboard(text):
+            return True
         if self.debug_event_logging:
-            self._logger.debug("event=selection_replace_done")
-        return True
+            self._logger.debug("event=selection_replace_failed reason=write_clipboard_failed")
+        return False
 
-    def _read_selected_text_ax(self) -> str | None:
-        if HIServices is None:
+    def _replaced_via_clipboard(self, known_replace: str | None) -> None:
+        self._remember_method("replace", "clipboard", known_replace)
+        self.metrics.increment("replace_clipboard")
+
+    def _selection_before_paste(self) -> str | None:
+        # The paste is confirmed once the focused element's selection stops being
+        # this text. None means it cannot be observed and the full delay applies.
+        if self._known_method("capture") == "clipboard":
             return None
-        try:
-            system = HIServices.AXUIElementCreateSystemWide()
-            err, focused = HIServices.AXUIElementCopyAttributeValue(
-                system,
-                HIServices.kAXFocusedUIElementAttribute,
-                None,
-            )
-            if err != HIServices.kAXErrorSuccess or focused is None:
-                if self.debug_event_logging:
-                    self._logger.debug("event=ax_focused_element_failed error=%s", err)
-                if err == HIServices.kAXErrorAPIDisabled:
-                    self._check_ax_permission(prompt=True)
-                return None
+        return self._observed_selection() or None
 
-            err, selected = HIServices.AXUIElementCopyAttributeValue(
-                focused,
-                HIServices.kAXSelectedTextAttribute,
-                None,
-            )
-            if err != HIServices.kAXErrorSuccess:
-                if self.debug_event_logging:
-                    self._logger.debug("event=ax_selected_text_failed error=%s", err)
-                return None
-            if selected is None:
-                return None
+    def _observed_selection(self) -> str | None:
+        return self._ax_session().read_selected_text(keep_empty=True)
 
-            selected_text = str(selected)
-            if selected_text == "":
-                return None
-            return selected_text
-        except Exception as exc:
-            if self.debug_event_logging:
-                self._logger.debug("event=ax_selected_text_exception error=%r", exc)
-            return None
+    def _wait_for_paste(self, selection_before: str | None) -> None:
+        upper_bound = self._current_delays().paste_restore_seconds
+        if selection_before is None:
+            self._sleep(upper_bound)
+            return
+        sent_at = self.scheduler.monotonic()
+        deadline = sent_at + upper_bound
+        attempts = 0
+        while self.scheduler.monotonic() < deadline:
+            attempts += 1
+            self._sleep(min(self.paste_poll_interval_seconds, max(0.0, deadline - self.scheduler.monotonic())))
+            selection = self._observed_selection()
+            if self._paste_observed(selection_before, selection, attempts, self.scheduler.monotonic() - sent_at):
+                return
+        self._log_paste_timeout(attempts)
 
-    def _check_ax_permission(self, *, prompt: bool) -> bool:
-        if HIServices is None:
+    def _paste_observed(self, selection_before: str, selection: str | None, attempts: int, waited: float) -> bool:
+        # A failed read (None) proves nothing; any readable change means the app
+        # has processed Cmd+V and so is done with the pasteboard.
+        if selection is None or selection == selection_before:
             return False
+        self.metrics.increment("paste_confirmed")
+        if self.debug_event_logging:
+            self._logger.debug("event=paste_confirmed attempts=%s selection_len=%s", attempts, len(selection))
+        self._record_paste_latency(waited)
+        return True
 
-        trusted = False
-        try:
-            trusted = bool(HIServices.AXIsProcessTrusted())
-        except Exception as exc:
-            if self.debug_event_logging:
-                self._logger.debug("event=ax_trust_check_failed error=%r", exc)
+    def _log_paste_timeout(self, attempts: int) -> None:
+        self.metrics.increment("paste_unconfirmed")
+        if self.debug_event_logging:
+            self._logger.debug("event=paste_unconfirmed attempts=%s", attempts)
+
+    def _ax_session(self) -> AXSession:
+        # Outside a conversion (direct calls) every access gets a fresh session.
+        if self._active_ax_session is not None:
+            return self._active_ax_session
+        return AXSession(self.accessibility, debug_event_logging=self.debug_event_logging)
 
-        if trusted:
+    def _read_selected_text_ax(self) -> str | None:
+        session = self._ax_session()
+        selected = session.read_selected_text()
+        if session.focus_error == AX_ERROR_API_DISABLED:
+            self._check_ax_permission(prompt=True)
+        return selected
+
+    def _check_ax_permission(self, *, prompt: bool) -> bool:
+        if self._ax_trust.is_trusted():
             if self.debug_event_logging:
                 self._logger.debug("event=ax_trusted")
             return True
@@ -280,95 +1056,32 @@ class AutoLayoutFixer:
             )
             self._ax_warning_logged = True
 
-        if prompt and hasattr(HIServices, "AXIsProcessTrustedWithOptions"):
-            try:
-                HIServices.AXIsProcessTrustedWithOptions(
-                    {HIServices.kAXTrustedCheckOptionPrompt: True}
-                )
-            except Exception as exc:
-                if self.debug_event_logging:
-                    self._logger.debug("event=ax_prompt_failed error=%r", exc)
+        if prompt:
+            self.accessibility.prompt_for_trust()
+            # The user may grant access from the prompt; do not trust the cached "no".
+            self._ax_trust.invalidate()
         return False
 
     def _replace_selected_text_ax(self, text: str) -> bool:
-        if HIServices is None:
-            return False
-        try:
-            system = HIServices.AXUIElementCreateSystemWide()
-            err, focused = HIServices.AXUIElementCopyAttributeValue(
-                system,
-                HIServices.kAXFocusedUIElementAttribute,
-                None,
-            )
-            if err != HIServices.kAXErrorSuccess or focused is None:
-                if self.debug_event_logging:
-                    self._logger.debug("event=ax_replace_focus_failed error=%s", err)
-                return False
+        return self._ax_session().replace_selected_text(text)
 
-            err = HIServices.AXUIElementSetAttributeValue(
-                focused,
-                HIServices.kAXSelectedTextAttribute,
-                text,
-            )
-            if err != HIServices.kAXErrorSuccess:
-                if self.debug_event_logging:
-                    self._logger.debug("event=ax_replace_failed error=%s", err)
-                return False
-            return True
-        except Exception as exc:
-            if self.debug_event_logging:
-                self._logger.debug("event=ax_replace_exception error=%r", exc)
-            return False
-
-    def _read_clipboard(self) -> Optional[str]:
-        try:
-            result = subprocess.run(
-                ["pbpaste"],
-                check=False,
-                capture_output=True,
-                text=True,
-            )
-        except Exception as exc:
-            if self.debug_event_logging:
-                self._logger.debug("event=clipboard_read_exception error=%r", exc)
-            return None
+    def _focus_moved_since_capture(self) -> bool:
+        return self._active_ax_session is not None and self._active_ax_session.focus_moved()
 
-        if result.returncode != 0:
-            if self.debug_event_logging:
-                self._logger.debug(
-                    "event=clipboard_read_failed returncode=%s stderr=%r",
-                    result.returncode,
-                    result.stderr,
-                )
+    def _read_clipboard(self) -> str | None:
+        text = self.clipboard.read_text()
+        if text is None:
             return None
         if self.debug_event_logging:
             self._logger.debug(
                 "event=clipboard_read_ok text_len=%s text_preview=%r",
-                len(result.stdout),
-                self._text_preview(result.stdout),
+                len(text),
+                self._text_preview(text),
             )
-        return result.stdout
+        return text
 
     def _write_clipboard(self, text: str) -> bool:
-        try:
-            result = subprocess.run(
-                ["pbcopy"],
-                check=False,
-                input=text,
-                text=True,
-            )
-        except Exception as exc:
-            if self.debug_event_logging:
-                self._logger.debug("event=clipboard_write_exception error=%r", exc)
-            return False
-
-        if result.returncode != 0:
-            if self.debug_event_logging:
-                self._logger.debug(
-                    "event=clipboard_write_failed returncode=%s stderr=%r",
-                    result.returncode,
-                    result.stderr,
-                )
+        if not self.clipboard.write_text(text):
             return False
         if self.debug_event_logging:
             self._logger.debug(
@@ -378,57 +1091,91 @@ class AutoLayoutFixer:
             )
         return True
 
-    def _copy_selected_text_to_clipboard(self, marker: str) -> str | None:
-        self._send_shortcut(keyboard.Key.cmd, "c")
-        copied = self._wait_for_clipboard_change(marker)
-        if copied is not None:
-            if self.debug_event_logging:
-                self._logger.debug("event=copy_shortcut_success method=pynput")
-            return copied
+    def _copy_selected_text_to_clipboard(self, change_count: int | None, marker: str | None) -> str | None:
+        known_shortcut = self._known_method("copy_shortcut")
+        methods = self._copy_shortcut_methods(known_shortcut)
+        for attempt, method in enumerate(methods):
+            self._log_copy_fallback(attempt, methods)
+            sent_at = self.scheduler.monotonic()
+            if not self._send_copy_shortcut(method):
+                continue
+            with self.metrics.time_stage("clipboard_wait"):
+                copied = self._wait_for_copy(change_count, marker)
+            if copied is not None:
+                self._copied_via(method, known_shortcut, self.scheduler.monotonic() - sent_at)
+                return copied
+        return None
 
-        if self.debug_event_logging:
-            self._logger.debug("event=copy_shortcut_fallback method=quartz reason=pynput_no_clipboard_update")
-        if not self._send_command_shortcut_quartz("c"):
-            if self.debug_event_logging:
-                self._logger.debug("event=copy_shortcut_fallback_unavailable method=quartz")
-            return None
+    def _copy_shortcut_methods(self, known_shortcut: str | None) -> tuple[str, str]:
+        # Apps known to ignore pynput's Cmd+C go straight to Quartz instead of
+        # sitting out a full copy-wait timeout first.
+        return ("quartz", "pynput") if known_shortcut == "quartz" else ("pynput", "quartz")
 
-        copied = self._wait_for_clipboard_change(marker)
-        if copied is not None and self.debug_event_logging:
-            self._logger.debug("event=copy_shortcut_success method=quartz")
-        return copied
+    def _log_copy_fallback(self, attempt: int, methods: tuple[str, str]) -> None:
+        if attempt and self.debug_event_logging:
+            self._logger.debug(
+                "event=copy_shortcut_fallback method=%s reason=%s_no_clipboard_update",
+                methods[attempt],
+                methods[0],
+            )
 
-    def _wait_for_clipboard_change(self, marker: str) -> str | None:
-        deadline = time.monotonic() + self.selection_copy_wait_timeout_seconds
+    def _send_copy_shortcut(self, method: str) -> bool:
+        with self.metrics.time_stage("copy_shortcut"):
+            if method == "pynput":
+                self._send_shortcut(_SHORTCUT_MODIFIER, "c")
+                sent = True
+            else:
+                sent = self._send_command_shortcut_quartz("c")
+        if not sent and self.debug_event_logging:
+            self._logger.debug("event=copy_shortcut_fallback_unavailable method=%s", method)
+        return sent
+
+    def _copied_via(self, method: str, known_shortcut: str | None, latency: float) -> None:
+        self._record_copy_latency(latency)
+        self._remember_method("copy_shortcut", method, known_shortcut)
+        self.metrics.increment(f"copy_{method}")
+        if self.debug_event_logging:
+            self._logger.debug("event=copy_shortcut_success method=%s", method)
+
+    def _wait_for_copy(self, change_count: int | None, marker: str | None) -> str | None:
+        # Polls never overshoot the deadline: the last sleep is cut to what is left.
+        deadline = self.scheduler.monotonic() + self._current_delays().copy_wait_timeout_seconds
         attempts = 0
-        last_value: str | None = None
-        while time.monotonic() < deadline:
+        while self.scheduler.monotonic() < deadline:
             attempts += 1
-            time.sleep(self.selection_copy_poll_interval_seconds)
-            copied = self._read_clipboard()
-            if copied is None:
-                continue
-            last_value = copied
-            if copied != marker:
-                if self.debug_event_logging:
-                    self._logger.debug(
-                        "event=clipboard_copy_detected attempts=%s copied_len=%s copied_preview=%r",
-                        attempts,
-                        len(copied),
-                        self._text_preview(copied),
-                    )
+            self._sleep(min(self.selection_copy_poll_interval_seconds, max(0.0, deadline - self.scheduler.monotonic())))
+            copied, detected = self._poll_copy(change_count, marker, attempts)
+            if detected:
                 return copied
+        self._log_copy_timeout(attempts)
+        return None
 
+    def _poll_copy(self, change_count: int | None, marker: str | None, attempts: int) -> tuple[str | None, bool]:
+        # With a change counter the contents are read once, after it moves;
+        # otherwise the copy shows as the marker being overwritten.
+        if change_count is not None:
+            current_change_count = self.clipboard.change_count()
+            if current_change_count is None or current_change_count == change_count:
+                return None, False
+            copied = self._read_clipboard()
+        else:
+            copied = self._read_clipboard()
+            if copied is None or copied == marker:
+                return None, False
         if self.debug_event_logging:
             self._logger.debug(
-                "event=clipboard_copy_timeout attempts=%s last_value_is_marker=%s last_value_preview=%r",
+                "event=clipboard_copy_detected attempts=%s copied_len=%s",
                 attempts,
-                last_value == marker,
-                None if last_value is None else self._text_preview(last_value),
+                None if copied is None else len(copied),
             )
-        return None
+        return copied, True
+
+    def _log_copy_timeout(self, attempts: int) -> None:
+        if self.debug_event_logging:
+            self._logger.debug("event=clipboard_copy_timeout attempts=%s", attempts)
 
     def _send_command_shortcut_quartz(self, key: str) -> bool:
+        Quartz = optional_module("Quartz")
         if Quartz is None:
             return False
 
@@ -461,43 +1208,56 @@ class AutoLayoutFixer:
                 self._logger.debug("event=quartz_shortcut_failed key=%s error=%r", key, exc)
             return False
 
-    def _send_shortcut(self, modifier: keyboard.Key, key: str) -> None:
+    def _send_shortcut(self, modifier: str, key: str) -> None:
+        # ``modifier`` names a pynput ``keyboard.Key`` member, e.g. "cmd".
         if self.debug_event_logging:
             self._logger.debug("event=send_shortcut modifier=%s key=%s", modifier, key)
-        self._controller.press(modifier)
-        self._controller.press(key)
-        self._controller.release(key)
-        self._controller.release(modifier)
+        controller = self._keyboard_controller()
+        modifier_key = getattr(_pynput_keyboard().Key, modifier)
+        controller.press(modifier_key)
+        controller.press(key)
+        controller.release(key)
+        controller.release(modifier_key)
+
+    def _extend_selection_left(self, count: int) -> None:
+        if self.debug_event_logging:
+            self._logger.debug("event=send_select_left count=%s", count)
+        keyboard = _pynput_keyboard()
+        controller = self._keyboard_controller()
+        with controller.pressed(keyboard.Key.shift):
+            for _ in range(count):
+                controller.tap(keyboard.Key.left)
+
+    def _retype(self, backspaces: int, text: str) -> None:
+        if self.debug_event_logging:
+            self._logger.debug("event=send_retype backspaces=%s text_len=%s", backspaces, len(text))
+        keyboard = _pynput_keyboard()
+        controller = self._keyboard_controller()
+        for _ in range(backspaces):
+            controller.tap(keyboard.Key.backspace)
+        controller.type(text)
+
+    def _keyboard_controller(self) -> Any:
+        if self._controller is None:
+            self._controller = _pynput_keyboard().Controller()
+        return self._controller
 
     def _get_current_layout(self) -> str | None:
-        try:
-            output = subprocess.check_output(
-                ["defaults", "read", "com.apple.HIToolbox", "AppleSelectedInputSources"],
-                text=True,
-            )
-        except Exception as exc:
-            if self.debug_event_logging:
-                self._logger.debug("event=layout_read_failed error=%r", exc)
-            return None
+        return self.layout_source.current_layout()
 
-        layout_names = re.findall(r'"KeyboardLayout Name"\s*=\s*([^;]+);', output)
-        if not layout_names:
-            if self.debug_event_logging:
-                self._logger.debug("event=layout_parse_failed reason=no_layout_names")
-            return None
+    def _get_frontmost_app(self) -> str | None:
+        return frontmost_application_id(debug_event_logging=self.debug_event_logging)
 
-        current_name = layout_names[-1].strip().strip('"').lower()
-        if "russian" in current_name or "рус" in current_name:
-            return "RUS"
-        if "abc" in current_name or "u.s." in current_name or "english" in current_name:
-            return "EN"
-        if self.debug_event_logging:
-            self._logger.debug("event=layout_unknown current_layout_name=%r", current_name)
-        return None
+    def _text_preview(self, text: str, *, limit: int = PREVIEW_LIMIT) -> TextPreview:
+        return TextPreview(text, limit=limit, visible=self.trace_level == "payload")
+
+
+def create_fixer(kind: str = "threaded", **options: Any) -> AutoLayoutFixer:
+    if kind not in ENGINE_KINDS:
+        raise ValueError(f"engine must be one of {', '.join(ENGINE_KINDS)}")
+    if kind == "asyncio":
+        # Only the asyncio engine pays for importing asyncio.
+        from layout_autofix.async_engine import AsyncLayoutFixer
 
-    @staticmethod
-    def _text_preview(text: str, *, limit: int = 120) -> str:
-        compact = text.replace("\n", "\\n")
-        if len(compact) <= limit:
-            return compact
-        return compact[:limit] + "..."
+        return AsyncLayoutFixer(**options)
+    return AutoLayoutFixer(**options)
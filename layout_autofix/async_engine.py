@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, ClassVar
+
+# ENGINE_KINDS and create_fixer live in app so that choosing the default engine
+# never imports asyncio; they stay importable from here.
+from layout_autofix.app import (  # noqa: F401
+    _SHORTCUT_MODIFIER,
+    ENGINE_KINDS,
+    AutoLayoutFixer,
+    LastConversion,
+    create_fixer,
+)
+from layout_autofix.clipboard import ClipboardSnapshot
+from layout_autofix.keystrokes import TypedWord
+
+
+@dataclass
+class AsyncLayoutFixer(AutoLayoutFixer):
+    # Layout watching, clipboard polling and every pipeline wait are coroutines
+    # on one event loop. Blocking backend calls (pasteboard, AX, keystrokes) go
+    # to a single I/O thread, which also keeps them in order.
+    engine: ClassVar[str] = "asyncio"
+    _loop: asyncio.AbstractEventLoop | None = field(default=None, init=False)
+    _io_executor: ThreadPoolExecutor | None = field(default=None, init=False)
+    _watch_executor: ThreadPoolExecutor | None = field(default=None, init=False)
+    _conversion_ready: asyncio.Event | None = field(default=None, init=False)
+    _conversion_task: asyncio.Task | None = field(default=None, init=False)
+    _cancel_requested: bool = field(default=False, init=False)
+
+    def run_forever(self) -> None:
+        asyncio.run(self.run_async())
+
+    async def run_async(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.layout_source.start()
+        previous_layout = await self._call(self._get_current_layout)
+        self._log_watcher_started(previous_layout)
+        await self._call(functools.partial(self._check_ax_permission, prompt=True))
+        await self._call(self._keyboard_controller)
+        await self._call(self._start_keystroke_recorder)
+
+        converter = asyncio.create_task(self._conversion_loop())
+        try:
+            while not self._stop_event.is_set():
+                await self._watch_for_layout_change()
+                if self._stop_event.is_set():
+                    break
+                try:
+                    previous_layout = await self._call(self._poll_layout_once, previous_layout)
+                except Exception:
+                    self._logger.exception("event=poll_iteration_exception")
+        finally:
+            self._request_cancel()
+            converter.cancel()
+            await asyncio.gather(converter, return_exceptions=True)
+            await self._call(self._shutdown_backends)
+            for executor in (self._io_executor, self._watch_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False)
+            self._io_executor = self._watch_executor = None
+            self._loop = None
+
+        self._logger.info("event=watcher_stopped")
+
+    def stop(self) -> None:
+        super().stop()
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wake_for_stop)
+        except RuntimeError:
+            # The loop has already closed.
+            pass
+
+    def _schedule_selection_conversion(self, target_layout: str, source_layout: str | None = None) -> None:
+        # Called from the I/O thread by ``_poll_layout_once``, or from any other thread.
+        loop = self._loop
+        if loop is None:
+            raise RuntimeError("the asyncio engine is not running")
+        loop.call_soon_threadsafe(self._enqueue_conversion, target_layout, source_layout)
+
+    def _enqueue_conversion(self, target_layout: str, source_layout: str | None) -> None:
+        self._queue_conversion(target_layout, source_layout)
+        # Latest wins: the running conversion is cancelled at its current await.
+        self._request_cancel()
+        self._conversion_active.set()
+        self._ready_event().set()
+        if self.debug_event_logging:
+            self._logger.debug("event=selection_convert_scheduled target_layout=%s", target_layout)
+
+    def _request_cancel(self) -> None:
+        # One cancellation per run, so the run's cleanup can still await the I/O thread.
+        task = self._conversion_task
+        if task is not None and not task.done() and not self._cancel_requested:
+            self._cancel_requested = True
+            task.cancel()
+
+    def _wake_for_stop(self) -> None:
+        self._request_cancel()
+        self._ready_event().set()
+
+    def _ready_event(self) -> asyncio.Event:
+        if self._conversion_ready is None:
+            self._conversion_ready = asyncio.Event()
+        return self._conversion_ready
+
+    async def _conversion_loop(self) -> None:
+        ready = self._ready_event()
+        while True:
+            await ready.wait()
+            ready.clear()
+            if self._stop_event.is_set():
+                self._conversion_active.clear()
+                return
+            if self._pending_conversion is None:
+                continue
+            target_layout, source_layout = self._pending_conversion
+            self._pending_conversion = None
+            self._cancel_requested = False
+            self._conversion_task = asyncio.create_task(self._convert_selected_text_async(target_layout, source_layout))
+            await asyncio.wait([self._conversion_task])
+            self._conversion_task = None
+            self._finish_conversion(source_layout)
+
+    async def _watch_for_layout_change(self) -> None:
+        if self._watch_executor is None:
+            self._watch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="layout-autofix-watch")
+        await asyncio.get_running_loop().run_in_executor(
+            self._watch_executor,
+            self.layout_source.wait_for_change,
+            self.layout_poll_interval_seconds,
+        )
+
+    def _call(self, function: Callable[..., Any], *args: Any) -> asyncio.Future:
+        if self._io_executor is None:
+            self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="layout-autofix-io")
+        return asyncio.get_running_loop().run_in_executor(self._io_executor, function, *args)
+
+    async def _sleep_until(self, deadline: float) -> None:
+        delay = deadline - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _convert_selected_text_async(self, target_layout: str, source_layout: str | None = None) -> None:
+        # The same pipeline as the threaded engine, built from the same helpers;
+        # only the waits and the hand-offs to the I/O thread differ.
+        switched_at = asyncio.get_running_loop().time()
+        previous_clipboard: ClipboardSnapshot | None = None
+        carried_clipboard, self._carried_clipboard = self._carried_clipboard, None
+        self._saved_clipboard = None
+        self._replacement_sent = False
+        self._replaced_via = None
+        cancelled = False
+        started = self.metrics.clock()
+        try:
+            if not self._start_conversion(target_layout, source_layout):
+                return
+            delays = await self._call(self._begin_app_context)
+            if self.debug_event_logging:
+                self._logger.debug("event=selection_convert_started target_layout=%s", target_layout)
+            # The settle only has to pass before the first keystroke: reading the
+            # selection over accessibility does not race the switch hotkey.
+            keystrokes_at = switched_at + delays.layout_switch_settle_seconds
+            last_conversion, self._last_conversion = self._last_conversion, None
+            typed_word = self._typed_word()
+            if typed_word is not None:
+                await self._retype_typed_word_async(typed_word, target_layout, source_layout, keystrokes_at)
+                return
+            if await self._call(self._can_revert, last_conversion, target_layout, source_layout):
+                if await self._revert_conversion_async(last_conversion, keystrokes_at):
+                    return
+            selected_text, previous_clipboard = await self._capture_selected_text_async(keystrokes_at)
+            if not self._selection_captured(selected_text, previous_clipboard):
+                return
+            converted = await self._call(self._converted_text, selected_text, target_layout, source_layout)
+            if converted is None:
+                return
+
+            replaced = await self._replace_selected_text_async(converted, keystrokes_at)
+            self._log_converted(selected_text, converted, target_layout, source_layout, replaced)
+            if replaced:
+                await self._call(self._remember_conversion, selected_text, converted, target_layout, source_layout)
+        except asyncio.CancelledError:
+            cancelled = True
+            self._log_cancelled(target_layout)
+        except Exception:
+            self._handle_conversion_exception(target_layout)
+        finally:
+            previous_clipboard = self._clipboard_to_restore(previous_clipboard, carried_clipboard, cancelled)
+            if previous_clipboard is not None:
+                await self._call(self._restore_clipboard, previous_clipboard)
+            self._record_total(target_layout, started)
+            await self._call(self._end_app_context)
+
+    async def _retype_typed_word_async(
+        self,
+        typed_word: TypedWord,
+        target_layout: str,
+        source_layout: str | None,
+        keystrokes_at: float,
+    ) -> None:
+        converted = await self._call(self._typed_word_conversion, typed_word, target_layout, source_layout)
+        if converted is None:
+            return
+        await self._settle_before_keystrokes(keystrokes_at)
+        retyped = await self._call(self._send_retype, typed_word, converted)
+        self._log_retyped(typed_word, converted, target_layout, source_layout, retyped)
+
+    async def _revert_conversion_async(self, last_conversion: LastConversion, keystrokes_at: float) -> bool:
+        # Only the keystrokes wait for the switch settle.
+        reselect = await self._call(self._reselect_for_revert, last_conversion)
+        if reselect is None:
+            return False
+        if reselect == "keystrokes":
+            await self._settle_before_keystrokes(keystrokes_at)
+            with self.metrics.time_stage("revert_select"):
+                await self._call(self._extend_selection_left, len(last_conversion.converted))
+            keystrokes_at = asyncio.get_running_loop().time() + self._current_delays().settle_seconds
+        replaced = await self._replace_selected_text_async(last_conversion.original, keystrokes_at)
+        self._log_reverted(last_conversion, replaced)
+        return True
+
+    async def _settle_before_keystrokes(self, deadline: float) -> None:
+        with self.metrics.time_stage("switch_settle"):
+            await self._sleep_until(deadline)
+
+    async def _capture_selected_text_async(self, keystrokes_at: float) -> tuple[str | None, ClipboardSnapshot | None]:
+        known_capture = self._known_method("capture")
+        selected_via_ax = None
+        if not self._ax_skipped("capture", known_capture):
+            with self.metrics.time_stage("ax_read"):
+                selected_via_ax = await self._call(self._read_selected_text_ax)
+        if self._captured_via_ax(selected_via_ax, known_capture):
+            return selected_via_ax, None
+        if not self._clipboard_capture_allowed():
+            return None, None
+
+        previous_clipboard, change_count, marker = await self._call(self._prepare_clipboard_capture)
+        if marker is not None:
+            if not await self._call(self._write_capture_marker, marker):
+                return None, previous_clipboard
+            keystrokes_at = max(
+                keystrokes_at,
+                asyncio.get_running_loop().time() + self._current_delays().settle_seconds,
+            )
+        await self._settle_before_keystrokes(keystrokes_at)
+        copied = await self._copy_selected_text_async(change_count, marker)
+        return self._captured_via_clipboard(copied, known_capture), previous_clipboard
+
+    async def _copy_selected_text_async(self, change_count: int | None, marker: str | None) -> str | None:
+        loop = asyncio.get_running_loop()
+        known_shortcut = self._known_method("copy_shortcut")
+        methods = self._copy_shortcut_methods(known_shortcut)
+        for attempt, method in enumerate(methods):
+            self._log_copy_fallback(attempt, methods)
+            sent_at = loop.time()
+            if not await self._call(self._send_copy_shortcut, method):
+                continue
+            with self.metrics.time_stage("clipboard_wait"):
+                copied = await self._wait_for_copy_async(change_count, marker)
+            if copied is not None:
+                self._copied_via(method, known_shortcut, loop.time() - sent_at)
+                return copied
+        return None
+
+    async def _wait_for_copy_async(self, change_count: int | None, marker: str | None) -> str | None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._current_delays().copy_wait_timeout_seconds
+        attempts = 0
+        while loop.time() < deadline:
+            attempts += 1
+            await asyncio.sleep(min(self.selection_copy_poll_interval_seconds, deadline - loop.time()))
+            copied, detected = await self._call(self._poll_copy, change_count, marker, attempts)
+            if detected:
+                return copied
+        self._log_copy_timeout(attempts)
+        return None
+
+    async def _wait_for_paste_async(self, selection_before: str | None) -> None:
+        loop = asyncio.get_running_loop()
+        upper_bound = self._current_delays().paste_restore_seconds
+        if selection_before is None:
+            await asyncio.sleep(upper_bound)
+            return
+        sent_at = loop.time()
+        deadline = sent_at + upper_bound
+        attempts = 0
+        while loop.time() < deadline:
+            attempts += 1
+            await asyncio.sleep(min(self.paste_poll_interval_seconds, deadline - loop.time()))
+            selection = await self._call(self._observed_selection)
+            if self._paste_observed(selection_before, selection, attempts, loop.time() - sent_at):
+                return
+        self._log_paste_timeout(attempts)
+
+    async def _replace_selected_text_async(self, text: str, keystrokes_at: float) -> bool:
+        if await self._call(self._focus_moved_before_replace):
+            return False
+
+        known_replace = self._known_method("replace")
+        replaced_via_ax = False
+        if not self._ax_skipped("replace", known_replace):
+            with self.metrics.time_stage("ax_replace"):
+                # Once submitted the write happens even if this run is cancelled meanwhile.
+                self._replacement_sent = True
+                replaced_via_ax = await self._call(self._replace_selected_text_ax, text)
+                self._replacement_sent = replaced_via_ax
+        if replaced_via_ax:
+            self._replaced_via_ax(known_replace)
+            return True
+
+        await self._call(self._begin_paste, text)
+        with self.metrics.time_stage("paste"):
+            if not await self._call(self._write_replacement, text):
+                return False
+            await self._sleep_until(
+                max(keystrokes_at, asyncio.get_running_loop().time() + self._current_delays().settle_seconds)
+            )
+            selection_before = await self._call(self._selection_before_paste)
+            self._mark_replacement_sent("clipboard")
+            await self._call(self._send_shortcut, _SHORTCUT_MODIFIER, "v")
+        self._replaced_via_clipboard(known_replace)
+        with self.metrics.time_stage("paste_restore"):
+            await self._wait_for_paste_async(selection_before)
+        if self.debug_event_logging:
+            self._logger.debug("event=selection_replace_done")
+        return True
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from layout_autofix.classifier import confidence_from_surprises, default_classifier
+from layout_autofix.layouts import default_registry, load_default_registry
+
+
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+# Layouts the classifier has models for; --auto picks a direction between them per line.
+AUTO_LAYOUTS = ("EN", "RUS")
+
+
+@dataclass(frozen=True)
+class ConvertOptions:
+    to_layout: str | None = None
+    from_layout: str | None = None
+    auto: bool = False
+    # --auto only rewrites a line when the converted reading is at least this likely.
+    threshold: float = 0.9
+
+
+@dataclass
+class ConvertStats:
+    bytes_in: int = 0
+    bytes_out: int = 0
+    chunks: int = 0
+    lines: int = 0
+    lines_converted: int = 0
+    max_chunk_bytes: int = 0
+
+
+@dataclass(frozen=True)
+class ChunkResult:
+    output: bytes
+    # Newlines in the chunk, and how many of the lines they end changed.
+    lines: int
+    lines_converted: int
+    # Without --auto chunks may split a line: the first line can continue the
+    # previous chunk's last one, and the last line can go on in the next chunk.
+    first_changed: bool
+    last_changed: bool
+
+
+def utf8_cut(data: bytes | mmap.mmap, start: int, end: int) -> int:
+    # Largest cut <= end that does not split a UTF-8 sequence.
+    lead = end - 1
+    while lead > start and lead > end - 4 and data[lead] & 0xC0 == 0x80:
+        lead -= 1
+    if lead < start:
+        return end
+    byte = data[lead]
+    if byte >> 5 == 0b110:
+        length = 2
+    elif byte >> 4 == 0b1110:
+        length = 3
+    elif byte >> 3 == 0b11110:
+        length = 4
+    else:
+        length = 1
+    return lead if lead + length > end else end
+
+
+def _chunk_cut(data: bytes | mmap.mmap, start: int, end: int, *, line_aligned: bool) -> int:
+    if line_aligned:
+        newline = data.rfind(b"\n", start, end)
+        if newline >= start:
+            return newline + 1
+    # A line longer than a chunk is split, but never inside a character.
+    cut = utf8_cut(data, start, end)
+    return cut if cut > start else end
+
+
+def iter_mapped_chunks(data: bytes | mmap.mmap, chunk_bytes: int, *, line_aligned: bool) -> Iterator[bytes]:
+    size = len(data)
+    start = 0
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        cut = size if end == size else _chunk_cut(data, start, end, line_aligned=line_aligned)
+        yield data[start:cut]
+        start = cut
+
+
+def iter_stream_chunks(stream: BinaryIO, chunk_bytes: int, *, line_aligned: bool) -> Iterator[bytes]:
+    # At most one partial line (or character) is carried into the next read.
+    pending = b""
+    while True:
+        block = stream.read(chunk_bytes)
+        if not block:
+            if pending:
+                yield pending
+            return
+        data = pending + block
+        cut = _chunk_cut(data, 0, len(data), line_aligned=line_aligned)
+        pending = data[cut:]
+        if cut:
+            yield data[:cut]
+
+
+def _init_worker(layouts_dirs: tuple[str, ...]) -> None:
+    if layouts_dirs:
+        load_default_registry(Path(directory).expanduser() for directory in layouts_dirs)
+
+
+def _chunk_result(parts: list[str], changed: list[bool]) -> ChunkResult:
+    return ChunkResult(
+        "\n".join(parts).encode("utf-8", "surrogateescape"),
+        len(parts) - 1,
+        sum(changed[:-1]),
+        changed[0],
+        changed[-1],
+    )
+
+
+def convert_chunk(chunk: bytes, options: ConvertOptions) -> ChunkResult:
+    # Invalid UTF-8 passes through byte for byte.
+    text = chunk.decode("utf-8", "surrogateescape")
+    registry = default_registry()
+    if not options.auto:
+        table = registry.translation_table(options.from_layout, options.to_layout)
+        converted = text.translate(table)
+        parts = converted.split("\n")
+        if converted == text:
+            return _chunk_result(parts, [False] * len(parts))
+        return _chunk_result(parts, [new != old for new, old in zip(parts, text.split("\n"))])
+
+    classifier = default_classifier()
+    tables = [
+        registry.translation_table(source, target)
+        for source in AUTO_LAYOUTS
+        for target in AUTO_LAYOUTS
+        if source != target
+    ]
+    parts = text.split("\n")
+    changed = [False] * len(parts)
+    for index, line in enumerate(parts):
+        line_surprise = None
+        best = line
+        best_surprise = 0.0
+        for table in tables:
+            candidate = line.translate(table)
+            if candidate == line:
+                continue
+            if line_surprise is None:
+                line_surprise = best_surprise = classifier.surprise(line)
+            surprise = classifier.surprise(candidate)
+            if surprise < best_surprise:
+                best, best_surprise = candidate, surprise
+        if best is line:
+            continue
+        if 1.0 - confidence_from_surprises(line_surprise, best_surprise) >= options.threshold:
+            parts[index] = best
+            changed[index] = True
+    return _chunk_result(parts, changed)
+
+
+def convert_chunks(
+    chunks: Iterable[bytes],
+    write: Callable[[bytes], object],
+    options: ConvertOptions,
+    *,
+    workers: int = 1,
+    layouts_dirs: tuple[str, ...] = (),
+    stats: ConvertStats | None = None,
+) -> ConvertStats:
+    # Output keeps input order. With a pool, at most 2 * workers chunks are in
+    # flight, so memory use depends on the chunk size, never on the input size.
+    stats = ConvertStats() if stats is None else stats
+
+    def account(chunk: bytes) -> bytes:
+        stats.bytes_in += len(chunk)
+        stats.chunks += 1
+        stats.max_chunk_bytes = max(stats.max_chunk_bytes, len(chunk))
+        return chunk
+
+    last_output = b""
+    # Whether the line left open by the previous chunk has changed so far.
+    open_line_changed = False
+
+    def emit(result: ChunkResult) -> None:
+        nonlocal last_output, open_line_changed
+        write(result.output)
+        stats.bytes_out += len(result.output)
+        stats.lines += result.lines
+        stats.lines_converted += result.lines_converted
+        if result.lines:
+            if open_line_changed and not result.first_changed:
+                stats.lines_converted += 1
+            open_line_changed = result.last_changed
+        else:
+            open_line_changed = open_line_changed or result.last_changed
+        last_output = result.output or last_output
+
+    if workers <= 1:
+        _init_worker(layouts_dirs)
+        for chunk in chunks:
+            emit(convert_chunk(account(chunk), options))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(layouts_dirs,)) as pool:
+            in_flight: deque[Future] = deque()
+            for chunk in chunks:
+                in_flight.append(pool.submit(convert_chunk, account(chunk), options))
+                if len(in_flight) >= 2 * workers:
+                    emit(in_flight.popleft().result())
+            while in_flight:
+                emit(in_flight.popleft().result())
+    if last_output and not last_output.endswith(b"\n"):
+        # The final line has no newline of its own.
+        stats.lines += 1
+        if open_line_changed:
+            stats.lines_converted += 1
+    return stats
+
+
+def iter_input_chunks(path: str, chunk_bytes: int, *, line_aligned: bool) -> Iterator[bytes]:
+    if path == "-":
+        yield from iter_stream_chunks(sys.stdin.buffer, chunk_bytes, line_aligned=line_aligned)
+        return
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size <= chunk_bytes:
+            yield from iter_stream_chunks(handle, chunk_bytes, line_aligned=line_aligned)
+            return
+        # Large files are paged in by the kernel as chunks are sliced off.
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from iter_mapped_chunks(mapped, chunk_bytes, line_aligned=line_aligned)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="layout-autofix convert",
+        description=(
+            "Streams files or stdin through the layout converter and writes the result "
+            "in input order, for text typed in the wrong layout."
+        ),
+    )
+    parser.add_argument("inputs", nargs="*", default=["-"], help="Files to convert; '-' reads stdin.")
+    parser.add_argument("--to", dest="to_layout", help="Target layout, e.g. RUS.")
+    parser.add_argument("--from", dest="from_layout", help="Source layout; defaults to the EN/RUS counterpart.")
+    parser.add_argument(
+        "--auto",
+        action="store_true",
+        help="Pick the direction per line (EN <-> RUS) and leave lines that already read correctly.",
+    )
+    parser.add_argument(
+        "--auto-threshold",
+        type=float,
+        default=0.9,
+        help="Minimum probability that the converted line is the intended text (with --auto).",
+    )
+    parser.add_argument("--output", "-o", help="Output file (default: stdout).")
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes; 1 converts in-process.")
+    parser.add_argument(
+        "--layouts-dir",
+        action="append",
+        default=[],
+        help="Extra directory with .json or .keylayout layout files (repeatable).",
+    )
+    args = parser.parse_args(argv)
+
+    if args.auto:
+        options = ConvertOptions(auto=True, threshold=args.auto_threshold)
+    else:
+        if args.to_layout is None:
+            parser.error("either --to or --auto is required")
+        from_layout = args.from_layout
+        if from_layout is None:
+            from_layout = {"RUS": "EN", "EN": "RUS"}.get(args.to_layout)
+            if from_layout is None:
+                parser.error("--from is required unless --to is EN or RUS")
+        _init_worker(tuple(args.layouts_dir))
+        try:
+            default_registry().translation_table(from_layout, args.to_layout)
+        except ValueError as exc:
+            parser.error(str(exc))
+        options = ConvertOptions(to_layout=args.to_layout, from_layout=from_layout)
+
+    if args.chunk_bytes < 4:
+        parser.error("--chunk-bytes must be at least 4")
+
+    output = sys.stdout.buffer if args.output is None else open(args.output, "wb")
+    started = time.perf_counter()
+    try:
+        stats = convert_chunks(
+            itertools.chain.from_iterable(
+                iter_input_chunks(path, args.chunk_bytes, line_aligned=options.auto) for path in args.inputs
+            ),
+            output.write,
+            options,
+            workers=args.workers,
+            layouts_dirs=tuple(args.layouts_dir),
+        )
+        output.flush()
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    elapsed = time.perf_counter() - started
+    print(
+        f"event=convert_finished inputs={len(args.inputs)} bytes_in={stats.bytes_in} bytes_out={stats.bytes_out} "
+        f"chunks={stats.chunks} lines={stats.lines} lines_converted={stats.lines_converted} "
+        f"max_chunk_bytes={stats.max_chunk_bytes} seconds={elapsed:.3f} "
+        f"mib_per_second={stats.bytes_in / (1024 * 1024) / max(elapsed, 1e-9):.1f}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from layout_autofix.state_files import APP_SUPPORT_DIR, read_state, write_state
+
+
+DEFAULT_CAPABILITIES_FILE = APP_SUPPORT_DIR / "capabilities.json"
+
+# Operation -> methods it can use, in the order the pipeline normally tries them.
+CAPABILITY_METHODS = {
+    "capture": ("ax", "clipboard"),
+    "copy_shortcut": ("pynput", "quartz"),
+    "replace": ("ax", "clipboard"),
+}
+
+_CAPABILITIES_FORMAT_VERSION = 1
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CapabilityEntry:
+    method: str
+    checked_at: float
+    uses: int = 0
+
+
+@dataclass
+class CapabilityCache:
+    path: Path | None = DEFAULT_CAPABILITIES_FILE
+    ttl_seconds: float = 7 * 24 * 3600
+    reprobe_every: int = 25
+    max_apps: int = 256
+    save_interval_seconds: float = 30.0
+    clock: Callable[[], float] = time.time
+    debug_event_logging: bool = False
+    _entries: dict[str, dict[str, CapabilityEntry]] | None = field(default=None, init=False)
+    _dirty: bool = field(default=False, init=False)
+    _saved_at: float = field(default=0.0, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def known_method(self, app_id: str, operation: str) -> str | None:
+        # None means "probe in the usual order"; that also happens now and then
+        # for known apps, so a method that starts working again is noticed.
+        with self._lock:
+            operations = self._loaded().get(app_id)
+            entry = None if operations is None else operations.get(operation)
+            if entry is None:
+                return None
+            if self.clock() - entry.checked_at >= self.ttl_seconds:
+                del operations[operation]
+                self._dirty = True
+                return None
+            entry.uses += 1
+            if self.reprobe_every > 0 and entry.uses % self.reprobe_every == 0:
+                return None
+            return entry.method
+
+    def record(self, app_id: str, operation: str, method: str) -> None:
+        if method not in CAPABILITY_METHODS[operation]:
+            raise ValueError(f"{operation} method must be one of {', '.join(CAPABILITY_METHODS[operation])}")
+        now = self.clock()
+        with self._lock:
+            apps = self._loaded()
+            operations = apps.setdefault(app_id, {})
+            entry = operations.get(operation)
+            if entry is not None and entry.method == method:
+                entry.checked_at = now
+            else:
+                operations[operation] = CapabilityEntry(method, now)
+                if self.debug_event_logging:
+                    _logger.debug(
+                        "event=capability_learned app=%s operation=%s method=%s",
+                        app_id,
+                        operation,
+                        method,
+                    )
+            self._evict_oldest(apps)
+            self._dirty = True
+
+    def save(self, *, force: bool = False) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            now = time.monotonic()
+            if not force and now - self._saved_at < self.save_interval_seconds:
+                return
+            data = {
+                app_id: {operation: [entry.method, entry.checked_at] for operation, entry in operations.items()}
+                for app_id, operations in self._entries.items()
+                if operations
+            }
+            self._dirty = False
+            self._saved_at = now
+        if write_state(self.path, _CAPABILITIES_FORMAT_VERSION, data) and self.debug_event_logging:
+            _logger.debug("event=capabilities_saved path=%s apps=%s", self.path, len(data))
+
+    def _loaded(self) -> dict[str, dict[str, CapabilityEntry]]:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _read(self) -> dict[str, dict[str, CapabilityEntry]]:
+        data = None if self.path is None else read_state(self.path, _CAPABILITIES_FORMAT_VERSION)
+        if data is None:
+            return {}
+        entries: dict[str, dict[str, CapabilityEntry]] = {}
+        try:
+            for app_id, operations in data.items():
+                entries[app_id] = {
+                    operation: CapabilityEntry(str(method), float(checked_at))
+                    for operation, (method, checked_at) in operations.items()
+                    if method in CAPABILITY_METHODS.get(operation, ())
+                }
+        except Exception as exc:
+            _logger.warning("event=capabilities_invalid path=%s error=%r", self.path, exc)
+            return {}
+        return entries
+
+    def _evict_oldest(self, apps: dict[str, dict[str, CapabilityEntry]]) -> None:
+        while len(apps) > self.max_apps:
+            oldest = min(
+                apps,
+                key=lambda app_id: max((entry.checked_at for entry in apps[app_id].values()), default=0.0),
+            )
+            del apps[oldest]
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import math
+import struct
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+DEFAULT_MODEL_FILE = Path(__file__).resolve().parent / "data" / "ngram_model.bin"
+LAYOUT_LANGUAGES = {"EN": "en", "RUS": "ru"}
+LANGUAGE_ALPHABETS = {
+    "en": "abcdefghijklmnopqrstuvwxyz",
+    "ru": "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+}
+
+# Only the first characters of a selection are scored: a long selection is
+# decided well before this point and scoring stays in the microsecond range.
+MAX_SCORED_CHARS = 512
+
+_MAGIC = b"LAFN"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+_MODEL_HEADER = struct.Struct("<2sHHff")
+_BOUNDARY = 0
+
+
+@dataclass(frozen=True)
+class NgramModel:
+    language: str
+    alphabet: str
+    scale: float
+    mean_bits: float
+    table: bytes
+    _index: dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Index 0 is the word boundary; letters start at 1.
+        object.__setattr__(self, "_index", {ch: i + 1 for i, ch in enumerate(self.alphabet)})
+
+    @property
+    def size(self) -> int:
+        return len(self.alphabet) + 1
+
+    def run_surprise(self, run: str) -> float:
+        # Bits above the model's typical per-trigram cost for one lower-case letter run.
+        size = self.size
+        table = self.table
+        index = self._index
+        total = 0
+        a = b = _BOUNDARY
+        for ch in run:
+            c = index[ch]
+            total += table[(a * size + b) * size + c]
+            a, b = b, c
+        total += table[(a * size + b) * size + _BOUNDARY]
+        return total / self.scale - self.mean_bits * (len(run) + 1)
+
+
+class LayoutClassifier:
+    def __init__(self, models: Iterable[NgramModel]) -> None:
+        self.models = {model.language: model for model in models}
+        self._model_by_char = {
+            ch: model for model in self.models.values() for ch in model.alphabet
+        }
+
+    @classmethod
+    def load(cls, path: Path | str = DEFAULT_MODEL_FILE) -> LayoutClassifier:
+        return cls(decode_models(Path(path).read_bytes()))
+
+    def supports(self, layout: str) -> bool:
+        return LAYOUT_LANGUAGES.get(layout) in self.models
+
+    def surprise(self, text: str) -> float:
+        # Each letter run is scored by the model of its own script, relative to that
+        # language's typical cost, so EN and RU runs are comparable.
+        total = 0.0
+        for model, run in self._letter_runs(text[:MAX_SCORED_CHARS].lower()):
+            total += model.run_surprise(run)
+        return total
+
+    def confidence_already_correct(self, original: str, converted: str) -> float:
+        # Posterior that ``original`` is the intended text, equal priors on both readings.
+        return confidence_from_surprises(self.surprise(original), self.surprise(converted))
+
+    def _letter_runs(self, text: str) -> Iterator[tuple[NgramModel, str]]:
+        model_by_char = self._model_by_char
+        run_model: NgramModel | None = None
+        start = 0
+        for position, ch in enumerate(text):
+            model = model_by_char.get(ch)
+            if model is run_model:
+                continue
+            if run_model is not None:
+                yield run_model, text[start:position]
+            run_model = model
+            start = position
+        if run_model is not None:
+            yield run_model, text[start:]
+
+
+def confidence_from_surprises(original_bits: float, converted_bits: float) -> float:
+    llr_bits = max(-60.0, min(60.0, converted_bits - original_bits))
+    return 1.0 / (1.0 + math.pow(2.0, -llr_bits))
+
+
+def iter_letter_runs(text: str, alphabet: str) -> Iterator[str]:
+    letters = set(alphabet)
+    run: list[str] = []
+    for ch in text.lower():
+        if ch in letters:
+            run.append(ch)
+        elif run:
+            yield "".join(run)
+            run = []
+    if run:
+        yield "".join(run)
+
+
+def encode_models(models: Iterable[NgramModel]) -> bytes:
+    models = list(models)
+    chunks = [_HEADER.pack(_MAGIC, _VERSION, len(models))]
+    for model in models:
+        alphabet = model.alphabet.encode("utf-8")
+        chunks.append(
+            _MODEL_HEADER.pack(
+                model.language.encode("ascii"),
+                len(model.alphabet),
+                len(alphabet),
+                model.scale,
+                model.mean_bits,
+            )
+        )
+        chunks.append(alphabet)
+        chunks.append(model.table)
+    return b"".join(chunks)
+
+
+def decode_models(payload: bytes) -> list[NgramModel]:
+    magic, version, count = _HEADER.unpack_from(payload, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("unsupported n-gram model file")
+    offset = _HEADER.size
+    models: list[NgramModel] = []
+    for _ in range(count):
+        language, letters, alphabet_bytes, scale, mean_bits = _MODEL_HEADER.unpack_from(payload, offset)
+        offset += _MODEL_HEADER.size
+        alphabet = payload[offset : offset + alphabet_bytes].decode("utf-8")
+        offset += alphabet_bytes
+        table_size = (letters + 1) ** 3
+        table = payload[offset : offset + table_size]
+        offset += table_size
+        if len(alphabet) != letters or len(table) != table_size:
+            raise ValueError("truncated n-gram model file")
+        models.append(NgramModel(language.decode("ascii"), alphabet, scale, mean_bits, table))
+    return models
+
+
+@lru_cache(maxsize=1)
+def default_classifier() -> LayoutClassifier:
+    return LayoutClassifier.load()
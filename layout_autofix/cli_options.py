@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from layout_autofix.app import ENGINE_KINDS, AutoLayoutFixer, create_fixer
+from layout_autofix.capability_cache import DEFAULT_CAPABILITIES_FILE, CapabilityCache
+from layout_autofix.clipboard import CLIPBOARD_BACKEND_KINDS, DEFAULT_SNAPSHOT_MAX_BYTES, create_clipboard_backend
+from layout_autofix.flight_recorder import FlightRecorder
+from layout_autofix.keystrokes import KeystrokeRecorder
+from layout_autofix.layout_source import LAYOUT_SOURCE_KINDS, create_layout_source
+from layout_autofix.layouts import LayoutRegistry, default_cache_dir, load_default_registry
+from layout_autofix.logging_setup import DEFAULT_LOG_FILE
+from layout_autofix.timing_profiles import DEFAULT_PROFILES_FILE, TimingProfileStore
+from layout_autofix.tracing import DEFAULT_TRACE_RATE_LIMIT, TRACE_LEVELS, resolve_trace_level
+
+
+# Backends that only exist under X11 are not offered by the macOS status bar app.
+_X11_ONLY_KINDS = ("xkb", "x11")
+
+
+def add_common_arguments(parser: argparse.ArgumentParser, *, macos_app: bool = False) -> None:
+    # Options shared by the CLI and the status bar app. The only intended
+    # difference is the default trace level: the .app has no console, so its
+    # log file keeps pipeline stages unless told otherwise.
+    layout_sources = [kind for kind in LAYOUT_SOURCE_KINDS if not (macos_app and kind in _X11_ONLY_KINDS)]
+    clipboard_backends = [kind for kind in CLIPBOARD_BACKEND_KINDS if not (macos_app and kind in _X11_ONLY_KINDS)]
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=0.1,
+        help="How often to poll current input source (seconds).",
+    )
+    parser.add_argument(
+        "--layout-source",
+        default="auto",
+        choices=layout_sources,
+        help=(
+            "How to detect input-source changes: system notifications, 'defaults read' polling, "
+            "or auto (notifications when available)."
+            if macos_app
+            else "How to detect input-source changes: macOS notifications, 'defaults read' polling, "
+            "XKB group events on X11, or auto (notifications on macOS, XKB when DISPLAY is set)."
+        ),
+    )
+    parser.add_argument(
+        "--clipboard-backend",
+        default="auto",
+        choices=clipboard_backends,
+        help=(
+            "How to access the clipboard: in-process NSPasteboard, pbcopy/pbpaste "
+            "subprocesses, or auto (pasteboard when available)."
+            if macos_app
+            else "How to access the clipboard: in-process NSPasteboard, pbcopy/pbpaste "
+            "subprocesses, an in-process X11 CLIPBOARD owner, or auto (pasteboard on macOS, "
+            "x11 when DISPLAY is set)."
+        ),
+    )
+    parser.add_argument(
+        "--layouts-dir",
+        action="append",
+        default=[],
+        help=(
+            "Extra directory with layout definitions (.json or .keylayout). "
+            "Can be given several times."
+        ),
+    )
+    parser.add_argument(
+        "--settle-delay",
+        type=float,
+        default=0.02,
+        help="Delay around copy/paste to let clipboard and app settle (seconds).",
+    )
+    parser.add_argument(
+        "--layout-switch-settle-delay",
+        type=float,
+        default=0.12,
+        help="Delay after layout switch before attempting to copy selection (seconds).",
+    )
+    parser.add_argument(
+        "--copy-wait-timeout",
+        type=float,
+        default=0.35,
+        help="How long to wait for clipboard update after Cmd+C (seconds).",
+    )
+    parser.add_argument(
+        "--copy-poll-interval",
+        type=float,
+        default=0.03,
+        help="Polling interval while waiting for clipboard update after Cmd+C (seconds).",
+    )
+    parser.add_argument(
+        "--paste-restore-delay",
+        type=float,
+        default=0.2,
+        help=(
+            "Longest wait for the target app to paste before the clipboard is restored; "
+            "a paste seen through accessibility ends it early (seconds)."
+        ),
+    )
+    parser.add_argument(
+        "--paste-poll-interval",
+        type=float,
+        default=0.01,
+        help="Polling interval while waiting for the paste to land after Cmd+V (seconds).",
+    )
+    parser.add_argument(
+        "--revert-window",
+        type=float,
+        default=2.0,
+        help=(
+            "Switching back within this many seconds of a conversion restores the original text "
+            "without capturing the selection again (seconds, 0 disables)."
+        ),
+    )
+    parser.add_argument(
+        "--retype-last-word",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=(
+            "Keep the last typed characters in memory (never on disk, never from password fields); "
+            "a switch with no selection right after typing retypes the last word converted."
+        ),
+    )
+    parser.add_argument(
+        "--clipboard-capture",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help=(
+            "Copy the selection with Cmd+C/Ctrl+C when accessibility (PRIMARY under X11) cannot read it. "
+            "Default: on for macOS, off elsewhere, where Ctrl+C interrupts terminals."
+        ),
+    )
+    parser.add_argument(
+        "--clipboard-snapshot-limit-mb",
+        type=float,
+        default=DEFAULT_SNAPSHOT_MAX_BYTES / (1024 * 1024),
+        help=(
+            "Memory cap for the clipboard saved during a conversion; larger types "
+            "(e.g. big images) are not restored."
+        ),
+    )
+    parser.add_argument(
+        "--engine",
+        default="threaded",
+        choices=ENGINE_KINDS,
+        help=(
+            "How conversions run: a worker thread with blocking waits, or coroutines on "
+            "one asyncio event loop with deadline-aware waits."
+        ),
+    )
+    parser.add_argument(
+        "--adaptive-timing",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help=(
+            "Learn per-application copy and paste timings and shorten the measured delays above "
+            "for fast apps. The configured delays stay the upper bounds."
+        ),
+    )
+    parser.add_argument(
+        "--timing-profiles-file",
+        default=str(DEFAULT_PROFILES_FILE),
+        help="Where learned per-application timing profiles are stored.",
+    )
+    parser.add_argument(
+        "--capability-cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help=(
+            "Remember per application whether accessibility or the clipboard works for "
+            "capture and replace, and which Cmd+C method works, to skip attempts that fail."
+        ),
+    )
+    parser.add_argument(
+        "--capability-cache-file",
+        default=str(DEFAULT_CAPABILITIES_FILE),
+        help="Where the per-application capability cache is stored.",
+    )
+    parser.add_argument(
+        "--auto-direction-threshold",
+        type=float,
+        default=0.9,
+        help=(
+            "Skip conversion when the selection is already plausible text with at least this "
+            "confidence (0..1). Values above 1 disable the check."
+        ),
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Console log level.",
+    )
+    parser.add_argument(
+        "--log-file",
+        default=str(DEFAULT_LOG_FILE),
+        help="Path to persistent log file.",
+    )
+    parser.add_argument(
+        "--debug-events",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Shorthand for --trace-level payload (--no-debug-events: --trace-level off).",
+    )
+    parser.add_argument(
+        "--trace-level",
+        default=None,
+        choices=TRACE_LEVELS,
+        help=(
+            "Detail of debug event logs: off, stages (pipeline events without text) or payload "
+            "(stages plus selection and clipboard previews). "
+            + ("Default: stages, the .app has no console." if macos_app else "Default: off.")
+        ),
+    )
+    parser.add_argument(
+        "--record-trace",
+        default=None,
+        help=(
+            "Append the flight recorder's events to this JSONL file as they happen, for "
+            "'layout-autofix replay'. Holds timings and layout names, no text."
+        ),
+    )
+    parser.add_argument(
+        "--trace-rate-limit",
+        type=float,
+        default=DEFAULT_TRACE_RATE_LIMIT,
+        help="Maximum debug events per second from any one call site; 0 disables the limit.",
+    )
+    parser.set_defaults(default_trace_level="stages" if macos_app else "off")
+
+
+def resolve_common_arguments(args: argparse.Namespace) -> str:
+    # Fills in platform-dependent defaults and returns the effective trace level.
+    if args.clipboard_capture is None:
+        args.clipboard_capture = sys.platform == "darwin"
+    return resolve_trace_level(args.trace_level, debug_events=args.debug_events, default=args.default_trace_level)
+
+
+def load_layouts(args: argparse.Namespace, logger: logging.Logger) -> LayoutRegistry:
+    registry = load_default_registry(
+        (Path(directory).expanduser() for directory in args.layouts_dir),
+        cache_dir=default_cache_dir(),
+    )
+    logger.info("event=layouts_loaded layouts=%s", ",".join(sorted(registry.layouts)))
+    return registry
+
+
+def log_config(logger: logging.Logger, event: str, args: argparse.Namespace, trace_level: str) -> None:
+    logger.info(
+        "event=%s poll_interval=%s settle_delay=%s layout_switch_settle_delay=%s "
+        "copy_wait_timeout=%s copy_poll_interval=%s paste_restore_delay=%s paste_poll_interval=%s "
+        "revert_window=%s retype_last_word=%s clipboard_capture=%s clipboard_snapshot_limit_mb=%s trace_level=%s "
+        "layout_source=%s clipboard_backend=%s auto_direction_threshold=%s adaptive_timing=%s "
+        "capability_cache=%s engine=%s trace_rate_limit=%s record_trace=%s",
+        event,
+        args.poll_interval,
+        args.settle_delay,
+        args.layout_switch_settle_delay,
+        args.copy_wait_timeout,
+        args.copy_poll_interval,
+        args.paste_restore_delay,
+        args.paste_poll_interval,
+        args.revert_window,
+        args.retype_last_word,
+        args.clipboard_capture,
+        args.clipboard_snapshot_limit_mb,
+        trace_level,
+        args.layout_source,
+        args.clipboard_backend,
+        args.auto_direction_threshold,
+        args.adaptive_timing,
+        args.capability_cache,
+        args.engine,
+        args.trace_rate_limit,
+        args.record_trace,
+    )
+
+
+def create_fixer_from_args(args: argparse.Namespace, *, trace_level: str, log_dir: Path) -> AutoLayoutFixer:
+    debug_events = trace_level != "off"
+    return create_fixer(
+        args.engine,
+        layout_poll_interval_seconds=args.poll_interval,
+        settle_delay_seconds=args.settle_delay,
+        layout_switch_settle_delay_seconds=args.layout_switch_settle_delay,
+        selection_copy_wait_timeout_seconds=args.copy_wait_timeout,
+        selection_copy_poll_interval_seconds=args.copy_poll_interval,
+        paste_restore_delay_seconds=args.paste_restore_delay,
+        paste_poll_interval_seconds=args.paste_poll_interval,
+        revert_window_seconds=args.revert_window,
+        clipboard_snapshot_max_bytes=int(args.clipboard_snapshot_limit_mb * 1024 * 1024),
+        clipboard_capture=args.clipboard_capture,
+        auto_direction_confidence_threshold=args.auto_direction_threshold,
+        trace_level=trace_level,
+        flight_recorder=FlightRecorder(
+            dump_dir=log_dir,
+            trace_path=Path(args.record_trace).expanduser() if args.record_trace else None,
+        ),
+        layout_source=create_layout_source(args.layout_source, debug_event_logging=debug_events),
+        clipboard=create_clipboard_backend(args.clipboard_backend, debug_event_logging=debug_events),
+        timing_profiles=(
+            TimingProfileStore(
+                path=Path(args.timing_profiles_file).expanduser(),
+                debug_event_logging=debug_events,
+            )
+            if args.adaptive_timing
+            else None
+        ),
+        capabilities=(
+            CapabilityCache(
+                path=Path(args.capability_cache_file).expanduser(),
+                debug_event_logging=debug_events,
+            )
+            if args.capability_cache
+            else None
+        ),
+        keystroke_recorder=KeystrokeRecorder(debug_event_logging=debug_events) if args.retype_last_word else None,
+    )
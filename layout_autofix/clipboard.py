@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import logging
+import subprocess
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+from layout_autofix.lazy_imports import module_available, optional_module
+
+
+CLIPBOARD_BACKEND_KINDS = ("auto", "pasteboard", "subprocess", "x11")
+# The UTI behind NSPasteboardTypeString; also the only type pbpaste can see.
+TEXT_TYPE = "public.utf8-plain-text"
+DEFAULT_SNAPSHOT_MAX_BYTES = 64 * 1024 * 1024
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ClipboardSnapshot:
+    # Every pasteboard item as (type, data) pairs. Data stays in whatever form
+    # the backend read it: NSData handles for the pasteboard, raw bytes for
+    # pbpaste, str in memory. Nothing is decoded on the way in or out.
+    items: tuple[tuple[tuple[str, Any], ...], ...]
+    size: int
+    change_count: int | None = None
+    # Types left out to stay under the snapshot memory cap.
+    dropped_types: int = 0
+
+    @classmethod
+    def of_text(cls, text: str, change_count: int | None = None) -> ClipboardSnapshot:
+        return cls(items=(((TEXT_TYPE, text),),), size=len(text), change_count=change_count)
+
+    @property
+    def types(self) -> int:
+        return sum(len(item) for item in self.items)
+
+    def text(self) -> Any | None:
+        for item in self.items:
+            for pasteboard_type, data in item:
+                if pasteboard_type == TEXT_TYPE:
+                    return data
+        return None
+
+
+class ClipboardBackend(Protocol):
+    def read_text(self) -> str | None: ...
+
+    def write_text(self, text: str) -> bool: ...
+
+    def change_count(self) -> int | None: ...
+
+    # None when the clipboard cannot be read, or all of it is over ``max_bytes``.
+    def snapshot(self, max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES) -> ClipboardSnapshot | None: ...
+
+    def restore(self, snapshot: ClipboardSnapshot) -> bool: ...
+
+
+@dataclass
+class PasteboardClipboard:
+    debug_event_logging: bool = False
+
+    def read_text(self) -> str | None:
+        AppKit = optional_module("AppKit")
+        if AppKit is None:
+            return None
+        try:
+            with optional_module("objc").autorelease_pool():
+                value = AppKit.NSPasteboard.generalPasteboard().stringForType_(AppKit.NSPasteboardTypeString)
+                # pbpaste prints nothing for a clipboard without text; keep that contract.
+                return "" if value is None else str(value)
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_read_exception backend=pasteboard error=%r", exc)
+            return None
+
+    def write_text(self, text: str) -> bool:
+        AppKit = optional_module("AppKit")
+        if AppKit is None:
+            return False
+        try:
+            with optional_module("objc").autorelease_pool():
+                pasteboard = AppKit.NSPasteboard.generalPasteboard()
+                pasteboard.clearContents()
+                written = bool(pasteboard.setString_forType_(text, AppKit.NSPasteboardTypeString))
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_write_exception backend=pasteboard error=%r", exc)
+            return False
+        if not written and self.debug_event_logging:
+            _logger.debug("event=clipboard_write_failed backend=pasteboard")
+        return written
+
+    def change_count(self) -> int | None:
+        AppKit = optional_module("AppKit")
+        if AppKit is None:
+            return None
+        try:
+            return int(AppKit.NSPasteboard.generalPasteboard().changeCount())
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_change_count_exception backend=pasteboard error=%r", exc)
+            return None
+
+    def snapshot(self, max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES) -> ClipboardSnapshot | None:
+        AppKit = optional_module("AppKit")
+        if AppKit is None:
+            return None
+        try:
+            with optional_module("objc").autorelease_pool():
+                pasteboard = AppKit.NSPasteboard.generalPasteboard()
+                change_count = int(pasteboard.changeCount())
+                items: list[tuple[tuple[str, Any], ...]] = []
+                size = 0
+                dropped = 0
+                for item in pasteboard.pasteboardItems() or ():
+                    pairs: list[tuple[str, Any]] = []
+                    for pasteboard_type in item.types():
+                        # The NSData proxy keeps the bytes on the Objective-C side.
+                        data = item.dataForType_(pasteboard_type)
+                        if data is None:
+                            continue
+                        length = int(data.length())
+                        if size + length > max_bytes:
+                            dropped += 1
+                            continue
+                        size += length
+                        pairs.append((str(pasteboard_type), data))
+                    if pairs:
+                        items.append(tuple(pairs))
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_snapshot_exception backend=pasteboard error=%r", exc)
+            return None
+        if dropped and not items:
+            return None
+        return ClipboardSnapshot(tuple(items), size, change_count, dropped)
+
+    def restore(self, snapshot: ClipboardSnapshot) -> bool:
+        AppKit = optional_module("AppKit")
+        if AppKit is None:
+            return False
+        try:
+            with optional_module("objc").autorelease_pool():
+                pasteboard_items = []
+                for pairs in snapshot.items:
+                    pasteboard_item = AppKit.NSPasteboardItem.alloc().init()
+                    for pasteboard_type, data in pairs:
+                        pasteboard_item.setData_forType_(data, pasteboard_type)
+                    pasteboard_items.append(pasteboard_item)
+                pasteboard = AppKit.NSPasteboard.generalPasteboard()
+                pasteboard.clearContents()
+                written = not pasteboard_items or bool(pasteboard.writeObjects_(pasteboard_items))
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_restore_exception backend=pasteboard error=%r", exc)
+            return False
+        if not written and self.debug_event_logging:
+            _logger.debug("event=clipboard_restore_failed backend=pasteboard")
+        return written
+
+
+@dataclass
+class SubprocessClipboard:
+    debug_event_logging: bool = False
+    read_command: tuple[str, ...] = ("pbpaste",)
+    write_command: tuple[str, ...] = ("pbcopy",)
+    spawns: int = field(default=0, init=False)
+
+    def read_text(self) -> str | None:
+        self.spawns += 1
+        try:
+            result = subprocess.run(
+                list(self.read_command),
+                check=False,
+                capture_output=True,
+                text=True,
+            )
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_read_exception backend=subprocess error=%r", exc)
+            return None
+
+        if result.returncode != 0:
+            if self.debug_event_logging:
+                _logger.debug(
+                    "event=clipboard_read_failed backend=subprocess returncode=%s stderr=%r",
+                    result.returncode,
+                    result.stderr,
+                )
+            return None
+        return result.stdout
+
+    def write_text(self, text: str) -> bool:
+        self.spawns += 1
+        try:
+            result = subprocess.run(
+                list(self.write_command),
+                check=False,
+                input=text,
+                text=True,
+            )
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_write_exception backend=subprocess error=%r", exc)
+            return False
+
+        if result.returncode != 0:
+            if self.debug_event_logging:
+                _logger.debug(
+                    "event=clipboard_write_failed backend=subprocess returncode=%s stderr=%r",
+                    result.returncode,
+                    result.stderr,
+                )
+            return False
+        return True
+
+    def change_count(self) -> int | None:
+        # pbpaste has no way to expose the pasteboard change counter.
+        return None
+
+    def snapshot(self, max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES) -> ClipboardSnapshot | None:
+        # Raw bytes in and out: the payload is never decoded.
+        data = self._run(self.read_command, None, "snapshot")
+        if data is None or len(data) > max_bytes:
+            return None
+        return ClipboardSnapshot(items=(((TEXT_TYPE, data),),), size=len(data))
+
+    def restore(self, snapshot: ClipboardSnapshot) -> bool:
+        text = snapshot.text()
+        data = text.encode("utf-8") if isinstance(text, str) else bytes(text or b"")
+        return self._run(self.write_command, data, "restore") is not None
+
+    def _run(self, command: tuple[str, ...], data: bytes | None, operation: str) -> bytes | None:
+        self.spawns += 1
+        try:
+            result = subprocess.run(list(command), check=False, input=data, capture_output=True)
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_%s_exception backend=subprocess error=%r", operation, exc)
+            return None
+        if result.returncode != 0:
+            if self.debug_event_logging:
+                _logger.debug(
+                    "event=clipboard_%s_failed backend=subprocess returncode=%s stderr=%r",
+                    operation,
+                    result.returncode,
+                    result.stderr,
+                )
+            return None
+        return result.stdout
+
+
+@dataclass
+class InMemoryClipboard:
+    text: str | None = ""
+    reads: int = field(default=0, init=False)
+    writes: list[str] = field(default_factory=list, init=False)
+    changes: int = field(default=0, init=False)
+
+    def read_text(self) -> str | None:
+        self.reads += 1
+        return self.text
+
+    def write_text(self, text: str) -> bool:
+        self.writes.append(text)
+        self.text = text
+        self.changes += 1
+        return True
+
+    def change_count(self) -> int | None:
+        return self.changes
+
+    def snapshot(self, max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES) -> ClipboardSnapshot | None:
+        self.reads += 1
+        if self.text is None or len(self.text) > max_bytes:
+            return None
+        return ClipboardSnapshot.of_text(self.text, self.changes)
+
+    def restore(self, snapshot: ClipboardSnapshot) -> bool:
+        text = snapshot.text()
+        return self.write_text("" if text is None else str(text))
+
+
+def create_clipboard_backend(kind: str = "auto", *, debug_event_logging: bool = False) -> ClipboardBackend:
+    if kind not in CLIPBOARD_BACKEND_KINDS:
+        raise ValueError(f"clipboard backend must be one of {', '.join(CLIPBOARD_BACKEND_KINDS)}")
+    if kind == "pasteboard" or (kind == "auto" and module_available("AppKit")):
+        return PasteboardClipboard(debug_event_logging=debug_event_logging)
+    from layout_autofix.x11 import X11Clipboard, x11_available
+
+    if kind == "x11" or (kind == "auto" and x11_available()):
+        return X11Clipboard(debug_event_logging=debug_event_logging)
+    return SubprocessClipboard(debug_event_logging=debug_event_logging)
@@ -1,56 +1,130 @@
 from __future__ import annotations
 
+import sys
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
 
-EN_TO_RU: dict[str, str] = {
-    "`": "ё",
-    "q": "й",
-    "w": "ц",
-    "e": "у",
-    "r": "к",
-    "t": "е",
-    "y": "н",
-    "u": "г",
-    "i": "ш",
-    "o": "щ",
-    "p": "з",
-    "[": "х",
-    "]": "ъ",
-    "a": "ф",
-    "s": "ы",
-    "d": "в",
-    "f": "а",
-    "g": "п",
-    "h": "р",
-    "j": "о",
-    "k": "л",
-    "l": "д",
-    ";": "ж",
-    "'": "э",
-    "z": "я",
-    "x": "ч",
-    "c": "с",
-    "v": "м",
-    "b": "и",
-    "n": "т",
-    "m": "ь",
-    ",": "б",
-    ".": "ю",
-    "/": ".",
-}
-
-RU_TO_EN: dict[str, str] = {value: key for key, value in EN_TO_RU.items()}
-
-
-def switch_layout(word: str, to_layout: str) -> str:
-    if to_layout not in {"EN", "RUS"}:
-        raise ValueError("to_layout must be EN or RUS")
-
-    mapping = EN_TO_RU if to_layout == "RUS" else RU_TO_EN
-    converted: list[str] = []
-    for ch in word:
-        base = mapping.get(ch.lower())
-        if base is None:
-            converted.append(ch)
-            continue
-        converted.append(base.upper() if ch.isupper() else base)
-    return "".join(converted)
+from layout_autofix.layouts import build_translation_table, default_registry
+from layout_autofix.lazy_imports import optional_module
+
+__all__ = [
+    "BATCH_BACKENDS",
+    "build_translation_table",
+    "switch_layout",
+    "switch_layout_batch",
+]
+
+# Without an explicit source layout, conversion keeps its original EN <-> RUS meaning.
+_DEFAULT_SOURCE_LAYOUTS = {"RUS": "EN", "EN": "RUS"}
+BATCH_BACKENDS = ("auto", "python", "numpy")
+# Never a key in a layout table, so it survives translate() and splits the batch back apart.
+_BATCH_SEPARATOR = "\x00"
+# Layout tables top out in the Letterlike Symbols block; past the BMP a dense list is not worth it.
+_DENSE_TABLE_LIMIT = 0x10000
+
+
+def _translation_table(to_layout: str, from_layout: str | None) -> dict[int, str]:
+    if from_layout is None:
+        from_layout = _DEFAULT_SOURCE_LAYOUTS.get(to_layout)
+        if from_layout is None:
+            raise ValueError("to_layout must be EN or RUS when from_layout is not given")
+    return default_registry().translation_table(from_layout, to_layout)
+
+
+def switch_layout(word: str, to_layout: str, from_layout: str | None = None) -> str:
+    return word.translate(_translation_table(to_layout, from_layout))
+
+
+def switch_layout_batch(
+    words: Iterable[str] | Any,
+    to_layout: str,
+    from_layout: str | None = None,
+    *,
+    backend: str = "auto",
+) -> list[str] | Any:
+    # Converts many short strings with one table lookup and validation for the
+    # whole batch. Results keep input order: a list for Python sequences, an
+    # array of the same shape for a NumPy string array. "auto" only uses NumPy
+    # for input that already is an array; a list is faster through one joined
+    # str.translate than through a round trip into an array and back.
+    if backend not in BATCH_BACKENDS:
+        raise ValueError(f"backend must be one of: {', '.join(BATCH_BACKENDS)}")
+    table = _translation_table(to_layout, from_layout)
+    numpy = sys.modules.get("numpy")
+    is_array = numpy is not None and isinstance(words, numpy.ndarray)
+    if backend == "numpy" or (backend == "auto" and is_array):
+        numpy = optional_module("numpy")
+        if numpy is None:
+            raise RuntimeError("the numpy batch backend needs NumPy installed")
+        lookup = _numpy_lookup(numpy, table)
+        if not is_array and not isinstance(words, (list, tuple)):
+            words = list(words)
+        # Fixed-width arrays pad with NULs, so a word's own trailing NULs would be
+        # lost on the way in; such lists take the str.translate path instead.
+        if lookup is not None and (is_array or not any(word.endswith("\0") for word in words)):
+            converted = _switch_layout_array(numpy, numpy.asarray(words, dtype=str), lookup)
+            return converted if is_array else converted.tolist()
+    if is_array:
+        return numpy.asarray([word.translate(table) for word in words.reshape(-1).tolist()]).reshape(words.shape)
+    return _switch_layout_joined(words if isinstance(words, (list, tuple)) else list(words), table)
+
+
+def _switch_layout_joined(words: list[str] | tuple[str, ...], table: dict[int, str]) -> list[str]:
+    if not words:
+        return []
+    if ord(_BATCH_SEPARATOR) not in table:
+        parts = _BATCH_SEPARATOR.join(words).translate(_dense_table(table)).split(_BATCH_SEPARATOR)
+        # Only a word that itself contains the separator changes the part count.
+        if len(parts) == len(words):
+            return parts
+    return [word.translate(table) for word in words]
+
+
+def _dense_table(table: dict[int, str]) -> dict[int, str] | list[int]:
+    # translate() indexes a list of codepoints faster than it hashes into a dict
+    # of strings; codepoints past the end of the list are left unchanged.
+    size = max(table, default=-1) + 1
+    if size > _DENSE_TABLE_LIMIT or not all(isinstance(value, str) and len(value) == 1 for value in table.values()):
+        return table
+    dense = list(range(size))
+    for key, value in table.items():
+        dense[key] = ord(value)
+    return dense
+
+
+def _numpy_lookup(numpy: Any, table: dict[int, str]) -> Any | None:
+    # A codepoint -> codepoint array; None when some entry is not one character,
+    # which fixed-width string arrays cannot express.
+    if not all(isinstance(value, str) and len(value) == 1 for value in table.values()):
+        return None
+    lookup = numpy.arange(max(table, default=-1) + 1, dtype=numpy.uint32)
+    for key, value in table.items():
+        lookup[key] = ord(value)
+    return lookup
+
+
+def _switch_layout_array(numpy: Any, array: Any, lookup: Any) -> Any:
+    # Fixed-width unicode arrays are UCS-4, so the raw buffer is one uint32 per
+    # codepoint (padding NULs included) and the whole batch is one gather.
+    flat = numpy.ascontiguousarray(array).reshape(-1)
+    if not len(lookup) or not flat.size:
+        return flat.reshape(array.shape)
+    codes = flat.view(numpy.uint32)
+    mapped = numpy.where(codes < len(lookup), lookup[numpy.minimum(codes, len(lookup) - 1)], codes)
+    return mapped.astype(numpy.uint32, copy=False).view(flat.dtype).reshape(array.shape)
+
+
+_LEGACY_CHAR_MAPS = {"EN_TO_RU": ("EN", "RUS"), "RU_TO_EN": ("RUS", "EN")}
+
+
+def __getattr__(name: str) -> Mapping[str, str]:
+    # Compatibility shim: EN_TO_RU and RU_TO_EN used to be module-level dicts. The
+    # maps now come from the layout registry's data files, so they are built on
+    # first access (not at import, which would load the registry) and cached.
+    # They are read-only: editing them never changed the registered layouts.
+    layouts = _LEGACY_CHAR_MAPS.get(name)
+    if layouts is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    char_map = MappingProxyType(default_registry().char_map(*layouts))
+    globals()[name] = char_map
+    return char_map
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, TextIO
+
+from layout_autofix.logging_setup import DEFAULT_LOG_FILE
+
+
+DEFAULT_DUMP_DIR = DEFAULT_LOG_FILE.parent
+DEFAULT_CAPACITY = 4096
+DUMP_FILE_PREFIX = "flight-recorder-"
+
+_logger = logging.getLogger(__name__)
+_signal_sockets: tuple[socket.socket, socket.socket] | None = None
+
+
+@dataclass
+class FlightRecorder:
+    # Always-on ring of the last ``capacity`` events: a code, a monotonic
+    # timestamp and a few numbers or method names. Never selection or clipboard
+    # text, so it can stay on when verbose logging is off.
+    capacity: int = DEFAULT_CAPACITY
+    dump_dir: Path = DEFAULT_DUMP_DIR
+    max_dumps: int = 10
+    clock: Callable[[], float] = time.monotonic
+    # When set, every event is also appended to this JSONL file as it happens,
+    # in the dump format: a session trace for ``layout-autofix replay``.
+    trace_path: Path | None = None
+    _events: deque[tuple[float, str, dict[str, object] | None]] = field(default_factory=deque, init=False)
+    _dump_lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+    _trace: TextIO | None = field(default=None, init=False)
+    _trace_lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def __post_init__(self) -> None:
+        self._events = deque(maxlen=self.capacity)
+        if self.trace_path is not None:
+            self._open_trace(self.trace_path)
+
+    def record(self, event: str, **fields: object) -> None:
+        # deque.append is atomic, so recording needs no lock.
+        timestamp = self.clock()
+        self._events.append((timestamp, event, fields or None))
+        if self._trace is not None:
+            self._write_trace({"t": timestamp, "event": event, **fields})
+
+    def events(self) -> list[dict[str, object]]:
+        # deque.copy runs without releasing the GIL: a consistent snapshot.
+        return [
+            {"t": timestamp, "event": event, **(fields or {})}
+            for timestamp, event, fields in self._events.copy()
+        ]
+
+    def dump(self, reason: str) -> Path | None:
+        events = self.events()
+        header = {
+            "event": "flight_recorder_dump",
+            "reason": reason,
+            "pid": os.getpid(),
+            "monotonic_now": self.clock(),
+            "wall_now": time.time(),
+            "events": len(events),
+            "capacity": self.capacity,
+        }
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        with self._dump_lock:
+            try:
+                self.dump_dir.mkdir(parents=True, exist_ok=True)
+                path = self._unused_path(f"{DUMP_FILE_PREFIX}{stamp}-{reason}")
+                with path.open("w", encoding="utf-8") as handle:
+                    for record in (header, *events):
+                        handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._prune_old_dumps()
+            except OSError as exc:
+                _logger.warning("event=flight_recorder_dump_failed reason=%s error=%r", reason, exc)
+                return None
+        _logger.info("event=flight_recorder_dumped reason=%s events=%s path=%s", reason, len(events), path)
+        return path
+
+    def close(self) -> None:
+        with self._trace_lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+    def _open_trace(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._trace = path.open("a", encoding="utf-8", buffering=1)
+        except OSError as exc:
+            _logger.warning("event=session_trace_open_failed path=%s error=%r", path, exc)
+            return
+        self._write_trace(
+            {
+                "event": "session_trace_started",
+                "pid": os.getpid(),
+                "monotonic_now": self.clock(),
+                "wall_now": time.time(),
+            }
+        )
+        _logger.info("event=session_trace_started path=%s", path)
+
+    def _write_trace(self, record: dict[str, object]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._trace_lock:
+            if self._trace is None:
+                return
+            try:
+                self._trace.write(line)
+            except OSError as exc:
+                _logger.warning("event=session_trace_write_failed error=%r", exc)
+                self._trace.close()
+                self._trace = None
+
+    def _unused_path(self, stem: str) -> Path:
+        path = self.dump_dir / f"{stem}.jsonl"
+        index = 1
+        while path.exists():
+            index += 1
+            path = self.dump_dir / f"{stem}-{index}.jsonl"
+        return path
+
+    def _prune_old_dumps(self) -> None:
+        dumps = sorted(self.dump_dir.glob(f"{DUMP_FILE_PREFIX}*.jsonl"), key=lambda path: path.stat().st_mtime)
+        for path in dumps[: max(0, len(dumps) - self.max_dumps)]:
+            path.unlink(missing_ok=True)
+
+
+def install_dump_signal(dump: Callable[[str], object], signum: int = signal.SIGUSR1) -> None:
+    # Must be called from the main thread. A plain handler would only run once
+    # the main thread executes Python again, which under the Cocoa run loop can
+    # take arbitrarily long; the wakeup fd lets a helper thread react at once.
+    global _signal_sockets
+    reader, writer = socket.socketpair()
+    writer.setblocking(False)
+    signal.signal(signum, lambda _signum, _frame: None)
+    signal.set_wakeup_fd(writer.fileno(), warn_on_full_buffer=False)
+
+    def wait_for_signals() -> None:
+        while True:
+            received = reader.recv(64)
+            if not received:
+                return
+            if signum in received:
+                try:
+                    dump("signal")
+                except Exception:
+                    _logger.exception("event=flight_recorder_signal_dump_failed")
+
+    # The write end has to stay open for as long as the wakeup fd points at it.
+    _signal_sockets = (reader, writer)
+    threading.Thread(target=wait_for_signals, name="layout-autofix-signals", daemon=True).start()
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import logging
+import sys
+
+from layout_autofix.lazy_imports import optional_module
+
+
+_logger = logging.getLogger(__name__)
+
+
+def frontmost_application_id(*, debug_event_logging: bool = False) -> str | None:
+    # NSWorkspace.frontmostApplication is only refreshed by a running main run
+    # loop, which the CLI does not have; the accessibility focus is always current.
+    if sys.platform.startswith("linux"):
+        from layout_autofix.x11 import focused_window_class, x11_available
+
+        return focused_window_class(debug_event_logging=debug_event_logging) if x11_available() else None
+    AppKit = optional_module("AppKit")
+    if AppKit is None:
+        return None
+    try:
+        pid = _focused_application_pid()
+        if pid is not None:
+            application = AppKit.NSRunningApplication.runningApplicationWithProcessIdentifier_(pid)
+        else:
+            application = AppKit.NSWorkspace.sharedWorkspace().frontmostApplication()
+        if application is None:
+            return None
+        bundle_id = application.bundleIdentifier() or application.localizedName()
+        return None if bundle_id is None else str(bundle_id)
+    except Exception as exc:
+        if debug_event_logging:
+            _logger.debug("event=frontmost_app_failed error=%r", exc)
+        return None
+
+
+def _focused_application_pid() -> int | None:
+    HIServices = optional_module("HIServices")
+    if HIServices is None:
+        return None
+    system = HIServices.AXUIElementCreateSystemWide()
+    err, application = HIServices.AXUIElementCopyAttributeValue(
+        system,
+        HIServices.kAXFocusedApplicationAttribute,
+        None,
+    )
+    if err != HIServices.kAXErrorSuccess or application is None:
+        return None
+    err, pid = HIServices.AXUIElementGetPid(application, None)
+    if err != HIServices.kAXErrorSuccess:
+        return None
+    return int(pid)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import ctypes
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Iterator
+
+
+DEFAULT_MAX_CHARS = 64
+# How long after sending its own keys the recorder still attributes injected keys to them.
+_OWN_INPUT_GRACE_SECONDS = 0.5
+# Keys that change neither the text nor the caret. Option types characters on
+# macOS, so it only matters through the character it produces.
+_OPTION_KEYS = frozenset({"alt", "alt_l", "alt_r", "alt_gr"})
+_TEXT_MODIFIERS = frozenset({"shift", "shift_l", "shift_r", "caps_lock"}) | _OPTION_KEYS
+# Held down, these turn the next key into a shortcut.
+_SHORTCUT_MODIFIERS = frozenset({"cmd", "cmd_l", "cmd_r", "ctrl", "ctrl_l", "ctrl_r"})
+
+_logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _carbon() -> Any | None:
+    if sys.platform != "darwin":
+        return None
+    try:
+        library = ctypes.CDLL("/System/Library/Frameworks/Carbon.framework/Carbon")
+    except OSError:
+        return None
+    library.IsSecureEventInputEnabled.restype = ctypes.c_bool
+    return library
+
+
+def secure_event_input_enabled() -> bool:
+    # Set by password fields (and terminals on request) while they have focus.
+    carbon = _carbon()
+    return carbon is not None and bool(carbon.IsSecureEventInputEnabled())
+
+
+@dataclass(frozen=True)
+class TypedWord:
+    word: str
+    # Spaces typed after the word; they are retyped after the converted word.
+    trailing: str
+    version: int
+
+    @property
+    def length(self) -> int:
+        return len(self.word) + len(self.trailing)
+
+
+@dataclass
+class TypedWordBuffer:
+    # The characters typed since the last caret jump, newest last. Appending
+    # and deleting are O(1); past ``max_chars`` the oldest characters drop out.
+    # Only held in memory, never written anywhere.
+    max_chars: int = DEFAULT_MAX_CHARS
+    _chars: deque[str] = field(init=False)
+    _version: int = field(default=0, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def __post_init__(self) -> None:
+        if self.max_chars < 2:
+            raise ValueError("max_chars must be at least 2")
+        self._chars = deque(maxlen=self.max_chars)
+
+    def __len__(self) -> int:
+        return len(self._chars)
+
+    def type_char(self, char: str) -> None:
+        with self._lock:
+            self._chars.append(char)
+            self._version += 1
+
+    def backspace(self) -> None:
+        with self._lock:
+            if self._chars:
+                self._chars.pop()
+            self._version += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chars.clear()
+            self._version += 1
+
+    def last_word(self) -> TypedWord | None:
+        # None when nothing but spaces was typed, or when the word reaches back
+        # past the oldest character kept and so may have lost its beginning.
+        with self._lock:
+            chars = list(self._chars)
+            version = self._version
+        end = len(chars)
+        while end and chars[end - 1] == " ":
+            end -= 1
+        start = end
+        while start and chars[start - 1] != " ":
+            start -= 1
+        if start == end or (start == 0 and len(chars) == self.max_chars):
+            return None
+        return TypedWord("".join(chars[start:end]), "".join(chars[end:]), version)
+
+    def replace(self, typed: TypedWord, text: str) -> bool:
+        # Swaps the word for what was retyped over it, unless anything was typed since.
+        with self._lock:
+            if self._version != typed.version:
+                return False
+            for _ in range(typed.length):
+                self._chars.pop()
+            self._chars.extend(text)
+            self._version += 1
+            return True
+
+    def unchanged_since(self, typed: TypedWord) -> bool:
+        return self._version == typed.version
+
+
+@dataclass
+class KeystrokeRecorder:
+    # Feeds a TypedWordBuffer from a global pynput keyboard listener. Anything
+    # that may move the caret or the focus (clicks, arrows, Return, Tab,
+    # shortcuts, keys typed by other programs) empties the buffer.
+    buffer: TypedWordBuffer = field(default_factory=TypedWordBuffer)
+    debug_event_logging: bool = False
+    secure_input: Callable[[], bool] = secure_event_input_enabled
+    clock: Callable[[], float] = time.monotonic
+    _held_modifiers: set[str] = field(default_factory=set, init=False)
+    _own_input_until: float = field(default=0.0, init=False)
+    _listeners: list[Any] = field(default_factory=list, init=False)
+
+    def start(self) -> None:
+        if self._listeners:
+            return
+        from pynput import keyboard, mouse
+
+        self._listeners = [
+            keyboard.Listener(on_press=self._on_press, on_release=self._on_release),
+            mouse.Listener(on_click=self._on_click),
+        ]
+        for listener in self._listeners:
+            listener.start()
+        _logger.info("event=keystroke_recorder_started max_chars=%s", self.buffer.max_chars)
+
+    def stop(self) -> None:
+        for listener in self._listeners:
+            listener.stop()
+        self._listeners = []
+        self.buffer.clear()
+
+    @contextmanager
+    def own_input(self) -> Iterator[None]:
+        # Injected keys seen while this is open, and shortly after, are the
+        # fixer's own retyping; any other injected key empties the buffer.
+        self._own_input_until = float("inf")
+        try:
+            yield
+        finally:
+            self._own_input_until = self.clock() + _OWN_INPUT_GRACE_SECONDS
+
+    def key_pressed(self, key: str | None, *, injected: bool = False) -> None:
+        # ``key`` is the typed character, or a pynput ``Key`` name such as "space".
+        if injected:
+            if self.clock() >= self._own_input_until:
+                self._reset("injected")
+            return
+        if key in _SHORTCUT_MODIFIERS or key in _TEXT_MODIFIERS:
+            self._held_modifiers.add(key)
+            return
+        if self.secure_input():
+            self._reset("secure_input")
+            return
+        shortcut = not _SHORTCUT_MODIFIERS.isdisjoint(self._held_modifiers)
+        if key == "space":
+            if not shortcut:
+                self.buffer.type_char(" ")
+            # Otherwise most likely the input source hotkey itself (Ctrl+Space).
+            return
+        if shortcut:
+            self._reset("shortcut")
+        elif key == "backspace":
+            if not _OPTION_KEYS.isdisjoint(self._held_modifiers):
+                # Option+Backspace deletes a whole word.
+                self._reset("key")
+            else:
+                self.buffer.backspace()
+        elif key is not None and len(key) == 1 and key.isprintable():
+            self.buffer.type_char(key)
+        else:
+            self._reset("key")
+
+    def key_released(self, key: str | None) -> None:
+        self._held_modifiers.discard(key)
+
+    def mouse_clicked(self) -> None:
+        self._reset("click")
+
+    def _reset(self, reason: str) -> None:
+        if not len(self.buffer):
+            return
+        self.buffer.clear()
+        if self.debug_event_logging:
+            _logger.debug("event=keystroke_buffer_reset reason=%s", reason)
+
+    def _on_press(self, key: Any, injected: bool = False) -> None:
+        self.key_pressed(_key_name(key), injected=injected)
+
+    def _on_release(self, key: Any, injected: bool = False) -> None:
+        if not injected:
+            self.key_released(_key_name(key))
+
+    def _on_click(self, _x: int, _y: int, _button: Any, pressed: bool, injected: bool = False) -> None:
+        if pressed and not injected:
+            self.mouse_clicked()
+
+
+def _key_name(key: Any) -> str | None:
+    char = getattr(key, "char", None)
+    return char if char else getattr(key, "name", None)
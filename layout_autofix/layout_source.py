@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import logging
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Protocol
+
+from layout_autofix.layouts import default_registry
+from layout_autofix.lazy_imports import module_available, optional_module
+
+
+INPUT_SOURCE_CHANGED_NOTIFICATION = "com.apple.Carbon.TISNotifySelectedKeyboardInputSourceChanged"
+HITOOLBOX_DOMAIN = "com.apple.HIToolbox"
+LAYOUT_SOURCE_KINDS = ("auto", "notification", "poll", "xkb")
+
+_logger = logging.getLogger(__name__)
+
+
+class LayoutSource(Protocol):
+    def start(self) -> None: ...
+
+    def stop(self) -> None: ...
+
+    def current_layout(self) -> str | None: ...
+
+    def wait_for_change(self, timeout: float) -> bool: ...
+
+
+def resolve_layout_name(name: str, *, debug_event_logging: bool = False) -> str | None:
+    layout = default_registry().resolve_name(name)
+    if layout is None and debug_event_logging:
+        _logger.debug("event=layout_unknown current_layout_name=%r", name.strip().strip('"').lower())
+    return layout
+
+
+def selected_layout_name(*, debug_event_logging: bool = False) -> str | None:
+    # The AppleSelectedInputSources that `defaults read` prints, read in-process
+    # through CFPreferences. TIS calls are not used: recent macOS only allows them
+    # on the main thread, and the notification observer runs on its own.
+    # None when CoreFoundation is unavailable or the read fails.
+    CoreFoundation = optional_module("CoreFoundation")
+    if CoreFoundation is None:
+        return None
+    try:
+        CoreFoundation.CFPreferencesAppSynchronize(HITOOLBOX_DOMAIN)
+        sources = CoreFoundation.CFPreferencesCopyAppValue("AppleSelectedInputSources", HITOOLBOX_DOMAIN)
+        layout_names = [
+            str(source["KeyboardLayout Name"]) for source in sources or () if "KeyboardLayout Name" in source
+        ]
+    except Exception as exc:
+        if debug_event_logging:
+            _logger.debug("event=layout_preferences_read_failed error=%r", exc)
+        return None
+    return layout_names[-1] if layout_names else None
+
+
+def read_layout_from_defaults(*, debug_event_logging: bool = False) -> str | None:
+    try:
+        output = subprocess.check_output(
+            ["defaults", "read", HITOOLBOX_DOMAIN, "AppleSelectedInputSources"],
+            text=True,
+        )
+    except Exception as exc:
+        if debug_event_logging:
+            _logger.debug("event=layout_read_failed error=%r", exc)
+        return None
+
+    layout_names = re.findall(r'"KeyboardLayout Name"\s*=\s*([^;]+);', output)
+    if not layout_names:
+        if debug_event_logging:
+            _logger.debug("event=layout_parse_failed reason=no_layout_names")
+        return None
+
+    return resolve_layout_name(layout_names[-1], debug_event_logging=debug_event_logging)
+
+
+@dataclass
+class DefaultsPollingLayoutSource:
+    debug_event_logging: bool = False
+    spawns: int = field(default=0, init=False)
+    _stopped: threading.Event = field(default_factory=threading.Event, init=False)
+
+    def start(self) -> None:
+        self._stopped.clear()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def current_layout(self) -> str | None:
+        self.spawns += 1
+        return read_layout_from_defaults(debug_event_logging=self.debug_event_logging)
+
+    def wait_for_change(self, timeout: float) -> bool:
+        # Polling cannot know about changes in advance: every tick is a candidate.
+        self._stopped.wait(timeout)
+        return True
+
+
+@dataclass
+class InputSourceNotificationLayoutSource:
+    debug_event_logging: bool = False
+    resync_interval_seconds: float = 5.0
+    read_layout: Callable[[], str | None] | None = None
+    spawns: int = field(default=0, init=False)
+    _layout: str | None = field(default=None, init=False)
+    _last_read_at: float | None = field(default=None, init=False)
+    _changed: threading.Event = field(default_factory=threading.Event, init=False)
+    _stopped: threading.Event = field(default_factory=threading.Event, init=False)
+    _thread: threading.Thread | None = field(default=None, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def start(self) -> None:
+        if optional_module("Foundation") is None:
+            raise RuntimeError("Foundation is required for input-source notifications")
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._observe_notifications,
+            name="layout-autofix-input-source",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._changed.set()
+        self._thread = None
+
+    def current_layout(self) -> str | None:
+        with self._lock:
+            stale = (
+                self._last_read_at is None
+                or time.monotonic() - self._last_read_at >= self.resync_interval_seconds
+            )
+        if stale:
+            # Safety net in case a notification is ever missed.
+            self._refresh_layout()
+        return self._layout
+
+    def wait_for_change(self, timeout: float) -> bool:
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+    def _refresh_layout(self) -> None:
+        reader = self.read_layout if self.read_layout is not None else self._read_current_layout
+        layout = reader()
+        with self._lock:
+            self._layout = layout
+            self._last_read_at = time.monotonic()
+
+    def _read_current_layout(self) -> str | None:
+        name = selected_layout_name(debug_event_logging=self.debug_event_logging)
+        if name is not None:
+            return resolve_layout_name(name, debug_event_logging=self.debug_event_logging)
+        # Only when the preferences cannot be read in-process.
+        self.spawns += 1
+        return read_layout_from_defaults(debug_event_logging=self.debug_event_logging)
+
+    def _on_input_source_changed(self) -> None:
+        self._refresh_layout()
+        if self.debug_event_logging:
+            _logger.debug("event=input_source_notification layout=%s", self._layout)
+        self._changed.set()
+
+    def _observe_notifications(self) -> None:  # pragma: no cover - depends on macOS runtime
+        Foundation = optional_module("Foundation")
+        observer = _input_source_observer_class().alloc().initWithCallback_(self._on_input_source_changed)
+        center = Foundation.NSDistributedNotificationCenter.defaultCenter()
+        center.addObserver_selector_name_object_(
+            observer,
+            "inputSourceChanged:",
+            INPUT_SOURCE_CHANGED_NOTIFICATION,
+            None,
+        )
+        run_loop = Foundation.NSRunLoop.currentRunLoop()
+        try:
+            while not self._stopped.is_set():
+                run_loop.runMode_beforeDate_(
+                    Foundation.NSDefaultRunLoopMode,
+                    Foundation.NSDate.dateWithTimeIntervalSinceNow_(0.5),
+                )
+        finally:
+            center.removeObserver_(observer)
+
+
+@lru_cache(maxsize=None)
+def _input_source_observer_class() -> type:  # pragma: no cover - depends on macOS runtime
+    # Defined on first use: an NSObject subclass needs Foundation loaded, and an
+    # Objective-C class name can only be registered once per process.
+    objc = optional_module("objc")
+    Foundation = optional_module("Foundation")
+
+    class _InputSourceObserver(Foundation.NSObject):
+        def initWithCallback_(self, callback: Callable[[], None]):
+            self = objc.super(_InputSourceObserver, self).init()
+            if self is None:
+                return None
+            self._callback = callback
+            return self
+
+        def inputSourceChanged_(self, _notification: object) -> None:
+            try:
+                self._callback()
+            except Exception:
+                _logger.exception("event=input_source_notification_exception")
+
+    return _InputSourceObserver
+
+
+@dataclass
+class InMemoryLayoutSource:
+    layout: str | None = None
+    push_notifications: bool = True
+    _changed: threading.Event = field(default_factory=threading.Event, init=False)
+    _stopped: threading.Event = field(default_factory=threading.Event, init=False)
+
+    def start(self) -> None:
+        self._stopped.clear()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._changed.set()
+
+    def current_layout(self) -> str | None:
+        return self.layout
+
+    def set_layout(self, layout: str | None) -> None:
+        self.layout = layout
+        if self.push_notifications:
+            self._changed.set()
+
+    def wait_for_change(self, timeout: float) -> bool:
+        if not self.push_notifications:
+            self._stopped.wait(timeout)
+            return True
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+
+def create_layout_source(kind: str = "auto", *, debug_event_logging: bool = False) -> LayoutSource:
+    if kind not in LAYOUT_SOURCE_KINDS:
+        raise ValueError(f"layout source must be one of {', '.join(LAYOUT_SOURCE_KINDS)}")
+    if kind == "notification" or (kind == "auto" and module_available("Foundation")):
+        return InputSourceNotificationLayoutSource(debug_event_logging=debug_event_logging)
+    # The X11 backends import layout_source themselves; load them only when asked for.
+    from layout_autofix.x11 import XkbLayoutSource, x11_available
+
+    if kind == "xkb" or (kind == "auto" and x11_available()):
+        return XkbLayoutSource(debug_event_logging=debug_event_logging)
+    return DefaultsPollingLayoutSource(debug_event_logging=debug_event_logging)
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import hashlib
+import html
+import json
+import logging
+import marshal
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+
+DEFAULT_LAYOUTS_DIR = Path(__file__).resolve().parent / "data" / "layouts"
+USER_KEYLAYOUTS_DIR = Path.home() / "Library" / "Keyboard Layouts"
+
+# macOS virtual key codes of the ANSI main block, row by row; layout data files
+# list one character per position in this order.
+KEY_POSITIONS: tuple[int, ...] = (
+    50, 18, 19, 20, 21, 23, 22, 26, 28, 25, 29, 27, 24,
+    12, 13, 14, 15, 17, 16, 32, 34, 31, 35, 33, 30, 42,
+    0, 1, 2, 3, 5, 4, 38, 40, 37, 41, 39,
+    6, 7, 8, 9, 11, 45, 46, 43, 47, 44,
+)
+
+# Characters outside the plain upper-case variants whose str.lower() lands on a
+# mapped key (KELVIN SIGN -> "k"); the tables must treat them like a lower() lookup.
+_CASE_ALIASES = ("\u212a",)
+_CACHE_FORMAT_VERSION = 1
+_CONTROL_CHAR_REFERENCE = re.compile(r"&#(x[0-9a-fA-F]+|[0-9]+);")
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LayoutDefinition:
+    layout_id: str
+    names: tuple[str, ...]
+    keys: dict[int, str]
+
+
+def build_translation_table(mapping: dict[str, str]) -> dict[int, str]:
+    table: dict[int, str] = {}
+    for key, value in mapping.items():
+        table[ord(key)] = value
+
+    candidates = {key.upper() for key in mapping}
+    candidates.update(_CASE_ALIASES)
+    for ch in candidates:
+        if len(ch) != 1 or ch.lower() == ch or ord(ch) in table:
+            continue
+        base = mapping.get(ch.lower())
+        if base is None:
+            continue
+        table[ord(ch)] = base.upper() if ch.isupper() else base
+    return table
+
+
+def layout_char_map(source: LayoutDefinition, target: LayoutDefinition) -> dict[str, str]:
+    mapping: dict[str, str] = {}
+    for keycode, source_char in source.keys.items():
+        target_char = target.keys.get(keycode)
+        if target_char is None or target_char == source_char or source_char in mapping:
+            continue
+        mapping[source_char] = target_char
+    return mapping
+
+
+def load_layout_file(path: Path, data: bytes | None = None) -> LayoutDefinition:
+    if data is None:
+        data = path.read_bytes()
+    if path.suffix == ".keylayout":
+        return parse_keylayout(data)
+
+    payload = json.loads(data.decode("utf-8"))
+    keys = payload["keys"]
+    if len(keys) != len(KEY_POSITIONS):
+        raise ValueError(f"{path.name}: expected {len(KEY_POSITIONS)} keys, got {len(keys)}")
+    return LayoutDefinition(
+        layout_id=payload["id"],
+        names=tuple(name.lower() for name in payload["names"]),
+        keys=dict(zip(KEY_POSITIONS, keys)),
+    )
+
+
+def parse_keylayout(data: bytes) -> LayoutDefinition:
+    # Apple's keylayout files routinely reference control characters (&#x0008;),
+    # which XML 1.0 parsers reject; they never matter for text conversion.
+    text = _CONTROL_CHAR_REFERENCE.sub(_drop_control_reference, data.decode("utf-8"))
+    root = ET.fromstring(text)
+    name = root.get("name") or "keylayout"
+
+    base_map_index = 0
+    modifier_map = root.find("modifierMap")
+    if modifier_map is not None:
+        for select in modifier_map.findall("keyMapSelect"):
+            if any(not (modifier.get("keys") or "").strip() for modifier in select.findall("modifier")):
+                base_map_index = int(select.get("mapIndex", "0"))
+                break
+
+    actions: dict[str, str] = {}
+    for action in root.iter("action"):
+        for when in action.findall("when"):
+            if when.get("state") == "none" and when.get("output") is not None:
+                actions[action.get("id", "")] = when.get("output", "")
+
+    key_map_sets = {key_map_set.get("id"): key_map_set for key_map_set in root.findall("keyMapSet")}
+    layout = root.find("layouts/layout")
+    key_map_set = key_map_sets.get(layout.get("mapSet")) if layout is not None else None
+    if key_map_set is None and key_map_sets:
+        key_map_set = next(iter(key_map_sets.values()))
+    if key_map_set is None:
+        raise ValueError(f"{name}: keylayout has no keyMapSet")
+
+    keys: dict[int, str] = {}
+    key_map = _find_key_map(key_map_set, base_map_index)
+    if key_map is not None and key_map.get("baseMapSet") in key_map_sets:
+        base = _find_key_map(key_map_sets[key_map.get("baseMapSet")], int(key_map.get("baseIndex", "0")))
+        if base is not None:
+            keys.update(_key_map_outputs(base, actions))
+    if key_map is not None:
+        keys.update(_key_map_outputs(key_map, actions))
+
+    return LayoutDefinition(
+        layout_id=re.sub(r"\s+", "-", name.strip()).upper(),
+        names=(name.strip().lower(),),
+        keys={keycode: ch for keycode, ch in keys.items() if keycode in KEY_POSITIONS},
+    )
+
+
+def _drop_control_reference(match: re.Match[str]) -> str:
+    reference = match.group(1)
+    codepoint = int(reference[1:], 16) if reference[0] in "xX" else int(reference)
+    if codepoint < 0x20 and codepoint not in (0x09, 0x0A, 0x0D):
+        return ""
+    return match.group(0)
+
+
+def _find_key_map(key_map_set: ET.Element, index: int) -> ET.Element | None:
+    for key_map in key_map_set.findall("keyMap"):
+        if int(key_map.get("index", "-1")) == index:
+            return key_map
+    return None
+
+
+def _key_map_outputs(key_map: ET.Element, actions: dict[str, str]) -> dict[int, str]:
+    outputs: dict[int, str] = {}
+    for key in key_map.findall("key"):
+        output = key.get("output")
+        if output is None and key.get("action") is not None:
+            output = actions.get(key.get("action", ""))
+        if output is None:
+            continue
+        output = html.unescape(output)
+        if len(output) == 1 and output.isprintable():
+            outputs[int(key.get("code", "-1"))] = output
+    return outputs
+
+
+class LayoutRegistry:
+    def __init__(
+        self,
+        definitions: Iterable[LayoutDefinition],
+        tables: dict[tuple[str, str], dict[int, str]] | None = None,
+    ) -> None:
+        self.layouts: dict[str, LayoutDefinition] = {}
+        for definition in definitions:
+            self.layouts[definition.layout_id] = definition
+        self._aliases = sorted(
+            ((alias, layout_id) for layout_id, layout in self.layouts.items() for alias in layout.names),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self._tables = tables if tables is not None else self._compile_tables()
+
+    @classmethod
+    def load(
+        cls,
+        directories: Iterable[Path] = (DEFAULT_LAYOUTS_DIR,),
+        *,
+        cache_dir: Path | None = None,
+    ) -> LayoutRegistry:
+        # Later directories override earlier ones when layout ids collide.
+        files = [
+            path
+            for directory in directories
+            if directory.is_dir()
+            for path in sorted(directory.iterdir())
+            if path.suffix in {".json", ".keylayout"}
+        ]
+        contents = [(path, path.read_bytes()) for path in files]
+        digest = hashlib.sha256(str(_CACHE_FORMAT_VERSION).encode("ascii"))
+        for path, content in contents:
+            digest.update(path.name.encode("utf-8"))
+            digest.update(hashlib.sha256(content).digest())
+        cache_file = None if cache_dir is None else cache_dir / f"layout-tables-{digest.hexdigest()[:16]}.marshal"
+
+        if cache_file is not None:
+            cached = _read_cache(cache_file)
+            if cached is not None:
+                return cached
+
+        definitions: list[LayoutDefinition] = []
+        for path, content in contents:
+            try:
+                definitions.append(load_layout_file(path, content))
+            except Exception as exc:
+                _logger.warning("event=layout_definition_invalid path=%s error=%r", path, exc)
+        registry = cls(definitions)
+        if cache_file is not None:
+            _write_cache(cache_file, registry)
+        return registry
+
+    def resolve_name(self, name: str) -> str | None:
+        current_name = name.strip().strip('"').lower()
+        for alias, layout_id in self._aliases:
+            if alias in current_name:
+                return layout_id
+        return None
+
+    def translation_table(self, source: str, target: str) -> dict[int, str]:
+        if source == target and source in self.layouts:
+            return {}
+        table = self._tables.get((source, target))
+        if table is None:
+            raise ValueError(f"unknown layout pair: {source} -> {target}")
+        return table
+
+    def char_map(self, source: str, target: str) -> dict[str, str]:
+        return layout_char_map(self.layouts[source], self.layouts[target])
+
+    def _compile_tables(self) -> dict[tuple[str, str], dict[int, str]]:
+        tables: dict[tuple[str, str], dict[int, str]] = {}
+        for source_id, source in self.layouts.items():
+            for target_id, target in self.layouts.items():
+                if source_id != target_id:
+                    tables[(source_id, target_id)] = build_translation_table(layout_char_map(source, target))
+        return tables
+
+
+def _read_cache(cache_file: Path) -> LayoutRegistry | None:
+    try:
+        payload = marshal.loads(cache_file.read_bytes())
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        _logger.warning("event=layout_cache_invalid path=%s error=%r", cache_file, exc)
+        return None
+    definitions = [
+        LayoutDefinition(layout_id, tuple(names), dict(keys))
+        for layout_id, names, keys in payload["layouts"]
+    ]
+    return LayoutRegistry(definitions, tables=payload["tables"])
+
+
+def _write_cache(cache_file: Path, registry: LayoutRegistry) -> None:
+    payload = {
+        "layouts": [(layout.layout_id, layout.names, layout.keys) for layout in registry.layouts.values()],
+        "tables": registry._tables,
+    }
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        for stale in cache_file.parent.glob("layout-tables-*.marshal"):
+            stale.unlink()
+        temporary = cache_file.with_suffix(".tmp")
+        temporary.write_bytes(marshal.dumps(payload))
+        temporary.replace(cache_file)
+    except OSError as exc:
+        _logger.warning("event=layout_cache_write_failed path=%s error=%r", cache_file, exc)
+
+
+_default_registry: LayoutRegistry | None = None
+
+
+def default_cache_dir() -> Path:
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "LayoutAutofix"
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "layout-autofix"
+
+
+def default_registry() -> LayoutRegistry:
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = LayoutRegistry.load((DEFAULT_LAYOUTS_DIR, USER_KEYLAYOUTS_DIR))
+    return _default_registry
+
+
+def load_default_registry(
+    extra_directories: Iterable[Path] = (),
+    *,
+    cache_dir: Path | None = None,
+) -> LayoutRegistry:
+    # Only the entry points pass a cache_dir: library calls never touch the disk.
+    global _default_registry
+    _default_registry = LayoutRegistry.load(
+        (DEFAULT_LAYOUTS_DIR, USER_KEYLAYOUTS_DIR, *extra_directories),
+        cache_dir=cache_dir,
+    )
+    return _default_registry
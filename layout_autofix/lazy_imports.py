@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+from functools import lru_cache
+from types import ModuleType
+
+
+@lru_cache(maxsize=None)
+def optional_module(name: str) -> ModuleType | None:
+    # PyObjC frameworks take tens of milliseconds each to load. Importing them on
+    # the first call that needs one keeps --help, the login launch and the
+    # status item from paying for code paths that have not run yet.
+    try:
+        return importlib.import_module(name)
+    except Exception:  # pragma: no cover - depends on macOS runtime
+        return None
+
+
+@lru_cache(maxsize=None)
+def module_available(name: str) -> bool:
+    # Picks a backend without importing it: the import waits for its first call.
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
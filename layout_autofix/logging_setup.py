@@ -1,11 +1,121 @@
 from __future__ import annotations
 
+import atexit
+import gzip
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
+from layout_autofix.state_files import default_log_dir
+from layout_autofix.tracing import DEFAULT_TRACE_RATE_LIMIT, TraceRateLimitFilter
 
-DEFAULT_LOG_FILE = Path.home() / "Library" / "Logs" / "LayoutAutofix" / "layout-autofix.log"
+
+DEFAULT_LOG_FILE = default_log_dir() / "layout-autofix.log"
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_WRITER_LINGER_SECONDS = 0.02
+
+_listener: _LogWriter | None = None
+_queue_handler: BoundedQueueHandler | None = None
+_listener_lock = threading.Lock()
+
+
+class BoundedQueueHandler(QueueHandler):
+    # Callers only pay for formatting the message and a non-blocking put; when
+    # the writer falls behind, records are dropped and counted instead of
+    # stalling the conversion thread.
+    def __init__(self, log_queue: queue.Queue | RecordBuffer) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported_dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._reported_dropped != self.dropped:
+            self._report_dropped()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # This is the root logger's only handler and runs last, so the record is
+        # rendered in place rather than copied.
+        message = self.format(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
+
+    def _report_dropped(self) -> None:
+        dropped = self.dropped
+        record = logging.LogRecord(
+            __name__,
+            logging.WARNING,
+            __file__,
+            0,
+            "event=log_records_dropped dropped=%s total_dropped=%s",
+            (dropped - self._reported_dropped, dropped),
+            None,
+        )
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            return
+        self._reported_dropped = dropped
+
+
+class RecordBuffer:
+    # Bounded FIFO between callers and the writer thread. The writer is woken
+    # once per burst and lingers before draining it, so a conversion's dozen
+    # debug records cost one thread switch rather than one per record.
+    def __init__(self, maxsize: int, linger_seconds: float = DEFAULT_WRITER_LINGER_SECONDS) -> None:
+        self.maxsize = maxsize
+        self.linger_seconds = linger_seconds
+        self._items: deque[object] = deque()
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def put_nowait(self, item: object) -> None:
+        with self._not_empty:
+            if len(self._items) >= self.maxsize:
+                raise queue.Full
+            self._items.append(item)
+            if len(self._items) == 1:
+                self._not_empty.notify()
+
+    def put(self, item: object) -> None:
+        with self._not_empty:
+            self._items.append(item)
+            self._not_empty.notify()
+
+    def get(self, block: bool = True) -> object:
+        with self._not_empty:
+            if self._items:
+                return self._items.popleft()
+            if not block:
+                raise queue.Empty
+            self._not_empty.wait_for(lambda: self._items)
+        time.sleep(self.linger_seconds)
+        with self._not_empty:
+            return self._items.popleft()
+
+    def qsize(self) -> int:
+        with self._not_empty:
+            return len(self._items)
+
+
+class _LogWriter(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Unlike a record, the stop marker must not be dropped when the queue is full.
+        self.queue.put(self._sentinel)
 
 
 def configure_logging(
@@ -14,20 +124,31 @@ def configure_logging(
     log_file: str | None = None,
     debug_events: bool = False,
     enable_console: bool = True,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    writer_linger_seconds: float = DEFAULT_WRITER_LINGER_SECONDS,
+    trace_rate_limit: float = DEFAULT_TRACE_RATE_LIMIT,
 ) -> Path:
     effective_level = _effective_log_level(log_level, debug_events=debug_events)
     resolved_log_file = _resolve_log_file(log_file)
     resolved_log_file.parent.mkdir(parents=True, exist_ok=True)
 
+    # The format uses none of the caller, thread or process fields: skip collecting them.
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
     formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
     handlers: list[logging.Handler] = []
 
+    # Rollover and compression happen on the writer thread, never in a caller.
     file_handler = RotatingFileHandler(
         resolved_log_file,
         maxBytes=2_000_000,
         backupCount=5,
         encoding="utf-8",
     )
+    file_handler.namer = _compressed_name
+    file_handler.rotator = _compress_rotated
     file_handler.setFormatter(formatter)
     handlers.append(file_handler)
 
@@ -36,9 +157,20 @@ def configure_logging(
         console_handler.setFormatter(formatter)
         handlers.append(console_handler)
 
+    global _listener, _queue_handler
+    with _listener_lock:
+        _stop_listener()
+        _queue_handler = BoundedQueueHandler(RecordBuffer(queue_size, writer_linger_seconds))
+        # Records are rendered to their message once; the writer's handlers add the prefix.
+        _queue_handler.setFormatter(logging.Formatter("%(message)s"))
+        # Rate limiting runs before a record is rendered, so a suppressed one costs almost nothing.
+        _queue_handler.addFilter(TraceRateLimitFilter(trace_rate_limit))
+        _listener = _LogWriter(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
     logging.basicConfig(
         level=effective_level,
-        handlers=handlers,
+        handlers=[_queue_handler],
         force=True,
     )
 
@@ -51,6 +183,40 @@ def configure_logging(
     return resolved_log_file
 
 
+def stop_logging() -> None:
+    # Drains the queue and closes the files; registered to run at exit.
+    with _listener_lock:
+        _stop_listener()
+
+
+def dropped_log_records() -> int:
+    handler = _queue_handler
+    return 0 if handler is None else handler.dropped
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def _compressed_name(default_name: str) -> str:
+    return default_name + ".gz"
+
+
+def _compress_rotated(source: str, destination: str) -> None:
+    with open(source, "rb") as plain, gzip.open(destination, "wb") as compressed:
+        shutil.copyfileobj(plain, compressed)
+    os.remove(source)
+
+
+atexit.register(stop_logging)
+
+
 def _resolve_log_file(log_file: str | None) -> Path:
     if not log_file:
         return DEFAULT_LOG_FILE
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+from layout_autofix.flight_recorder import FlightRecorder
+
+
+# Stages of one conversion, in pipeline order.
+CONVERSION_STAGES = (
+    "switch_settle",
+    "revert_select",
+    "ax_read",
+    "clipboard_snapshot",
+    "marker_write",
+    "copy_shortcut",
+    "clipboard_wait",
+    "switch_layout",
+    "classify",
+    "ax_replace",
+    "retype",
+    "paste",
+    "paste_restore",
+    "clipboard_restore",
+    "total",
+)
+
+# Log-spaced bucket upper bounds, four per octave from 10 us to about 20 s: a
+# histogram is a fixed array of counts no matter how long the app runs.
+BUCKET_BOUNDS_SECONDS: tuple[float, ...] = tuple(1e-5 * 2 ** (i / 4) for i in range(85))
+
+
+@dataclass
+class LatencyHistogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKET_BOUNDS_SECONDS) + 1))
+    count: int = 0
+    total_seconds: float = 0.0
+    min_seconds: float | None = None
+    max_seconds: float | None = None
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_SECONDS, seconds)] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        if self.min_seconds is None or seconds < self.min_seconds:
+            self.min_seconds = seconds
+        if self.max_seconds is None or seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def percentile(self, fraction: float) -> float | None:
+        # Upper bound of the bucket holding the requested rank, clamped to the
+        # observed range; within ~19% of the true value.
+        if not self.count:
+            return None
+        rank = max(1, int(fraction * self.count + 0.999999))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                bound = BUCKET_BOUNDS_SECONDS[index] if index < len(BUCKET_BOUNDS_SECONDS) else self.max_seconds
+                return min(max(bound, self.min_seconds), self.max_seconds)
+        return self.max_seconds
+
+    def snapshot(self) -> dict[str, float | int | None]:
+        return {
+            "count": self.count,
+            "mean_ms": None if not self.count else self.total_seconds / self.count * 1000,
+            "p50_ms": _to_ms(self.percentile(0.50)),
+            "p95_ms": _to_ms(self.percentile(0.95)),
+            "p99_ms": _to_ms(self.percentile(0.99)),
+            "min_ms": _to_ms(self.min_seconds),
+            "max_ms": _to_ms(self.max_seconds),
+        }
+
+
+@dataclass
+class ConversionMetrics:
+    clock: Callable[[], float] = time.monotonic
+    # Every stage timing and counter bump also lands in the flight recorder, if any.
+    flight_recorder: FlightRecorder | None = None
+    _histograms: dict[str, LatencyHistogram] = field(default_factory=dict, init=False)
+    _counters: dict[str, int] = field(default_factory=dict, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.record(seconds)
+        if self.flight_recorder is not None:
+            self.flight_recorder.record("stage", stage=stage, ms=round(seconds * 1000, 3))
+
+    @contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.record(stage, self.clock() - started)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+        if self.flight_recorder is not None:
+            self.flight_recorder.record(counter)
+
+    def counter(self, counter: str) -> int:
+        with self._lock:
+            return self._counters.get(counter, 0)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            stages = {stage: histogram.snapshot() for stage, histogram in self._histograms.items()}
+            counters = dict(self._counters)
+        order = {stage: index for index, stage in enumerate(CONVERSION_STAGES)}
+        return {
+            "stages": dict(sorted(stages.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))),
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def format_summary(snapshot: dict[str, dict], *, top_stages: int = 4) -> list[str]:
+    stages = snapshot["stages"]
+    counters = snapshot["counters"]
+    total = stages.get("total")
+    if not total or not total["count"]:
+        return ["No conversions yet"]
+
+    lines = [
+        f"Runs: {total['count']} (converted {counters.get('converted', 0)}), "
+        f"p50 {total['p50_ms']:.0f} ms, p95 {total['p95_ms']:.0f} ms",
+    ]
+    slowest = sorted(
+        (
+            (stage, values["mean_ms"] * values["count"] / total["count"])
+            for stage, values in stages.items()
+            if stage != "total" and values["count"]
+        ),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top_stages]
+    if slowest:
+        lines.append("Time per conversion: " + ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in slowest))
+    lines.append(
+        f"Capture: AX {counters.get('capture_ax', 0)} / clipboard {counters.get('capture_clipboard', 0)}; "
+        f"Cmd+C: pynput {counters.get('copy_pynput', 0)} / Quartz {counters.get('copy_quartz', 0)}"
+    )
+    lines.append(
+        f"Replace: AX {counters.get('replace_ax', 0)} / paste {counters.get('replace_clipboard', 0)}; "
+        f"subprocesses {counters.get('subprocess_spawns', 0)}"
+    )
+    return lines
+
+
+def _to_ms(seconds: float | None) -> float | None:
+    return None if seconds is None else seconds * 1000
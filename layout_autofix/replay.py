@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import time
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from layout_autofix.app import AutoLayoutFixer
+from layout_autofix.detector import switch_layout
+from layout_autofix.flight_recorder import FlightRecorder
+from layout_autofix.metrics import ConversionMetrics, LatencyHistogram
+from layout_autofix.scheduler import VirtualScheduler
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer
+
+
+# What a switch meets when its trace does not say: a conversion cancelled
+# before its capture, or a paste that was never observed.
+DEFAULT_TEXT_LEN = 6
+DEFAULT_AX_LATENCY_SECONDS = 0.002
+DEFAULT_COPY_LATENCY_SECONDS = 0.03
+DEFAULT_PASTE_LATENCY_SECONDS = 0.03
+# Time a finished conversion gets for late pastes to land before it is judged.
+SETTLE_SECONDS = 1.0
+USER_CLIPBOARD = "user clipboard"
+# Traces carry no text; each switch gets this, typed in its source layout.
+_SAMPLE_TEXT = "hello world "
+_TRACE_HEADERS = ("session_trace_started", "flight_recorder_dump")
+# Fixer settings a replay can vary: the timing and policy knobs, not the backends.
+TUNABLE_OPTIONS = tuple(
+    option.name
+    for option in fields(AutoLayoutFixer)
+    if option.init and option.type in ("float", "int", "bool") and option.name != "debug_event_logging"
+)
+
+
+@dataclass(frozen=True)
+class TraceSwitch:
+    # One recorded layout change and how the focused app behaved during its
+    # conversion. None means the trace does not tell.
+    at: float
+    source_layout: str
+    target_layout: str
+    text_len: int | None = None
+    ax_read: bool | None = None
+    ax_write: bool | None = None
+    ax_latency_seconds: float | None = None
+    copy_latency_seconds: float | None = None
+    paste_latency_seconds: float | None = None
+
+
+def read_trace(path: str | Path) -> Iterator[dict[str, object]]:
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_trace(records: Iterable[dict[str, object]]) -> list[TraceSwitch]:
+    # Session traces and flight recorder dumps share one format: a header line
+    # and then {"t": ..., "event": ..., ...} records in time order.
+    switches: list[TraceSwitch] = []
+    facts: dict[str, object] | None = None
+    paste_confirmed = False
+    for record in records:
+        event = record.get("event")
+        if event in _TRACE_HEADERS:
+            continue
+        if event == "layout_changed":
+            if facts is not None:
+                switches.append(TraceSwitch(**facts))
+            facts = {
+                "at": float(record["t"]),
+                "source_layout": record["from_layout"],
+                "target_layout": record["to_layout"],
+            }
+            paste_confirmed = False
+            continue
+        if facts is None:
+            continue
+        if event == "capture_ax":
+            facts["ax_read"] = True
+        elif event in ("capture_clipboard", "capture_failed", "ax_read_skipped"):
+            facts.setdefault("ax_read", False)
+        elif event == "replace_ax":
+            facts["ax_write"] = True
+        elif event == "replace_clipboard":
+            facts.setdefault("ax_write", False)
+        elif event == "selection_captured":
+            facts["text_len"] = record.get("text_len") or 0
+        elif event == "no_selection":
+            facts["text_len"] = 0
+        elif event == "copy_latency":
+            facts["copy_latency_seconds"] = float(record["ms"]) / 1000
+        elif event == "paste_latency":
+            facts["paste_latency_seconds"] = float(record["ms"]) / 1000
+        elif event == "paste_confirmed":
+            paste_confirmed = True
+        elif event == "stage" and record.get("stage") == "ax_read":
+            # Focus and selection: two round trips.
+            facts.setdefault("ax_latency_seconds", float(record["ms"]) / 2000)
+        elif event == "stage" and record.get("stage") == "paste_restore" and paste_confirmed:
+            # Traces recorded before paste_latency existed.
+            facts.setdefault("paste_latency_seconds", float(record["ms"]) / 1000)
+    if facts is not None:
+        switches.append(TraceSwitch(**facts))
+    return switches
+
+
+def load_traces(paths: Iterable[str | Path], *, repeat: int = 1, gap_seconds: float = 10.0) -> list[TraceSwitch]:
+    # Traces (and repeats) are laid end to end on one timeline.
+    switches: list[TraceSwitch] = []
+    traces = [parse_trace(read_trace(path)) for path in paths]
+    for trace in itertools.chain.from_iterable(itertools.repeat(traces, repeat)):
+        if not trace:
+            continue
+        offset = (switches[-1].at + gap_seconds - trace[0].at) if switches else 0.0
+        switches.extend(replace(switch, at=switch.at + offset) for switch in trace)
+    return switches
+
+
+def typed_text(switch: TraceSwitch) -> str:
+    length = DEFAULT_TEXT_LEN if switch.text_len is None else switch.text_len
+    intended = (_SAMPLE_TEXT * (length // len(_SAMPLE_TEXT) + 1))[:length]
+    try:
+        return switch_layout(intended, to_layout=switch.source_layout, from_layout="EN")
+    except ValueError:
+        return intended
+
+
+def expected_text(text: str, target_layout: str, source_layout: str) -> str:
+    if target_layout == source_layout:
+        return text
+    return switch_layout(text, to_layout=target_layout, from_layout=source_layout)
+
+
+@dataclass
+class _Burst:
+    # Switches that hit one selection: a new one starts whenever the fixer is idle.
+    started: float
+    text: str
+    source_layout: str
+    target_layout: str
+    finished: float | None = None
+    judged: bool = False
+
+
+@dataclass
+class ReplayResult:
+    options: dict[str, object]
+    switches: int = 0
+    conversions: int = 0
+    succeeded: int = 0
+    clipboard_lost: int = 0
+    virtual_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def summary(self) -> dict[str, object]:
+        return {
+            "options": self.options,
+            "switches": self.switches,
+            "conversions": self.conversions,
+            "succeeded": self.succeeded,
+            "success_rate": None if not self.conversions else self.succeeded / self.conversions,
+            "clipboard_lost": self.clipboard_lost,
+            "latency_ms": self.latency.snapshot(),
+            "virtual_seconds": self.virtual_seconds,
+            "wall_seconds": self.wall_seconds,
+            "speedup": None if not self.wall_seconds else self.virtual_seconds / self.wall_seconds,
+        }
+
+
+@dataclass
+class TraceReplay:
+    # Feeds recorded switches through a threaded fixer on a simulated desktop,
+    # on one thread and in virtual time. Each burst's latency runs from its
+    # first switch until the fixer is idle; it succeeds when the text ends up
+    # converted to the last target and the user's clipboard is still there.
+    switches: list[TraceSwitch]
+    options: dict[str, object] = field(default_factory=dict)
+    result: ReplayResult = field(init=False)
+    _scheduler: VirtualScheduler = field(init=False)
+    _desktop: SimulatedDesktop = field(init=False)
+    _fixer: SimulatedLayoutFixer = field(init=False)
+    _burst: _Burst | None = field(default=None, init=False)
+
+    def __post_init__(self) -> None:
+        unknown = sorted(set(self.options) - set(TUNABLE_OPTIONS))
+        if unknown:
+            raise ValueError(f"unknown fixer options: {', '.join(unknown)}")
+        self.result = ReplayResult(options=dict(self.options))
+        self._scheduler = VirtualScheduler(now=self.switches[0].at if self.switches else 0.0)
+        self._desktop = SimulatedDesktop(
+            clipboard_text=USER_CLIPBOARD,
+            clock=self._scheduler.monotonic,
+            sleep=self._scheduler.sleep,
+        )
+        self._fixer = SimulatedLayoutFixer(
+            self._desktop,
+            initial_layout=self.switches[0].source_layout if self.switches else "EN",
+            scheduler=self._scheduler,
+            metrics=ConversionMetrics(clock=self._scheduler.monotonic),
+            flight_recorder=FlightRecorder(capacity=256, clock=self._scheduler.monotonic),
+            # Traces hold no text to judge, so every captured selection is converted.
+            **{"auto_direction_confidence_threshold": 2.0, **self.options},
+        )
+
+    def run(self) -> ReplayResult:
+        started_wall = time.perf_counter()
+        started = self._scheduler.monotonic()
+        for switch in self.switches:
+            self._scheduler.call_at(switch.at, lambda switch=switch: self._switch(switch))
+        while self._scheduler.run_next():
+            self._run_pending_conversions()
+        self._judge()
+        self.result.virtual_seconds = self._scheduler.monotonic() - started
+        self.result.wall_seconds = time.perf_counter() - started_wall
+        return self.result
+
+    def _switch(self, switch: TraceSwitch) -> None:
+        # The same steps as AutoLayoutFixer._schedule_selection_conversion, minus the worker thread.
+        fixer = self._fixer
+        self.result.switches += 1
+        if not fixer._conversion_active.is_set():
+            self._judge()
+            self._start_burst(switch)
+        self._burst.target_layout = switch.target_layout
+        fixer._queue_conversion(switch.target_layout, switch.source_layout)
+        if fixer._conversion_active.is_set():
+            fixer._cancel_event.set()
+        fixer._conversion_active.set()
+
+    def _start_burst(self, switch: TraceSwitch) -> None:
+        desktop = self._desktop
+        text = typed_text(switch)
+        desktop.ax_read_supported = bool(switch.ax_read)
+        desktop.ax_write_supported = bool(switch.ax_write)
+        desktop.ax_latency_seconds = _known(switch.ax_latency_seconds, DEFAULT_AX_LATENCY_SECONDS)
+        desktop.copy_latency_seconds = _known(switch.copy_latency_seconds, DEFAULT_COPY_LATENCY_SECONDS)
+        desktop.paste_latency_seconds = _known(switch.paste_latency_seconds, DEFAULT_PASTE_LATENCY_SECONDS)
+        with desktop._lock:
+            # A paste still pending from an earlier burst belongs to that burst.
+            desktop._pending.clear()
+        desktop.select(text)
+        self._burst = _Burst(self._scheduler.monotonic(), text, switch.source_layout, switch.target_layout)
+        if text:
+            self.result.conversions += 1
+
+    def _run_pending_conversions(self) -> None:
+        fixer = self._fixer
+        ran = False
+        while fixer._pending_conversion is not None:
+            target_layout, source_layout = fixer._pending_conversion
+            fixer._pending_conversion = None
+            fixer._cancel_event.clear()
+            fixer._convert_selected_text_after_switch(target_layout, source_layout)
+            fixer._finish_conversion(source_layout)
+            ran = True
+        burst = self._burst
+        if ran and burst is not None and not fixer._conversion_active.is_set():
+            burst.finished = self._scheduler.monotonic()
+            self._scheduler.call_later(SETTLE_SECONDS, lambda: self._judge(burst))
+
+    def _judge(self, burst: _Burst | None = None) -> None:
+        burst = self._burst if burst is None else burst
+        if burst is None or burst.judged or burst is not self._burst:
+            return
+        burst.judged = True
+        self._desktop.settle()
+        if self._desktop.read_clipboard() != USER_CLIPBOARD:
+            self.result.clipboard_lost += 1
+            self._desktop.write_clipboard(USER_CLIPBOARD)
+        if not burst.text:
+            return
+        if burst.finished is not None:
+            self.result.latency.record(burst.finished - burst.started)
+        if self._desktop.text == expected_text(burst.text, burst.target_layout, burst.source_layout):
+            self.result.succeeded += 1
+
+
+def _known(value: float | None, default: float) -> float:
+    return default if value is None else value
+
+
+def replay(switches: list[TraceSwitch], **options: object) -> ReplayResult:
+    return TraceReplay(switches, options).run()
+
+
+def parse_option_grid(settings: Iterable[str]) -> list[dict[str, object]]:
+    # ["name=1,2", "other=3"] -> every combination, as fixer keyword arguments.
+    axes: list[list[tuple[str, object]]] = []
+    for setting in settings:
+        name, separator, values = setting.partition("=")
+        name = name.strip().replace("-", "_")
+        if not separator or name not in TUNABLE_OPTIONS:
+            raise ValueError(f"expected NAME=VALUE[,VALUE...] with NAME one of: {', '.join(TUNABLE_OPTIONS)}")
+        axes.append([(name, _option_value(name, value)) for value in values.split(",")])
+    return [dict(combination) for combination in itertools.product(*axes)]
+
+
+def _option_value(name: str, value: str) -> object:
+    kind = next(option.type for option in fields(AutoLayoutFixer) if option.name == name)
+    if kind == "bool":
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return int(value) if kind == "int" else float(value)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="layout-autofix replay",
+        description=(
+            "Replays recorded sessions (--record-trace files or flight recorder dumps) through the "
+            "fixer in virtual time and reports latency and success for each combination of settings."
+        ),
+    )
+    parser.add_argument("traces", nargs="+", help="Session trace or flight recorder dump (.jsonl).")
+    parser.add_argument(
+        "--set",
+        dest="settings",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE[,VALUE...]",
+        help="Fixer option to vary, e.g. selection_copy_poll_interval_seconds=0.01,0.03 (repeatable).",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the traces this many times in a row.")
+    args = parser.parse_args(argv)
+
+    try:
+        grid = parse_option_grid(args.settings)
+    except ValueError as exc:
+        parser.error(str(exc))
+    switches = load_traces(args.traces, repeat=args.repeat)
+    if not switches:
+        parser.error("the traces contain no layout_changed events")
+    results = [replay(switches, **options).summary() for options in grid]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Protocol
+
+
+class Scheduler(Protocol):
+    def monotonic(self) -> float: ...
+
+    # Waits ``seconds`` or until ``event`` is set; True when the event was set.
+    def wait(self, event: threading.Event, seconds: float) -> bool: ...
+
+
+@dataclass
+class SystemScheduler:
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        return event.wait(seconds)
+
+
+@dataclass
+class VirtualScheduler:
+    # Time only moves when something waits, and then jumps straight to the next
+    # timer or the end of the wait: seconds of pipeline delays take microseconds.
+    # Timers run on whichever thread waits, so the fixer, the simulated desktop
+    # and the events that drive them must all stay on one thread.
+    now: float = 0.0
+    _timers: list[tuple[float, int, Callable[[], object]]] = field(default_factory=list, init=False)
+    _sequence: itertools.count = field(default_factory=itertools.count, init=False)
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def call_at(self, when: float, callback: Callable[[], object]) -> None:
+        heapq.heappush(self._timers, (when, next(self._sequence), callback))
+
+    def call_later(self, delay: float, callback: Callable[[], object]) -> None:
+        self.call_at(self.now + delay, callback)
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        deadline = self.now + max(0.0, seconds)
+        while not event.is_set() and self._timers and self._timers[0][0] <= deadline:
+            self.run_next()
+        if not event.is_set():
+            self.now = max(self.now, deadline)
+        return event.is_set()
+
+    def sleep(self, seconds: float) -> None:
+        self.wait(_NEVER_SET, seconds)
+
+    def run_next(self) -> bool:
+        # Runs the earliest timer, moving time forward to it; False when none is left.
+        if not self._timers:
+            return False
+        when, _, callback = heapq.heappop(self._timers)
+        self.now = max(self.now, when)
+        callback()
+        return True
+
+
+_NEVER_SET = threading.Event()
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import asyncio
+import selectors
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable
+
+from layout_autofix.accessibility import AX_ERROR_ATTRIBUTE_UNSUPPORTED, AX_ERROR_NO_VALUE, AX_ERROR_SUCCESS
+from layout_autofix.app import AutoLayoutFixer
+from layout_autofix.async_engine import AsyncLayoutFixer
+from layout_autofix.clipboard import DEFAULT_SNAPSHOT_MAX_BYTES, ClipboardSnapshot
+from layout_autofix.layout_source import InMemoryLayoutSource
+
+
+# A focused text field, the pasteboard and the keystroke path of a fake app.
+# Cmd+C and Cmd+V take effect after their configured latencies on ``clock``;
+# pending effects are applied whenever the desktop is observed, so the
+# simulation needs no timer threads of its own.
+@dataclass
+class SimulatedDesktop:
+    text: str = ""
+    selection_start: int = 0
+    selection_length: int = 0
+    clipboard_text: str = ""
+    focused_element: str | None = "editor"
+    secure_field: bool = False
+    ax_trusted: bool = True
+    ax_read_supported: bool = True
+    ax_write_supported: bool = True
+    ax_latency_seconds: float = 0.0
+    copy_latency_seconds: float = 0.0
+    paste_latency_seconds: float = 0.0
+    clock: Callable[[], float] = time.monotonic
+    # Waits out the AX latency; a replay passes its virtual scheduler's sleep.
+    sleep: Callable[[float], None] = time.sleep
+    change_count: int = field(default=0, init=False)
+    replaced_at: float | None = field(default=None, init=False)
+    ax_calls: int = field(default=0, init=False)
+    shortcuts: list[str] = field(default_factory=list, init=False)
+    _pending: list[tuple[float, str]] = field(default_factory=list, init=False)
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False)
+
+    def select(self, text: str, *, prefix: str = "", suffix: str = "") -> None:
+        with self._lock:
+            self.text = prefix + text + suffix
+            self.selection_start = len(prefix)
+            self.selection_length = len(text)
+            self.replaced_at = None
+
+    def selected_text(self) -> str:
+        with self._lock:
+            self._apply_due()
+            return self.text[self.selection_start : self.selection_start + self.selection_length]
+
+    def read_clipboard(self) -> str:
+        with self._lock:
+            self._apply_due()
+            return self.clipboard_text
+
+    def write_clipboard(self, text: str) -> None:
+        with self._lock:
+            self._apply_due()
+            self.clipboard_text = text
+            self.change_count += 1
+
+    def read_change_count(self) -> int:
+        with self._lock:
+            self._apply_due()
+            return self.change_count
+
+    def move_focus(self, element: str | None) -> None:
+        with self._lock:
+            self.focused_element = element
+
+    def ax_focused_element(self) -> str | None:
+        self._ax_round_trip()
+        return self.focused_element
+
+    def ax_read_selection(self) -> str | None:
+        self._ax_round_trip()
+        if not self.ax_read_supported:
+            return None
+        return self.selected_text()
+
+    def ax_replace_selection(self, text: str) -> bool:
+        self._ax_round_trip()
+        if not self.ax_write_supported:
+            return False
+        with self._lock:
+            self._apply_due()
+            self._replace_selection(text, self.clock())
+        return True
+
+    def ax_select_before_caret(self, length: int) -> bool:
+        self._ax_round_trip()
+        return self.ax_write_supported and self.select_before_caret(length)
+
+    def select_before_caret(self, length: int) -> bool:
+        # Shift+Left ``length`` times; the simulated text is BMP-only, so
+        # characters and UTF-16 units are the same thing here.
+        with self._lock:
+            self._apply_due()
+            caret = self.selection_start + self.selection_length
+            if length > caret:
+                return False
+            self.selection_start = caret - length
+            self.selection_length = length
+            return True
+
+    def type_text(self, text: str, *, backspaces: int = 0) -> None:
+        # Keys at the caret: ``backspaces`` deletions (the first one takes a
+        # selection with it), then ``text`` in place of whatever is left selected.
+        with self._lock:
+            self._apply_due()
+            for _ in range(backspaces):
+                if not self.selection_length and self.selection_start:
+                    self.selection_start -= 1
+                    self.selection_length = 1
+                self._replace_selection("", self.clock())
+            self._replace_selection(text, self.clock())
+
+    def press_shortcut(self, key: str) -> None:
+        with self._lock:
+            self._apply_due()
+            self.shortcuts.append(key)
+            latency = self.copy_latency_seconds if key == "c" else self.paste_latency_seconds
+            self._pending.append((self.clock() + latency, key))
+
+    def settle(self) -> None:
+        with self._lock:
+            self._apply_due()
+
+    def _ax_round_trip(self) -> None:
+        with self._lock:
+            self.ax_calls += 1
+        if self.ax_latency_seconds:
+            self.sleep(self.ax_latency_seconds)
+
+    def _apply_due(self) -> None:
+        if not self._pending:
+            return
+        now = self.clock()
+        due = [item for item in self._pending if item[0] <= now]
+        if not due:
+            return
+        self._pending = [item for item in self._pending if item[0] > now]
+        for due_at, key in sorted(due):
+            if key == "c":
+                if self.selection_length:
+                    self.clipboard_text = self.text[
+                        self.selection_start : self.selection_start + self.selection_length
+                    ]
+                    self.change_count += 1
+            elif key == "v":
+                # Like a real app, the paste reads the pasteboard when it is processed,
+                # so restoring the clipboard too early pastes the wrong text.
+                self._replace_selection(self.clipboard_text, due_at)
+
+    def _replace_selection(self, text: str, at: float) -> None:
+        end = self.selection_start + self.selection_length
+        self.text = self.text[: self.selection_start] + text + self.text[end:]
+        self.selection_start += len(text)
+        self.selection_length = 0
+        self.replaced_at = at
+
+
+@dataclass
+class SimulatedAccessibility:
+    desktop: SimulatedDesktop
+    calls: Counter[str] = field(default_factory=Counter, init=False)
+
+    def is_trusted(self) -> bool:
+        self.calls["is_trusted"] += 1
+        return self.desktop.ax_trusted
+
+    def prompt_for_trust(self) -> None:
+        self.calls["prompt_for_trust"] += 1
+
+    def focused_element(self) -> tuple[int, object | None]:
+        self.calls["focused_element"] += 1
+        element = self.desktop.ax_focused_element()
+        return (AX_ERROR_SUCCESS, element) if element is not None else (AX_ERROR_NO_VALUE, None)
+
+    def selected_text(self, element: object) -> tuple[int, str | None]:
+        self.calls["selected_text"] += 1
+        selected = self.desktop.ax_read_selection()
+        return (AX_ERROR_SUCCESS, selected) if selected is not None else (AX_ERROR_ATTRIBUTE_UNSUPPORTED, None)
+
+    def set_selected_text(self, element: object, text: str) -> int:
+        self.calls["set_selected_text"] += 1
+        if element != self.desktop.focused_element:
+            return AX_ERROR_NO_VALUE
+        return AX_ERROR_SUCCESS if self.desktop.ax_replace_selection(text) else AX_ERROR_ATTRIBUTE_UNSUPPORTED
+
+    def select_before_caret(self, element: object, length: int) -> int:
+        self.calls["select_before_caret"] += 1
+        if element != self.desktop.focused_element:
+            return AX_ERROR_NO_VALUE
+        return AX_ERROR_SUCCESS if self.desktop.ax_select_before_caret(length) else AX_ERROR_ATTRIBUTE_UNSUPPORTED
+
+    def same_element(self, first: object, second: object) -> bool:
+        return first == second
+
+    def is_secure_text_field(self, element: object) -> bool:
+        self.calls["is_secure_text_field"] += 1
+        return self.desktop.secure_field
+
+
+@dataclass
+class SimulatedClipboard:
+    desktop: SimulatedDesktop
+
+    def read_text(self) -> str | None:
+        return self.desktop.read_clipboard()
+
+    def write_text(self, text: str) -> bool:
+        self.desktop.write_clipboard(text)
+        return True
+
+    def change_count(self) -> int | None:
+        return self.desktop.read_change_count()
+
+    def snapshot(self, max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES) -> ClipboardSnapshot | None:
+        with self.desktop._lock:
+            return ClipboardSnapshot.of_text(self.desktop.read_clipboard(), self.desktop.read_change_count())
+
+    def restore(self, snapshot: ClipboardSnapshot) -> bool:
+        return self.write_text(snapshot.text())
+
+
+class SimulatedLayoutFixer(AutoLayoutFixer):
+    def __init__(self, desktop: SimulatedDesktop, *, initial_layout: str = "EN", **kwargs: object) -> None:
+        kwargs.setdefault("layout_source", InMemoryLayoutSource(layout=initial_layout))
+        kwargs.setdefault("clipboard", SimulatedClipboard(desktop))
+        kwargs.setdefault("accessibility", SimulatedAccessibility(desktop))
+        super().__init__(**kwargs)
+        self.desktop = desktop
+
+    def _send_shortcut(self, modifier: object, key: str) -> None:
+        self.desktop.press_shortcut(key)
+
+    def _send_command_shortcut_quartz(self, key: str) -> bool:
+        self.desktop.press_shortcut(key)
+        return True
+
+    def _extend_selection_left(self, count: int) -> None:
+        self.desktop.shortcuts.append(f"shift+left*{count}")
+        self.desktop.select_before_caret(count)
+
+    def _retype(self, backspaces: int, text: str) -> None:
+        self.desktop.shortcuts.append(f"backspace*{backspaces}")
+        self.desktop.type_text(text, backspaces=backspaces)
+
+
+class SimulatedAsyncLayoutFixer(SimulatedLayoutFixer, AsyncLayoutFixer):
+    pass
+
+
+# An event loop whose clock only moves when the loop would otherwise sleep:
+# timers fire at once and in order, so seconds of pipeline delays run in
+# microseconds. Work handed to an executor takes no virtual time; the loop
+# waits for it for real.
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, start: float = 0.0) -> None:
+        self._virtual_time = start
+        self._executor_calls = 0
+        super().__init__(_VirtualTimeSelector(self))
+
+    def time(self) -> float:
+        return self._virtual_time
+
+    def run_in_executor(self, executor, func, *args):  # type: ignore[no-untyped-def, override]
+        future = super().run_in_executor(executor, func, *args)
+        self._executor_calls += 1
+        future.add_done_callback(self._executor_call_done)
+        return future
+
+    def _executor_call_done(self, _future: asyncio.Future) -> None:
+        self._executor_calls -= 1
+
+
+class _VirtualTimeSelector(selectors.DefaultSelector):
+    def __init__(self, loop: VirtualTimeEventLoop) -> None:
+        super().__init__()
+        self._loop = loop
+
+    def select(self, timeout: float | None = None) -> list:
+        if timeout is None or self._loop._executor_calls:
+            # Nothing is due, or a worker thread will report back: wait for real.
+            return super().select(0 if timeout == 0 else None)
+        events = super().select(0)
+        if not events:
+            self._loop._virtual_time += timeout
+        return events
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any
+
+
+def default_state_dir() -> Path:
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Application Support" / "LayoutAutofix"
+    base = os.environ.get("XDG_STATE_HOME") or os.environ.get("XDG_DATA_HOME")
+    return Path(base or Path.home() / ".local" / "state") / "layout-autofix"
+
+
+def default_log_dir() -> Path:
+    # Outside macOS the log and flight recorder dumps live next to the learned state.
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Logs" / "LayoutAutofix"
+    return default_state_dir()
+
+
+APP_SUPPORT_DIR = default_state_dir()
+
+_logger = logging.getLogger(__name__)
+
+
+def read_state(path: Path, version: int) -> dict[str, Any] | None:
+    # Learned state is a cache: a missing, corrupt or outdated file means starting over.
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        _logger.warning("event=state_file_invalid path=%s error=%r", path, exc)
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != version:
+        return None
+    data = payload.get("data")
+    return data if isinstance(data, dict) else None
+
+
+def write_state(path: Path, version: int, data: dict[str, Any]) -> bool:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps({"version": version, "data": data}, sort_keys=True), encoding="utf-8")
+        temporary.replace(path)
+    except OSError as exc:
+        _logger.warning("event=state_file_save_failed path=%s error=%r", path, exc)
+        return False
+    return True
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from layout_autofix.app import AutoLayoutFixer
+from layout_autofix.autostart import LaunchAgentAutostart
+from layout_autofix.metrics import format_summary
+
+# Kept out of macos_app so that parsing arguments, --help and building the fixer
+# run before AppKit is loaded; the rest of main() only needs it for the status item.
+try:
+    import objc
+    from AppKit import (
+        NSApp,
+        NSApplication,
+        NSApplicationActivationPolicyAccessory,
+        NSControlStateValueOff,
+        NSControlStateValueOn,
+        NSEventMaskLeftMouseUp,
+        NSEventMaskRightMouseDown,
+        NSEventTypeRightMouseDown,
+        NSImage,
+        NSImageScaleProportionallyDown,
+        NSMenu,
+        NSMenuItem,
+        NSStatusBar,
+        NSVariableStatusItemLength,
+        NSWorkspace,
+    )
+    from Foundation import NSMakeSize, NSObject
+except Exception as exc:  # pragma: no cover - depends on macOS runtime
+    objc = None
+    # Lets the module import so macos_app.main can report what is missing.
+    NSObject = object
+    COCOA_IMPORT_ERROR = exc
+else:
+    COCOA_IMPORT_ERROR = None
+
+
+class StatusBarDelegate(NSObject):  # pragma: no cover - GUI integration
+    def initWithFixer_autostart_iconPath_(
+        self,
+        fixer: AutoLayoutFixer,
+        autostart: LaunchAgentAutostart,
+        icon_path: str | None,
+    ):
+        self = objc.super(StatusBarDelegate, self).init()
+        if self is None:
+            return None
+
+        self._fixer = fixer
+        self._autostart = autostart
+        self._icon_path = icon_path
+        self._status_item = None
+        self._worker_thread: threading.Thread | None = None
+        self._menu = None
+        self._autostart_item = None
+        self._metrics_items: list[object] = []
+        self._launch_started_at = time.monotonic()
+        self._logger = logging.getLogger(__name__)
+        return self
+
+    def applicationDidFinishLaunching_(self, _notification: object) -> None:
+        self._setup_status_item()
+        self._logger.info(
+            "event=status_item_ready since_main_ms=%.1f",
+            (time.monotonic() - self._launch_started_at) * 1000,
+        )
+        self._start_worker()
+
+    def applicationWillTerminate_(self, _notification: object) -> None:
+        self._fixer.stop()
+
+    def onStatusItemClick_(self, _sender: object) -> None:
+        event = NSApp.currentEvent()
+        if event is None:
+            return
+        if event.type() != NSEventTypeRightMouseDown:
+            return
+
+        self._refresh_menu_state()
+        NSMenu.popUpContextMenu_withEvent_forView_(self._menu, event, self._status_item.button())
+
+    def toggleAutostart_(self, _sender: object) -> None:
+        try:
+            if self._autostart.is_enabled():
+                self._autostart.disable()
+            else:
+                self._autostart.enable()
+        finally:
+            self._refresh_menu_state()
+
+    def dumpFlightRecorder_(self, _sender: object) -> None:
+        path = self._fixer.dump_flight_recorder("menu")
+        if path is not None:
+            NSWorkspace.sharedWorkspace().selectFile_inFileViewerRootedAtPath_(str(path), "")
+
+    def quitApp_(self, _sender: object) -> None:
+        self._fixer.stop()
+        NSApp.terminate_(None)
+
+    def _setup_status_item(self) -> None:
+        self._status_item = NSStatusBar.systemStatusBar().statusItemWithLength_(NSVariableStatusItemLength)
+
+        button = self._status_item.button()
+        button.setTarget_(self)
+        button.setAction_("onStatusItemClick:")
+        button.sendActionOn_(NSEventMaskLeftMouseUp | NSEventMaskRightMouseDown)
+
+        image = None
+        if self._icon_path:
+            image = NSImage.alloc().initWithContentsOfFile_(self._icon_path)
+        if image is None:
+            image = NSImage.imageWithSystemSymbolName_accessibilityDescription_("keyboard", "Layout Autofix")
+        if image is not None:
+            image.setTemplate_(True)
+            self._fit_status_icon(image, button)
+            button.setImage_(image)
+        else:
+            button.setTitle_("⌨")
+
+        self._menu = NSMenu.alloc().init()
+        self._menu.addItem_(NSMenuItem.separatorItem())
+        self._autostart_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_(
+            "Launch At Login",
+            "toggleAutostart:",
+            "",
+        )
+        self._autostart_item.setTarget_(self)
+        self._menu.addItem_(self._autostart_item)
+        dump_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_(
+            "Dump Flight Recorder",
+            "dumpFlightRecorder:",
+            "",
+        )
+        dump_item.setTarget_(self)
+        self._menu.addItem_(dump_item)
+        self._menu.addItem_(NSMenuItem.separatorItem())
+
+        quit_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("Quit", "quitApp:", "")
+        quit_item.setTarget_(self)
+        self._menu.addItem_(quit_item)
+
+        self._refresh_menu_state()
+
+    def _refresh_menu_state(self) -> None:
+        if self._autostart_item is None:
+            return
+        state = NSControlStateValueOn if self._autostart.is_enabled() else NSControlStateValueOff
+        self._autostart_item.setState_(state)
+        self._refresh_metrics_items()
+
+    def _refresh_metrics_items(self) -> None:
+        for item in self._metrics_items:
+            self._menu.removeItem_(item)
+        self._metrics_items = []
+        for index, line in enumerate(format_summary(self._fixer.metrics_snapshot())):
+            item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_(line, None, "")
+            item.setEnabled_(False)
+            self._menu.insertItem_atIndex_(item, index)
+            self._metrics_items.append(item)
+
+    def _start_worker(self) -> None:
+        # AppKit owns the main thread's run loop; the asyncio engine runs its event
+        # loop on this thread and only shares thread-safe metrics with the menu.
+        self._worker_thread = threading.Thread(target=self._fixer.run_forever, daemon=True)
+        self._worker_thread.start()
+        self._logger.info("event=fixer_thread_started engine=%s", self._fixer.engine)
+
+    @staticmethod
+    def _fit_status_icon(image: object, button: object) -> None:
+        try:
+            bar_height = float(NSStatusBar.systemStatusBar().thickness())
+        except Exception:
+            bar_height = 22.0
+
+        icon_size = max(14.0, min(22.0, bar_height - 4.0))
+        image.setSize_(NSMakeSize(icon_size, icon_size))
+        button.setImageScaling_(NSImageScaleProportionallyDown)
+
+
+def run_status_bar_app(
+    fixer: AutoLayoutFixer,
+    autostart: LaunchAgentAutostart,
+    icon_path: str | None,
+    *,
+    launch_started_at: float,
+) -> None:  # pragma: no cover - GUI integration
+    app = NSApplication.sharedApplication()
+    app.setActivationPolicy_(NSApplicationActivationPolicyAccessory)
+    if icon_path:
+        app_icon = NSImage.alloc().initWithContentsOfFile_(icon_path)
+        if app_icon is not None:
+            app.setApplicationIconImage_(app_icon)
+    delegate = StatusBarDelegate.alloc().initWithFixer_autostart_iconPath_(fixer, autostart, icon_path)
+    delegate._launch_started_at = launch_started_at
+    app.setDelegate_(delegate)
+    app.run()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Callable
+
+from layout_autofix.state_files import APP_SUPPORT_DIR, read_state, write_state
+
+
+DEFAULT_PROFILES_FILE = APP_SUPPORT_DIR / "timing-profiles.json"
+
+# Learned delays never go below these, whatever an app has shown so far.
+MIN_SETTLE_SECONDS = 0.005
+MIN_COPY_WAIT_TIMEOUT_SECONDS = 0.1
+MIN_PASTE_RESTORE_SECONDS = 0.04
+
+_PROFILES_FORMAT_VERSION = 2
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TimingDelays:
+    settle_seconds: float
+    layout_switch_settle_seconds: float
+    copy_wait_timeout_seconds: float
+    paste_restore_seconds: float
+
+
+@dataclass
+class LatencyEstimate:
+    mean: float
+    deviation: float
+    samples: int
+
+    def add(self, seconds: float, smoothing: float) -> None:
+        # EWMA of the latency and of its absolute deviation: O(1) state per app
+        # that still follows an app getting slower (or faster) after an update.
+        error = seconds - self.mean
+        self.mean += smoothing * error
+        self.deviation += smoothing * (abs(error) - self.deviation)
+        self.samples += 1
+
+    def safe(self, margin_seconds: float) -> float:
+        return self.mean + 4 * self.deviation + margin_seconds
+
+
+@dataclass
+class AppTimingProfile:
+    # Copy latency comes from the pasteboard change count; paste latency only
+    # from pastes confirmed through Accessibility.
+    copy: LatencyEstimate | None
+    paste: LatencyEstimate | None
+    updated_at: float
+
+    @property
+    def samples(self) -> int:
+        return self.copy.samples if self.copy is not None else 0
+
+
+@dataclass
+class TimingProfileStore:
+    path: Path | None = DEFAULT_PROFILES_FILE
+    smoothing: float = 0.2
+    min_samples: int = 3
+    half_life_seconds: float = 7 * 24 * 3600
+    margin_seconds: float = 0.01
+    max_profiles: int = 256
+    save_interval_seconds: float = 30.0
+    clock: Callable[[], float] = time.time
+    debug_event_logging: bool = False
+    _profiles: dict[str, AppTimingProfile] | None = field(default=None, init=False)
+    _dirty: bool = field(default=False, init=False)
+    _saved_at: float = field(default=0.0, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def profile(self, app_id: str) -> AppTimingProfile | None:
+        with self._lock:
+            return self._loaded().get(app_id)
+
+    def record_copy_latency(self, app_id: str, seconds: float) -> None:
+        self._record(app_id, "copy", seconds)
+
+    def record_paste_latency(self, app_id: str, seconds: float) -> None:
+        self._record(app_id, "paste", seconds)
+
+    def delays_for(self, app_id: str | None, bounds: TimingDelays) -> TimingDelays:
+        # ``bounds`` are the configured delays: learned values only ever shorten
+        # them, and only a delay that was itself measured. The layout switch
+        # settle is never measured, so it always stays as configured.
+        profile = None if app_id is None else self.profile(app_id)
+        if profile is None:
+            return bounds
+
+        age = max(0.0, self.clock() - profile.updated_at)
+        # Knowledge fades: a profile nobody refreshed drifts back to the configured delays.
+        weight = math.pow(0.5, age / self.half_life_seconds)
+        delays = bounds
+        if self._trusted(profile.copy):
+            latency = profile.copy.safe(self.margin_seconds)
+            delays = replace(
+                delays,
+                settle_seconds=_learned(latency / 2, MIN_SETTLE_SECONDS, bounds.settle_seconds, weight),
+                copy_wait_timeout_seconds=_learned(
+                    3 * latency,
+                    MIN_COPY_WAIT_TIMEOUT_SECONDS,
+                    bounds.copy_wait_timeout_seconds,
+                    weight,
+                ),
+            )
+        if self._trusted(profile.paste):
+            delays = replace(
+                delays,
+                paste_restore_seconds=_learned(
+                    2 * profile.paste.safe(self.margin_seconds),
+                    MIN_PASTE_RESTORE_SECONDS,
+                    bounds.paste_restore_seconds,
+                    weight,
+                ),
+            )
+        return delays
+
+    def save(self, *, force: bool = False) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty or self._profiles is None:
+                return
+            now = time.monotonic()
+            if not force and now - self._saved_at < self.save_interval_seconds:
+                return
+            data = {
+                app_id: [_dump_estimate(profile.copy), _dump_estimate(profile.paste), profile.updated_at]
+                for app_id, profile in self._profiles.items()
+            }
+            self._dirty = False
+            self._saved_at = now
+        if write_state(self.path, _PROFILES_FORMAT_VERSION, data) and self.debug_event_logging:
+            _logger.debug("event=timing_profiles_saved path=%s profiles=%s", self.path, len(data))
+
+    def _loaded(self) -> dict[str, AppTimingProfile]:
+        if self._profiles is None:
+            self._profiles = self._read()
+        return self._profiles
+
+    def _read(self) -> dict[str, AppTimingProfile]:
+        data = None if self.path is None else read_state(self.path, _PROFILES_FORMAT_VERSION)
+        if data is None:
+            return {}
+        try:
+            return {
+                app_id: AppTimingProfile(_load_estimate(copy), _load_estimate(paste), float(updated_at))
+                for app_id, (copy, paste, updated_at) in data.items()
+            }
+        except Exception as exc:
+            _logger.warning("event=timing_profiles_invalid path=%s error=%r", self.path, exc)
+            return {}
+
+    def _record(self, app_id: str, kind: str, seconds: float) -> None:
+        now = self.clock()
+        with self._lock:
+            profiles = self._loaded()
+            profile = profiles.get(app_id)
+            if profile is None:
+                profile = profiles[app_id] = AppTimingProfile(None, None, now)
+                self._evict_oldest(profiles)
+            estimate = getattr(profile, kind)
+            if estimate is None:
+                setattr(profile, kind, LatencyEstimate(seconds, seconds / 2, 1))
+            else:
+                estimate.add(seconds, self.smoothing)
+            profile.updated_at = now
+            self._dirty = True
+
+    def _trusted(self, estimate: LatencyEstimate | None) -> bool:
+        return estimate is not None and estimate.samples >= self.min_samples
+
+    def _evict_oldest(self, profiles: dict[str, AppTimingProfile]) -> None:
+        while len(profiles) > self.max_profiles:
+            oldest = min(profiles, key=lambda app_id: profiles[app_id].updated_at)
+            del profiles[oldest]
+
+
+def _dump_estimate(estimate: LatencyEstimate | None) -> list[float] | None:
+    return None if estimate is None else [estimate.mean, estimate.deviation, estimate.samples]
+
+
+def _load_estimate(data: list[float] | None) -> LatencyEstimate | None:
+    if data is None:
+        return None
+    mean, deviation, samples = data
+    return LatencyEstimate(float(mean), float(deviation), int(samples))
+
+
+def _learned(learned: float, floor: float, bound: float, weight: float) -> float:
+    target = min(bound, max(floor, learned))
+    return bound - weight * (bound - target)
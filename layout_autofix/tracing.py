@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+# off: no debug events. stages: pipeline events with lengths and methods only.
+# payload: stages plus previews of selection and clipboard text.
+TRACE_LEVELS = ("off", "stages", "payload")
+DEFAULT_TRACE_RATE_LIMIT = 20.0
+PREVIEW_LIMIT = 120
+
+
+def resolve_trace_level(trace_level: str | None, *, debug_events: bool | None, default: str = "off") -> str:
+    # --debug-events predates tracing tiers and keeps meaning "log everything".
+    if trace_level is None:
+        if debug_events is None:
+            trace_level = default
+        else:
+            trace_level = "payload" if debug_events else "off"
+    if trace_level not in TRACE_LEVELS:
+        raise ValueError(f"trace level must be one of {', '.join(TRACE_LEVELS)}")
+    return trace_level
+
+
+class TextPreview:
+    # Rendered only when a log record is actually formatted, and then only from
+    # the first ``limit`` characters: a huge clipboard costs as much as a short one.
+    __slots__ = ("_text", "_limit", "_visible")
+
+    def __init__(self, text: str, *, limit: int = PREVIEW_LIMIT, visible: bool = True) -> None:
+        self._text = text
+        self._limit = limit
+        self._visible = visible
+
+    def __str__(self) -> str:
+        if not self._visible:
+            return f"<{len(self._text)} chars>"
+        compact = self._text[: self._limit].replace("\n", "\\n")
+        if len(compact) <= self._limit and len(self._text) <= self._limit:
+            return compact
+        return compact[: self._limit] + "..."
+
+    def __repr__(self) -> str:
+        if not self._visible:
+            return str(self)
+        return repr(str(self))
+
+
+@dataclass
+class TraceRateLimitFilter(logging.Filter):
+    # Token bucket per call site (the unformatted message template), so a chatty
+    # poll loop cannot crowd out the rest of the trace. Only DEBUG records are
+    # limited; the first record let through after a quiet spell reports how many
+    # were suppressed.
+    events_per_second: float = DEFAULT_TRACE_RATE_LIMIT
+    clock: Callable[[], float] = time.monotonic
+    _buckets: dict[object, list[float]] = field(default_factory=dict, init=False)
+    _suppressed: dict[object, int] = field(default_factory=dict, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def __post_init__(self) -> None:
+        super().__init__()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.events_per_second <= 0:
+            return True
+        key = record.msg
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.events_per_second, now]
+            tokens = min(self.events_per_second, bucket[0] + (now - bucket[1]) * self.events_per_second)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            bucket[0] = tokens - 1
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed and isinstance(record.args, tuple) and isinstance(record.msg, str):
+            record.msg = record.msg + " trace_suppressed=%s"
+            record.args = (*record.args, suppressed)
+        return True
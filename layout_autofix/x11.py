@@ -0,0 +1,729 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable
+
+from layout_autofix.accessibility import (
+    AX_ERROR_ATTRIBUTE_UNSUPPORTED,
+    AX_ERROR_CANNOT_COMPLETE,
+    AX_ERROR_NO_VALUE,
+    AX_ERROR_SUCCESS,
+)
+from layout_autofix.clipboard import DEFAULT_SNAPSHOT_MAX_BYTES, ClipboardSnapshot
+from layout_autofix.layout_source import resolve_layout_name
+from layout_autofix.lazy_imports import optional_module
+
+
+# XKB symbols by layout code, as in setxkbmap -layout. Variants that move
+# letters get their own layout; any other variant of a Cyrillic layout is unknown.
+XKB_LAYOUTS = {"us": "EN", "gb": "EN", "ru": "RUS", "ua": "UKR", "by": "BEL"}
+XKB_VARIANTS = {"dvorak": "DVORAK", "colemak": "COLEMAK"}
+_LATIN_LAYOUTS = frozenset({"us", "gb"})
+_XKB_USE_CORE_KBD = 0x0100
+_XKB_STATE_NOTIFY = 2
+_XKB_GROUP_STATE_MASK = 1 << 4
+_XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK = 1 << 0
+# Large enough for any XEvent.
+_XEVENT_LONGS = 24
+_SELECTION_PROPERTY = "LAYOUT_AUTOFIX_SELECTION"
+_TEXT_TARGETS = ("UTF8_STRING", "text/plain;charset=utf-8")
+# Targets that describe a selection or act on it rather than hold its data.
+_META_TARGETS = frozenset(
+    {"TARGETS", "MULTIPLE", "TIMESTAMP", "SAVE_TARGETS", "DELETE", "INSERT_SELECTION", "INSERT_PROPERTY"}
+)
+# Parents walked up from the focused window to find the one carrying WM_CLASS.
+_WM_CLASS_DEPTH = 8
+
+_logger = logging.getLogger(__name__)
+
+
+def x11_available() -> bool:
+    return sys.platform.startswith("linux") and bool(os.environ.get("DISPLAY"))
+
+
+def xkb_layout_id(layout: str, variant: str = "", *, debug_event_logging: bool = False) -> str | None:
+    layout = layout.strip().lower()
+    variant = variant.strip().lower()
+    for keyword, layout_id in XKB_VARIANTS.items():
+        if keyword in variant:
+            return layout_id
+    if variant and layout not in _LATIN_LAYOUTS:
+        return None
+    layout_id = XKB_LAYOUTS.get(layout)
+    if layout_id is None:
+        # Layouts registered from --layouts-dir may be named after their XKB symbols.
+        return resolve_layout_name(layout, debug_event_logging=debug_event_logging)
+    return layout_id
+
+
+def parse_rules_names(data: bytes) -> list[tuple[str, str]]:
+    # _XKB_RULES_NAMES: "rules\0model\0us,ru\0,phonetic\0options\0"; one
+    # (layout, variant) per keyboard group, in group order.
+    fields = data.decode("latin-1").split("\0")
+    if len(fields) < 3 or not fields[2]:
+        return []
+    layouts = fields[2].split(",")
+    variants = fields[3].split(",") if len(fields) > 3 else []
+    variants += [""] * (len(layouts) - len(variants))
+    return list(zip(layouts, variants))
+
+
+class _XkbStateRec(ctypes.Structure):
+    _fields_ = [
+        ("group", ctypes.c_ubyte),
+        ("locked_group", ctypes.c_ubyte),
+        ("base_group", ctypes.c_ushort),
+        ("latched_group", ctypes.c_ushort),
+        ("mods", ctypes.c_ubyte),
+        ("base_mods", ctypes.c_ubyte),
+        ("latched_mods", ctypes.c_ubyte),
+        ("locked_mods", ctypes.c_ubyte),
+        ("compat_state", ctypes.c_ubyte),
+        ("grab_mods", ctypes.c_ubyte),
+        ("compat_grab_mods", ctypes.c_ubyte),
+        ("lookup_mods", ctypes.c_ubyte),
+        ("compat_lookup_mods", ctypes.c_ubyte),
+        ("ptr_buttons", ctypes.c_ushort),
+    ]
+
+
+@lru_cache(maxsize=1)
+def _libx11() -> Any | None:
+    # python-xlib has no XKB extension; group state comes from libX11 itself.
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        library = ctypes.CDLL(ctypes.util.find_library("X11") or "libX11.so.6")
+    except OSError:
+        return None
+    display, window, atom = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong
+    library.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    library.XOpenDisplay.restype = display
+    library.XCloseDisplay.argtypes = [display]
+    library.XConnectionNumber.argtypes = [display]
+    library.XPending.argtypes = [display]
+    library.XNextEvent.argtypes = [display, ctypes.c_void_p]
+    library.XDefaultRootWindow.argtypes = [display]
+    library.XDefaultRootWindow.restype = window
+    library.XInternAtom.argtypes = [display, ctypes.c_char_p, ctypes.c_int]
+    library.XInternAtom.restype = atom
+    library.XGetWindowProperty.argtypes = [
+        display,
+        window,
+        atom,
+        ctypes.c_long,
+        ctypes.c_long,
+        ctypes.c_int,
+        atom,
+        ctypes.POINTER(atom),
+        ctypes.POINTER(ctypes.c_int),
+        ctypes.POINTER(ctypes.c_ulong),
+        ctypes.POINTER(ctypes.c_ulong),
+        ctypes.POINTER(ctypes.c_void_p),
+    ]
+    library.XFree.argtypes = [ctypes.c_void_p]
+    library.XFlush.argtypes = [display]
+    library.XkbSelectEventDetails.argtypes = [display, ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_ulong]
+    library.XkbGetState.argtypes = [display, ctypes.c_uint, ctypes.POINTER(_XkbStateRec)]
+    library.XkbLockGroup.argtypes = [display, ctypes.c_uint, ctypes.c_uint]
+    return library
+
+
+def _read_rules_names(library: Any, display: int) -> bytes:
+    actual_type = ctypes.c_ulong()
+    actual_format = ctypes.c_int()
+    items = ctypes.c_ulong()
+    bytes_after = ctypes.c_ulong()
+    data = ctypes.c_void_p()
+    status = library.XGetWindowProperty(
+        display,
+        library.XDefaultRootWindow(display),
+        library.XInternAtom(display, b"_XKB_RULES_NAMES", False),
+        0,
+        1024,
+        False,
+        0,
+        ctypes.byref(actual_type),
+        ctypes.byref(actual_format),
+        ctypes.byref(items),
+        ctypes.byref(bytes_after),
+        ctypes.byref(data),
+    )
+    if status != 0 or not data.value:
+        return b""
+    try:
+        return ctypes.string_at(data.value, items.value) if actual_format.value == 8 else b""
+    finally:
+        library.XFree(data)
+
+
+@dataclass
+class XkbLayoutSource:
+    # One X connection for the watcher's lifetime: the server pushes keyboard
+    # group changes (XkbStateNotify) instead of being asked on every poll. The
+    # connection is only used by one thread at a time: start(), then the watcher.
+    debug_event_logging: bool = False
+    display_name: str | None = None
+    _layout: str | None = field(default=None, init=False)
+    _display: int | None = field(default=None, init=False)
+    _changed: threading.Event = field(default_factory=threading.Event, init=False)
+    _stopped: threading.Event = field(default_factory=threading.Event, init=False)
+    _thread: threading.Thread | None = field(default=None, init=False)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        library = _libx11()
+        if library is None:
+            raise RuntimeError("libX11 is required for XKB layout tracking")
+        display = library.XOpenDisplay(None if self.display_name is None else self.display_name.encode())
+        if not display:
+            raise RuntimeError(f"cannot open X display {self.display_name or os.environ.get('DISPLAY')!r}")
+        if not library.XkbSelectEventDetails(
+            display,
+            _XKB_USE_CORE_KBD,
+            _XKB_STATE_NOTIFY,
+            _XKB_GROUP_STATE_MASK,
+            _XKB_GROUP_STATE_MASK,
+        ):
+            library.XCloseDisplay(display)
+            raise RuntimeError("the X server has no XKB extension")
+        self._display = display
+        self._stopped.clear()
+        self._refresh_layout()
+        self._thread = threading.Thread(target=self._watch_groups, name="layout-autofix-xkb", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # The watcher closes the connection once it notices.
+        self._stopped.set()
+        self._changed.set()
+        self._thread = None
+
+    def current_layout(self) -> str | None:
+        return self._layout
+
+    def wait_for_change(self, timeout: float) -> bool:
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+    def _refresh_layout(self) -> None:
+        library = _libx11()
+        state = _XkbStateRec()
+        if library.XkbGetState(self._display, _XKB_USE_CORE_KBD, ctypes.byref(state)) != 0:
+            if self.debug_event_logging:
+                _logger.debug("event=layout_read_failed reason=xkb_get_state")
+            self._layout = None
+            return
+        # Re-read every time: setxkbmap may have changed the layouts since.
+        groups = parse_rules_names(_read_rules_names(library, self._display))
+        if state.group >= len(groups):
+            if self.debug_event_logging:
+                _logger.debug("event=layout_parse_failed reason=no_xkb_group group=%s groups=%s", state.group, groups)
+            self._layout = None
+            return
+        layout, variant = groups[state.group]
+        self._layout = xkb_layout_id(layout, variant, debug_event_logging=self.debug_event_logging)
+
+    def _watch_groups(self) -> None:
+        library = _libx11()
+        display = self._display
+        event = (ctypes.c_long * _XEVENT_LONGS)()
+        connection = library.XConnectionNumber(display)
+        try:
+            while not self._stopped.is_set():
+                # XPending also reads what is already on the socket; select only
+                # sees data Xlib has not buffered yet.
+                if not library.XPending(display):
+                    select.select([connection], [], [], 0.5)
+                    continue
+                while library.XPending(display):
+                    # Only group changes were selected: every event is one.
+                    library.XNextEvent(display, event)
+                self._refresh_layout()
+                if self.debug_event_logging:
+                    _logger.debug("event=xkb_group_changed layout=%s", self._layout)
+                self._changed.set()
+        except Exception:
+            _logger.exception("event=xkb_watcher_exception")
+        finally:
+            self._display = None
+            library.XCloseDisplay(display)
+
+
+@dataclass(frozen=True)
+class SelectionData:
+    # One target of a selection as its owner set the property: served back unchanged.
+    type: int
+    format: int
+    # bytes for format 8, an array of integers for formats 16 and 32.
+    value: Any
+
+    @property
+    def size(self) -> int:
+        return len(self.value) * self.format // 8
+
+
+class _SelectionTooLarge(Exception):
+    pass
+
+
+def _ignore_x_error(_error: Any, _request: Any) -> bool:
+    # The requestor may be gone by the time its answer is sent.
+    return True
+
+
+@dataclass
+class X11SelectionConnection:
+    # A python-xlib connection with a hidden window. It asks selection owners
+    # for their data and owns CLIPBOARD itself to serve what the fixer writes,
+    # so nothing is spawned per operation. One thread reads every event and
+    # hands replies to the callers waiting on them.
+    display_name: str | None = None
+    timeout_seconds: float = 0.5
+    debug_event_logging: bool = False
+    _display: Any = field(default=None, init=False)
+    _window: Any = field(default=None, init=False)
+    _X: Any = field(default=None, init=False)
+    _alive: bool = field(default=False, init=False)
+    _failed: bool = field(default=False, init=False)
+    _atoms: dict[str, int] = field(default_factory=dict, init=False)
+    _owned: dict[int, dict[int, SelectionData]] = field(default_factory=dict, init=False)
+    _owner_changes: dict[int, int] = field(default_factory=dict, init=False)
+    _xfixes_event: int | None = field(default=None, init=False)
+    _replies: list[Any] = field(default_factory=list, init=False)
+    _arrived: threading.Condition = field(default_factory=threading.Condition, init=False)
+    _start_lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+    _convert_lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def start(self) -> bool:
+        with self._start_lock:
+            if self._alive or self._failed:
+                return self._alive
+            try:
+                self._connect()
+            except Exception as exc:
+                # Not retried: without a display every later call would fail the same way.
+                self._failed = True
+                _logger.warning("event=x11_connect_failed display=%s error=%r", self.display_name, exc)
+                return False
+            self._alive = True
+            threading.Thread(target=self._serve, name="layout-autofix-x11-selections", daemon=True).start()
+            return True
+
+    def atom(self, name: str) -> int:
+        atom = self._atoms.get(name)
+        if atom is None:
+            atom = self._atoms[name] = self._display.intern_atom(name)
+        return atom
+
+    def atom_name(self, atom: int) -> str:
+        return self._display.get_atom_name(atom)
+
+    def owner(self, selection: str) -> int | None:
+        return self._owner_of(self.atom(selection))
+
+    def owner_changes(self, selection: str) -> int | None:
+        # Counts every SetSelectionOwner, the X counterpart of a pasteboard change count.
+        if self._xfixes_event is None:
+            return None
+        return self._owner_changes.get(self.atom(selection), 0)
+
+    def same_client(self, first: int, second: int) -> bool:
+        # Every resource a client creates carries that client's ID base.
+        mask = self._display.display.info.resource_id_mask
+        return first & ~mask == second & ~mask
+
+    def focused_window(self) -> int | None:
+        focus = getattr(self._display.get_input_focus().focus, "id", None)
+        return focus or None
+
+    def window_class(self, window_id: int) -> str | None:
+        window = self._display.create_resource_object("window", window_id)
+        for _ in range(_WM_CLASS_DEPTH):
+            wm_class = window.get_wm_class()
+            if wm_class:
+                return wm_class[-1]
+            tree = window.query_tree()
+            if tree.parent == self._X.NONE or tree.parent == tree.root:
+                return None
+            window = tree.parent
+        return None
+
+    def read_text(self, selection: str) -> str | None:
+        # "" when nobody owns the selection or it holds no text; None when the owner did not answer.
+        if self.owner(selection) is None:
+            return ""
+        for target in (*_TEXT_TARGETS, "STRING"):
+            try:
+                data = self.convert(selection, target)
+            except _SelectionTooLarge:
+                return None
+            if data is not None:
+                encoding = "latin-1" if data.type == self.atom("STRING") else "utf-8"
+                return bytes(data.value).decode(encoding, errors="replace") if data.format == 8 else ""
+            if not self._alive:
+                return None
+        return ""
+
+    def convert(
+        self,
+        selection: str,
+        target: str | int,
+        max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES,
+    ) -> SelectionData | None:
+        # Asks the owner to write ``target`` onto our window. None when it refuses
+        # or does not answer in time; _SelectionTooLarge past ``max_bytes``.
+        X = self._X
+        selection_atom = self.atom(selection)
+        target_atom = self.atom(target) if isinstance(target, str) else target
+        property_atom = self.atom(_SELECTION_PROPERTY)
+        with self._convert_lock:
+            with self._arrived:
+                self._replies.clear()
+            self._window.convert_selection(selection_atom, target_atom, property_atom, X.CurrentTime)
+            self._display.flush()
+            notify = self._wait_for(
+                lambda event: event.type == X.SelectionNotify and event.selection == selection_atom,
+                time.monotonic() + self.timeout_seconds,
+            )
+            if notify is None:
+                if self.debug_event_logging:
+                    _logger.debug("event=x11_selection_timeout selection=%s target=%s", selection, target)
+                return None
+            if notify.property == X.NONE:
+                return None
+            return self._read_property(property_atom, max_bytes)
+
+    def own(self, selection: str, targets: dict[int, SelectionData]) -> bool:
+        X = self._X
+        selection_atom = self.atom(selection)
+        self._owned[selection_atom] = targets
+        # Counted here too: the XFixes event for it arrives later, on the other thread.
+        self._owner_changes[selection_atom] = self._owner_changes.get(selection_atom, 0) + 1
+        self._window.set_selection_owner(selection_atom, X.CurrentTime)
+        if self.owner(selection) != self._window.id:
+            self._owned.pop(selection_atom, None)
+            if self.debug_event_logging:
+                _logger.debug("event=x11_selection_own_failed selection=%s", selection)
+            return False
+        return True
+
+    def text_targets(self, text: str) -> dict[int, SelectionData]:
+        data = SelectionData(self.atom("UTF8_STRING"), 8, text.encode("utf-8"))
+        targets = {self.atom(target): data for target in _TEXT_TARGETS}
+        try:
+            targets[self.atom("STRING")] = SelectionData(self.atom("STRING"), 8, text.encode("latin-1"))
+        except UnicodeEncodeError:
+            pass
+        return targets
+
+    @property
+    def max_property_bytes(self) -> int:
+        # One ChangeProperty request; larger data would need the INCR protocol.
+        return self._display.display.info.max_request_length * 4 - 32
+
+    def _connect(self) -> None:
+        # Xlib.threaded has to be loaded before the connection opens for it to be shared between threads.
+        if optional_module("Xlib.threaded") is None:
+            raise RuntimeError("python-xlib is required for X11 selections")
+        X = optional_module("Xlib.X")
+        display = optional_module("Xlib.display").Display(self.display_name)
+        window = display.screen().root.create_window(
+            -10, -10, 1, 1, 0, X.CopyFromParent, event_mask=X.PropertyChangeMask
+        )
+        self._X, self._display, self._window = X, display, window
+        for name in ("TARGETS", "ATOM", "INCR", "STRING", _SELECTION_PROPERTY, *_TEXT_TARGETS):
+            self.atom(name)
+        if display.has_extension("XFIXES"):
+            display.xfixes_query_version()
+            display.xfixes_select_selection_input(
+                window,
+                self.atom("CLIPBOARD"),
+                _XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK,
+            )
+            self._xfixes_event = display.extension_event.SetSelectionOwnerNotify[0]
+        display.flush()
+
+    def _owner_of(self, selection_atom: int) -> int | None:
+        owner = self._display.get_selection_owner(selection_atom)
+        return getattr(owner, "id", None)
+
+    def _serve(self) -> None:
+        X = self._X
+        try:
+            while True:
+                event = self._display.next_event()
+                if event.type == X.SelectionRequest:
+                    self._answer(event)
+                elif event.type == X.SelectionClear:
+                    # Someone else copied; unless we have since taken it back, stop serving it.
+                    if self._owner_of(event.atom) != self._window.id:
+                        self._owned.pop(event.atom, None)
+                elif event.type in (X.SelectionNotify, X.PropertyNotify):
+                    with self._arrived:
+                        self._replies.append(event)
+                        self._arrived.notify_all()
+                elif event.type == self._xfixes_event:
+                    self._owner_changes[event.selection] = self._owner_changes.get(event.selection, 0) + 1
+        except Exception as exc:
+            _logger.warning("event=x11_connection_lost error=%r", exc)
+        finally:
+            with self._arrived:
+                self._alive = False
+                self._arrived.notify_all()
+
+    def _answer(self, request: Any) -> None:
+        X = self._X
+        # Obsolete requestors leave the property unset and mean the target's name.
+        property_atom = request.property or request.target
+        targets = self._owned.get(request.selection)
+        data = None
+        if targets is not None:
+            if request.target == self.atom("TARGETS"):
+                data = SelectionData(self.atom("ATOM"), 32, [self.atom("TARGETS"), *targets])
+            else:
+                data = targets.get(request.target)
+        requestor = self._display.create_resource_object("window", request.requestor)
+        if data is not None and data.size <= self.max_property_bytes:
+            requestor.change_property(property_atom, data.type, data.format, data.value, onerror=_ignore_x_error)
+        else:
+            property_atom = X.NONE
+        reply = optional_module("Xlib.protocol.event").SelectionNotify(
+            time=request.time,
+            requestor=request.requestor,
+            selection=request.selection,
+            target=request.target,
+            property=property_atom,
+        )
+        requestor.send_event(reply, onerror=_ignore_x_error)
+        self._display.flush()
+
+    def _read_property(self, property_atom: int, max_bytes: int) -> SelectionData | None:
+        X = self._X
+        reply = self._window.get_property(property_atom, X.AnyPropertyType, 0, max_bytes // 4 + 1, delete=True)
+        if reply is None:
+            return None
+        if reply.property_type == self.atom("INCR"):
+            return self._read_incremental(property_atom, max_bytes)
+        if reply.bytes_after:
+            raise _SelectionTooLarge
+        return SelectionData(reply.property_type, reply.format, reply.value)
+
+    def _read_incremental(self, property_atom: int, max_bytes: int) -> SelectionData | None:
+        # INCR: deleting the property (done by the read above) asks the owner
+        # for the next chunk; an empty chunk ends the transfer.
+        X = self._X
+        chunks: list[Any] = []
+        size = 0
+        while True:
+            notify = self._wait_for(
+                lambda event: (
+                    event.type == X.PropertyNotify
+                    and event.atom == property_atom
+                    and event.state == X.PropertyNewValue
+                ),
+                time.monotonic() + self.timeout_seconds,
+            )
+            if notify is None:
+                return None
+            chunk = self._window.get_property(property_atom, X.AnyPropertyType, 0, max_bytes // 4 + 1, delete=True)
+            if chunk is None:
+                # The notification for the INCR property itself, already read.
+                continue
+            if not len(chunk.value):
+                break
+            size += len(chunk.value) * chunk.format // 8
+            if size > max_bytes:
+                raise _SelectionTooLarge
+            chunks.append(chunk.value)
+        if chunk.format == 8:
+            value: Any = b"".join(chunks)
+        else:
+            value = chunk.value
+            for part in chunks:
+                value.extend(part)
+        return SelectionData(chunk.property_type, chunk.format, value)
+
+    def _wait_for(self, matches: Callable[[Any], bool], deadline: float) -> Any | None:
+        with self._arrived:
+            while True:
+                for index, event in enumerate(self._replies):
+                    if matches(event):
+                        return self._replies.pop(index)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._alive:
+                    return None
+                self._arrived.wait(remaining)
+
+
+@lru_cache(maxsize=None)
+def shared_connection(display_name: str | None = None) -> X11SelectionConnection:
+    # The clipboard, the selection reader and the frontmost-app lookup share
+    # one connection; it connects on first use.
+    return X11SelectionConnection(display_name=display_name)
+
+
+@dataclass
+class X11Clipboard:
+    # CLIPBOARD through the shared connection: reads ask the owner directly,
+    # writes make this process the owner. Ownership, and so the restored
+    # clipboard, ends with the process unless a clipboard manager takes it over.
+    debug_event_logging: bool = False
+    connection: X11SelectionConnection = field(default_factory=shared_connection)
+
+    def read_text(self) -> str | None:
+        if not self.connection.start():
+            return None
+        try:
+            return self.connection.read_text("CLIPBOARD")
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_read_exception backend=x11 error=%r", exc)
+            return None
+
+    def write_text(self, text: str) -> bool:
+        if not self.connection.start():
+            return False
+        if len(text.encode("utf-8")) > self.connection.max_property_bytes:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_write_failed backend=x11 reason=too_large")
+            return False
+        try:
+            return self.connection.own("CLIPBOARD", self.connection.text_targets(text))
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_write_exception backend=x11 error=%r", exc)
+            return False
+
+    def change_count(self) -> int | None:
+        if not self.connection.start():
+            return None
+        return self.connection.owner_changes("CLIPBOARD")
+
+    def snapshot(self, max_bytes: int = DEFAULT_SNAPSHOT_MAX_BYTES) -> ClipboardSnapshot | None:
+        connection = self.connection
+        if not connection.start():
+            return None
+        # Served back later with one ChangeProperty each, so no type may exceed one request.
+        limit = min(max_bytes, connection.max_property_bytes)
+        try:
+            change_count = connection.owner_changes("CLIPBOARD")
+            if connection.owner("CLIPBOARD") is None:
+                return ClipboardSnapshot((), 0, change_count)
+            targets = connection.convert("CLIPBOARD", "TARGETS")
+            if targets is None or targets.format != 32:
+                return None
+            pairs: list[tuple[str, SelectionData]] = []
+            size = 0
+            dropped = 0
+            for target in targets.value:
+                name = connection.atom_name(target)
+                if name in _META_TARGETS:
+                    continue
+                try:
+                    data = connection.convert("CLIPBOARD", target, limit)
+                except _SelectionTooLarge:
+                    data = None
+                    dropped += 1
+                if data is None:
+                    continue
+                if size + data.size > max_bytes:
+                    dropped += 1
+                    continue
+                size += data.size
+                pairs.append((name, data))
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_snapshot_exception backend=x11 error=%r", exc)
+            return None
+        if dropped and not pairs:
+            return None
+        return ClipboardSnapshot((tuple(pairs),) if pairs else (), size, change_count, dropped)
+
+    def restore(self, snapshot: ClipboardSnapshot) -> bool:
+        connection = self.connection
+        if not connection.start():
+            return False
+        try:
+            targets = {
+                connection.atom(name): data
+                for item in snapshot.items
+                for name, data in item
+                if isinstance(data, SelectionData)
+            }
+            return connection.own("CLIPBOARD", targets)
+        except Exception as exc:
+            if self.debug_event_logging:
+                _logger.debug("event=clipboard_restore_exception backend=x11 error=%r", exc)
+            return False
+
+
+@dataclass
+class X11PrimarySelection:
+    # The accessibility backend for X11: the selection is read straight from
+    # its owner (PRIMARY), without a copy shortcut. X offers no way to write
+    # into another client's text, so replacing always goes through the clipboard.
+    debug_event_logging: bool = False
+    connection: X11SelectionConnection = field(default_factory=shared_connection)
+
+    def is_trusted(self) -> bool:
+        # X has no permission to grant; only a missing display stops it.
+        return self.connection.start()
+
+    def prompt_for_trust(self) -> None:
+        return None
+
+    def focused_element(self) -> tuple[int, object | None]:
+        if not self.connection.start():
+            return AX_ERROR_CANNOT_COMPLETE, None
+        focus = self.connection.focused_window()
+        return (AX_ERROR_SUCCESS, focus) if focus is not None else (AX_ERROR_NO_VALUE, None)
+
+    def selected_text(self, element: object) -> tuple[int, str | None]:
+        connection = self.connection
+        owner = connection.owner("PRIMARY")
+        if owner is None or not connection.same_client(owner, element):
+            # PRIMARY outlives the selection in some apps: one left behind in
+            # another window is not what the user is looking at.
+            return AX_ERROR_SUCCESS, ""
+        text = connection.read_text("PRIMARY")
+        if text is None:
+            return AX_ERROR_CANNOT_COMPLETE, None
+        return AX_ERROR_SUCCESS, text
+
+    def set_selected_text(self, element: object, text: str) -> int:
+        return AX_ERROR_ATTRIBUTE_UNSUPPORTED
+
+    def select_before_caret(self, element: object, length: int) -> int:
+        return AX_ERROR_ATTRIBUTE_UNSUPPORTED
+
+    def same_element(self, first: object, second: object) -> bool:
+        return first == second
+
+    def is_secure_text_field(self, element: object) -> bool:
+        return False
+
+
+def focused_window_class(*, debug_event_logging: bool = False) -> str | None:
+    # WM_CLASS of the focused window: what timing profiles and the capability cache key on.
+    connection = shared_connection()
+    if not connection.start():
+        return None
+    try:
+        focus = connection.focused_window()
+        return None if focus is None else connection.window_class(focus)
+    except Exception as exc:
+        if debug_event_logging:
+            _logger.debug("event=frontmost_app_failed error=%r", exc)
+        return None
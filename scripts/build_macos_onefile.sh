@@ -25,6 +25,7 @@ rm -rf build dist/LayoutAutofix dist/LayoutAutofix.app LayoutAutofix.spec
   --osx-bundle-identifier io.vibento.layout-autofix \
   --icon "$ICON_PATH" \
   --add-data "$ICON_PATH:." \
+  --add-data "$ROOT_DIR/layout_autofix/data:layout_autofix/data" \
   --name LayoutAutofix \
   layout_autofix/macos_app.py
 
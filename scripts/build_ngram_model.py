@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import math
+from collections import Counter
+from pathlib import Path
+
+from layout_autofix.classifier import (
+    DEFAULT_MODEL_FILE,
+    LANGUAGE_ALPHABETS,
+    NgramModel,
+    encode_models,
+    iter_letter_runs,
+)
+
+CORPUS_DIR = Path(__file__).resolve().parent / "ngram_corpus"
+SCALE = 16.0
+# Interpolation weights for trigram, bigram, unigram and uniform estimates.
+WEIGHTS = (0.6, 0.3, 0.09, 0.01)
+
+
+def train_model(language: str, text: str) -> NgramModel:
+    alphabet = LANGUAGE_ALPHABETS[language]
+    index = {ch: i + 1 for i, ch in enumerate(alphabet)}
+    size = len(alphabet) + 1
+
+    trigrams: Counter[tuple[int, int, int]] = Counter()
+    for run in iter_letter_runs(text, alphabet):
+        symbols = [0, 0, *(index[ch] for ch in run), 0]
+        for position in range(2, len(symbols)):
+            trigrams[(symbols[position - 2], symbols[position - 1], symbols[position])] += 1
+
+    bigrams: Counter[tuple[int, int]] = Counter()
+    unigrams: Counter[int] = Counter()
+    contexts2: Counter[tuple[int, int]] = Counter()
+    contexts1: Counter[int] = Counter()
+    for (a, b, c), count in trigrams.items():
+        bigrams[(b, c)] += count
+        unigrams[c] += count
+        contexts2[(a, b)] += count
+        contexts1[b] += count
+    total = sum(unigrams.values())
+
+    table = bytearray(size**3)
+    for a in range(size):
+        for b in range(size):
+            for c in range(size):
+                probability = WEIGHTS[3] / size + WEIGHTS[2] * unigrams[c] / total
+                if contexts1[b]:
+                    probability += WEIGHTS[1] * bigrams[(b, c)] / contexts1[b]
+                if contexts2[(a, b)]:
+                    probability += WEIGHTS[0] * trigrams[(a, b, c)] / contexts2[(a, b)]
+                table[(a * size + b) * size + c] = min(255, round(-math.log2(probability) * SCALE))
+
+    mean_bits = sum(table[(a * size + b) * size + c] * count for (a, b, c), count in trigrams.items())
+    mean_bits /= SCALE * sum(trigrams.values())
+    return NgramModel(language, alphabet, SCALE, mean_bits, bytes(table))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Builds the EN/RU character n-gram model used by the classifier.")
+    parser.add_argument("--corpus-dir", type=Path, default=CORPUS_DIR)
+    parser.add_argument("--output", type=Path, default=DEFAULT_MODEL_FILE)
+    args = parser.parse_args()
+
+    models = [
+        train_model(language, (args.corpus_dir / f"{language}.txt").read_text(encoding="utf-8"))
+        for language in LANGUAGE_ALPHABETS
+    ]
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_bytes(encode_models(models))
+    for model in models:
+        print(f"{model.language}: {len(model.table)} bytes, mean {model.mean_bits:.2f} bits/trigram")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from layout_autofix.accessibility import (
+    AX_ERROR_API_DISABLED,
+    AccessibilityTrust,
+    AXSession,
+)
+from layout_autofix.simulation import SimulatedAccessibility, SimulatedDesktop, SimulatedLayoutFixer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FocusStealingFixer(SimulatedLayoutFixer):
+    # Focus moves to another element while the conversion is between capture and replace.
+    def _already_correct_confidence(self, *args: object) -> float | None:
+        self.desktop.move_focus("search-field")
+        return None
+
+
+class ApiDisabledAccessibility(SimulatedAccessibility):
+    def focused_element(self) -> tuple[int, object | None]:
+        self.calls["focused_element"] += 1
+        return AX_ERROR_API_DISABLED, None
+
+
+def make_fixer(desktop: SimulatedDesktop, fixer_class: type = SimulatedLayoutFixer) -> SimulatedLayoutFixer:
+    return fixer_class(
+        desktop,
+        layout_switch_settle_delay_seconds=0,
+        settle_delay_seconds=0,
+        selection_copy_poll_interval_seconds=0.001,
+        paste_restore_delay_seconds=0,
+        auto_direction_confidence_threshold=2.0,
+    )
+
+
+def test_session_resolves_focused_element_once() -> None:
+    desktop = SimulatedDesktop()
+    desktop.select("ghbdtn")
+    backend = SimulatedAccessibility(desktop)
+    session = AXSession(backend)
+
+    assert session.read_selected_text() == "ghbdtn"
+    assert session.replace_selected_text("привет")
+
+    assert backend.calls == {"focused_element": 1, "selected_text": 1, "set_selected_text": 1}
+    assert desktop.text == "привет"
+
+
+def test_session_skips_write_when_selection_attribute_is_unsupported() -> None:
+    desktop = SimulatedDesktop(ax_read_supported=False)
+    desktop.select("ghbdtn")
+    backend = SimulatedAccessibility(desktop)
+    session = AXSession(backend)
+
+    assert session.read_selected_text() is None
+    assert not session.replace_selected_text("привет")
+
+    assert backend.calls["set_selected_text"] == 0
+
+
+def test_session_detects_focus_move() -> None:
+    desktop = SimulatedDesktop()
+    session = AXSession(SimulatedAccessibility(desktop))
+    assert not session.focus_moved()
+
+    session.read_selected_text()
+    assert not session.focus_moved()
+    desktop.move_focus("search-field")
+    assert session.focus_moved()
+
+
+def test_ax_conversion_makes_four_accessibility_calls() -> None:
+    desktop = SimulatedDesktop()
+    desktop.select("ghbdtn", prefix="> ")
+    fixer = make_fixer(desktop)
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert desktop.text == "> привет"
+    # Focus, selection, focus re-check before writing, and the write itself.
+    assert fixer.accessibility.calls == {"focused_element": 2, "selected_text": 1, "set_selected_text": 1}
+
+
+def test_conversion_does_not_write_after_focus_moved() -> None:
+    desktop = SimulatedDesktop(clipboard_text="keep")
+    desktop.select("ghbdtn")
+    fixer = make_fixer(desktop, FocusStealingFixer)
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    desktop.settle()
+
+    assert desktop.text == "ghbdtn"
+    assert desktop.shortcuts == []
+    assert fixer.accessibility.calls["set_selected_text"] == 0
+    assert fixer.metrics.counter("focus_moved") == 1
+
+
+def test_trust_state_is_cached_for_its_ttl() -> None:
+    clock = FakeClock()
+    backend = SimulatedAccessibility(SimulatedDesktop())
+    trust = AccessibilityTrust(backend, ttl_seconds=5.0, clock=clock)
+
+    assert trust.is_trusted()
+    assert trust.is_trusted()
+    clock.now = 5.0
+    assert trust.is_trusted()
+
+    assert backend.calls["is_trusted"] == 2
+
+
+def test_untrusted_check_prompts_and_rechecks() -> None:
+    desktop = SimulatedDesktop(ax_trusted=False)
+    fixer = make_fixer(desktop)
+
+    assert not fixer._check_ax_permission(prompt=True)
+    desktop.ax_trusted = True
+    assert fixer._check_ax_permission(prompt=False)
+
+    assert fixer.accessibility.calls["prompt_for_trust"] == 1
+    assert fixer.accessibility.calls["is_trusted"] == 2
+
+
+def test_disabled_accessibility_api_prompts_for_trust() -> None:
+    desktop = SimulatedDesktop(ax_trusted=False)
+    desktop.select("ghbdtn")
+    fixer = SimulatedLayoutFixer(desktop, accessibility=ApiDisabledAccessibility(desktop))
+
+    assert fixer._read_selected_text_ax() is None
+    assert fixer.accessibility.calls["prompt_for_trust"] == 1
@@ -1,4 +1,10 @@
+import time
+
 from layout_autofix.app import AutoLayoutFixer
+from layout_autofix.capability_cache import CapabilityCache
+from layout_autofix.clipboard import ClipboardSnapshot, InMemoryClipboard
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer
+from layout_autofix.timing_profiles import TimingProfileStore
 
 
 class PollProbeFixer(AutoLayoutFixer):
@@ -18,28 +24,29 @@ class PollProbeFixer(AutoLayoutFixer):
         self._index += 1
         return layout
 
-    def _schedule_selection_conversion(self, target_layout: str) -> None:
+    def _schedule_selection_conversion(self, target_layout: str, source_layout: str | None = None) -> None:
         self.scheduled.append(target_layout)
 
 
 class ConversionProbeFixer(AutoLayoutFixer):
     def __init__(self, selected_text: str | None) -> None:
-        super().__init__(layout_poll_interval_seconds=0, settle_delay_seconds=0, paste_restore_delay_seconds=0)
+        super().__init__(
+            layout_poll_interval_seconds=0,
+            settle_delay_seconds=0,
+            paste_restore_delay_seconds=0,
+            clipboard=InMemoryClipboard(),
+        )
         self.selected_text = selected_text
         self.replaced_texts: list[str] = []
-        self.restored_clipboards: list[str] = []
+        self.restored_clipboards = self.clipboard.writes
 
-    def _capture_selected_text(self) -> tuple[str | None, str | None]:
-        return self.selected_text, "saved-clipboard"
+    def _capture_selected_text(self) -> tuple[str | None, ClipboardSnapshot | None]:
+        return self.selected_text, ClipboardSnapshot.of_text("saved-clipboard")
 
     def _replace_selected_text(self, text: str) -> bool:
         self.replaced_texts.append(text)
         return True
 
-    def _write_clipboard(self, text: str) -> bool:
-        self.restored_clipboards.append(text)
-        return True
-
 
 class ClipboardProbeFixer(AutoLayoutFixer):
     def __init__(
@@ -110,13 +117,381 @@ def test_no_selection_skips_replacement() -> None:
     assert fixer.restored_clipboards == ["saved-clipboard"]
 
 
-def test_wait_for_clipboard_change_returns_text_when_updated() -> None:
+def test_wait_for_clipboard_marker_change_returns_text_when_updated() -> None:
     fixer = ClipboardProbeFixer(["marker", "marker", "copied-text"], wait_timeout=0.1)
 
-    assert fixer._wait_for_clipboard_change("marker") == "copied-text"
+    assert fixer._wait_for_copy(None, "marker") == "copied-text"
 
 
-def test_wait_for_clipboard_change_times_out_when_marker_stays() -> None:
+def test_wait_for_clipboard_marker_change_times_out_when_marker_stays() -> None:
     fixer = ClipboardProbeFixer(["marker"], wait_timeout=0.02, poll_interval=0.005)
 
-    assert fixer._wait_for_clipboard_change("marker") is None
+    assert fixer._wait_for_copy(None, "marker") is None
+
+
+class InMemoryClipboardFixer(AutoLayoutFixer):
+    def __init__(self, clipboard: InMemoryClipboard, selected_text: str) -> None:
+        super().__init__(
+            layout_switch_settle_delay_seconds=0,
+            settle_delay_seconds=0,
+            paste_restore_delay_seconds=0,
+            clipboard=clipboard,
+        )
+        self.selected_text = selected_text
+        self.pasted: list[str | None] = []
+
+    def _read_selected_text_ax(self) -> str | None:
+        return None
+
+    def _replace_selected_text_ax(self, text: str) -> bool:
+        return False
+
+    def _copy_selected_text_to_clipboard(self, change_count: int | None, marker: str | None) -> str | None:
+        self.clipboard.write_text(self.selected_text)
+        return self.selected_text
+
+    def _send_shortcut(self, modifier: object, key: str) -> None:
+        self.pasted.append(self.clipboard.read_text())
+
+
+def test_conversion_restores_clipboard_through_backend() -> None:
+    clipboard = InMemoryClipboard(text="saved-clipboard")
+    fixer = InMemoryClipboardFixer(clipboard, selected_text="ghbdtn")
+
+    fixer._convert_selected_text_after_switch(target_layout="RUS")
+
+    assert fixer.pasted == ["привет"]
+    assert clipboard.text == "saved-clipboard"
+
+
+def test_conversion_records_stage_timings_and_paths() -> None:
+    fixer = InMemoryClipboardFixer(InMemoryClipboard(text="saved-clipboard"), selected_text="ghbdtn")
+
+    fixer._convert_selected_text_after_switch(target_layout="RUS")
+
+    snapshot = fixer.metrics_snapshot()
+    for stage in ("switch_settle", "ax_read", "switch_layout", "paste", "paste_restore", "clipboard_restore", "total"):
+        assert snapshot["stages"][stage]["count"] == 1
+    assert snapshot["counters"]["capture_clipboard"] == 1
+    assert snapshot["counters"]["replace_clipboard"] == 1
+    assert snapshot["counters"]["converted"] == 1
+    assert snapshot["counters"]["subprocess_spawns"] == 0
+
+
+class CountingClipboard(InMemoryClipboard):
+    def __init__(self, text: str, *, copy_after_polls: int | None) -> None:
+        super().__init__(text=text)
+        self.copy_after_polls = copy_after_polls
+        self.counter_polls = 0
+        self.pending_copy: str | None = None
+
+    def change_count(self) -> int | None:
+        self.counter_polls += 1
+        if (
+            self.pending_copy is not None
+            and self.copy_after_polls is not None
+            and self.counter_polls > self.copy_after_polls
+        ):
+            self.write_text(self.pending_copy)
+            self.pending_copy = None
+        return self.changes
+
+
+class CopyProbeFixer(AutoLayoutFixer):
+    def __init__(
+        self,
+        clipboard: CountingClipboard,
+        *,
+        selection: str,
+        copies_on: set[str],
+        quartz_available: bool = True,
+    ) -> None:
+        super().__init__(
+            settle_delay_seconds=0,
+            selection_copy_wait_timeout_seconds=0.05,
+            selection_copy_poll_interval_seconds=0,
+            clipboard=clipboard,
+        )
+        self.selection = selection
+        self.copies_on = copies_on
+        self.quartz_available = quartz_available
+        self.shortcuts: list[str] = []
+
+    def _read_selected_text_ax(self) -> str | None:
+        return None
+
+    def _send_shortcut(self, modifier: object, key: str) -> None:
+        self.shortcuts.append("pynput")
+        if "pynput" in self.copies_on:
+            self.clipboard.pending_copy = self.selection
+
+    def _send_command_shortcut_quartz(self, key: str) -> bool:
+        self.shortcuts.append("quartz")
+        if not self.quartz_available:
+            return False
+        if "quartz" in self.copies_on:
+            self.clipboard.pending_copy = self.selection
+        return True
+
+
+def test_copy_detection_reads_clipboard_once_after_counter_changes() -> None:
+    clipboard = CountingClipboard("saved", copy_after_polls=3)
+    fixer = CopyProbeFixer(clipboard, selection="ghbdtn", copies_on={"pynput"})
+
+    selected, previous = fixer._capture_selected_text()
+
+    assert (selected, previous.text()) == ("ghbdtn", "saved")
+    assert fixer.shortcuts == ["pynput"]
+    # One read saves the previous clipboard, one fetches the copied selection.
+    assert clipboard.reads == 2
+    assert clipboard.writes == ["ghbdtn"]
+
+
+def test_copy_detection_notices_copy_of_identical_text() -> None:
+    clipboard = CountingClipboard("same", copy_after_polls=1)
+    fixer = CopyProbeFixer(clipboard, selection="same", copies_on={"pynput"})
+
+    assert fixer._capture_selected_text() == ("same", ClipboardSnapshot.of_text("same", 0))
+
+
+def test_copy_detection_times_out_without_reading_contents() -> None:
+    clipboard = CountingClipboard("saved", copy_after_polls=None)
+    fixer = CopyProbeFixer(clipboard, selection="ghbdtn", copies_on=set())
+
+    assert fixer._wait_for_copy(clipboard.change_count(), None) is None
+    assert clipboard.reads == 0
+    assert clipboard.counter_polls > 1
+
+
+def test_copy_detection_falls_back_to_quartz_shortcut() -> None:
+    clipboard = CountingClipboard("saved", copy_after_polls=0)
+    fixer = CopyProbeFixer(clipboard, selection="ghbdtn", copies_on={"quartz"})
+
+    assert fixer._capture_selected_text() == ("ghbdtn", ClipboardSnapshot.of_text("saved", 0))
+    assert fixer.shortcuts == ["pynput", "quartz"]
+    assert fixer.metrics.counter("copy_quartz") == 1
+    assert fixer.metrics.counter("copy_pynput") == 0
+
+
+def test_copy_detection_gives_up_when_quartz_is_unavailable() -> None:
+    clipboard = CountingClipboard("saved", copy_after_polls=0)
+    fixer = CopyProbeFixer(clipboard, selection="ghbdtn", copies_on=set(), quartz_available=False)
+
+    assert fixer._capture_selected_text() == (None, ClipboardSnapshot.of_text("saved", 0))
+    assert fixer.shortcuts == ["pynput", "quartz"]
+    assert clipboard.reads == 1
+
+
+def test_already_correct_selection_is_left_alone() -> None:
+    fixer = ConversionProbeFixer(selected_text="hello world")
+
+    fixer._convert_selected_text_after_switch(target_layout="RUS")
+
+    assert fixer.replaced_texts == []
+    assert fixer.restored_clipboards == ["saved-clipboard"]
+
+
+def test_auto_direction_check_can_be_disabled() -> None:
+    fixer = ConversionProbeFixer(selected_text="hello")
+    fixer.auto_direction_confidence_threshold = 1.5
+
+    fixer._convert_selected_text_after_switch(target_layout="RUS")
+
+    assert fixer.replaced_texts == ["руддщ"]
+
+
+class FrontmostSimulatedFixer(SimulatedLayoutFixer):
+    def _get_frontmost_app(self) -> str | None:
+        return "com.example.fast"
+
+
+def test_conversion_learns_copy_latency_but_keeps_an_unobserved_paste_restore() -> None:
+    store = TimingProfileStore(path=None, min_samples=1)
+    desktop = SimulatedDesktop(ax_read_supported=False, ax_write_supported=False)
+    fixer = FrontmostSimulatedFixer(
+        desktop,
+        layout_switch_settle_delay_seconds=0,
+        selection_copy_poll_interval_seconds=0.001,
+        paste_restore_delay_seconds=0.5,
+        auto_direction_confidence_threshold=2.0,
+        timing_profiles=store,
+    )
+    desktop.select("ghbdtn")
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    desktop.select("ghbdtn")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert store.profile("com.example.fast").samples == 2
+    # A fast copy says nothing about when a paste nobody can see is done.
+    paste_restore = fixer.metrics.snapshot()["stages"]["paste_restore"]
+    assert paste_restore["min_ms"] >= 500
+    assert fixer._delays is None
+
+
+def test_confirmed_paste_teaches_the_paste_restore_delay() -> None:
+    store = TimingProfileStore(path=None, min_samples=1)
+    desktop = SimulatedDesktop(ax_write_supported=False, paste_latency_seconds=0.02)
+    fixer = FrontmostSimulatedFixer(
+        desktop,
+        layout_switch_settle_delay_seconds=0,
+        paste_restore_delay_seconds=0.5,
+        auto_direction_confidence_threshold=2.0,
+        timing_profiles=store,
+    )
+    desktop.select("ghbdtn")
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    profile = store.profile("com.example.fast")
+    assert profile.paste.samples == 1
+    assert profile.copy is None
+    assert store.delays_for("com.example.fast", fixer._configured_delays()).paste_restore_seconds < 0.5
+
+
+def test_capability_cache_skips_accessibility_in_apps_without_it() -> None:
+    capabilities = CapabilityCache(path=None)
+    desktop = SimulatedDesktop(ax_read_supported=False, ax_write_supported=False)
+    fixer = FrontmostSimulatedFixer(
+        desktop,
+        layout_switch_settle_delay_seconds=0,
+        settle_delay_seconds=0,
+        selection_copy_poll_interval_seconds=0.001,
+        paste_restore_delay_seconds=0,
+        auto_direction_confidence_threshold=2.0,
+        capabilities=capabilities,
+    )
+    desktop.select("ghbdtn")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    probe_calls = desktop.ax_calls
+    assert probe_calls > 0
+
+    desktop.select("ghbdtn")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert desktop.ax_calls == probe_calls
+    assert desktop.text == "привет"
+    assert fixer.metrics.counter("ax_read_skipped") == 1
+    assert fixer.metrics.counter("ax_replace_skipped") == 1
+
+
+def test_capability_cache_sends_known_quartz_shortcut_first() -> None:
+    capabilities = CapabilityCache(path=None)
+    clipboard = CountingClipboard("saved", copy_after_polls=0)
+    fixer = CopyProbeFixer(clipboard, selection="ghbdtn", copies_on={"quartz"})
+    fixer.capabilities = capabilities
+    fixer._frontmost_app = "com.example.electron"
+
+    assert fixer._capture_selected_text() == ("ghbdtn", ClipboardSnapshot.of_text("saved", 0))
+    assert fixer.shortcuts == ["pynput", "quartz"]
+
+    fixer.shortcuts.clear()
+    clipboard.copy_after_polls = clipboard.counter_polls
+    assert fixer._capture_selected_text() == ("ghbdtn", ClipboardSnapshot.of_text("ghbdtn", 1))
+    assert fixer.shortcuts == ["quartz"]
+
+
+def test_unchanged_clipboard_is_not_restored() -> None:
+    clipboard = CountingClipboard("saved", copy_after_polls=None)
+    fixer = CopyProbeFixer(clipboard, selection="ghbdtn", copies_on=set(), quartz_available=False)
+    fixer.layout_switch_settle_delay_seconds = 0
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert fixer.metrics.counter("no_selection") == 1
+    assert fixer.metrics.counter("clipboard_restore_skipped") == 1
+    assert clipboard.writes == []
+
+
+def wait_for_idle(fixer: AutoLayoutFixer, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while fixer._conversion_active.is_set() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert not fixer._conversion_active.is_set()
+
+
+def make_worker_fixer(desktop: SimulatedDesktop, **kwargs: float) -> SimulatedLayoutFixer:
+    options = {
+        "layout_switch_settle_delay_seconds": 0,
+        "settle_delay_seconds": 0,
+        "selection_copy_poll_interval_seconds": 0.001,
+        "paste_restore_delay_seconds": 0,
+        "auto_direction_confidence_threshold": 2.0,
+    }
+    options.update(kwargs)
+    return SimulatedLayoutFixer(desktop, **options)
+
+
+def test_conversions_reuse_one_worker_thread() -> None:
+    desktop = SimulatedDesktop(ax_read_supported=False, ax_write_supported=False)
+    fixer = make_worker_fixer(desktop)
+    desktop.select("ghbdtn")
+
+    fixer._schedule_selection_conversion("RUS", source_layout="EN")
+    wait_for_idle(fixer)
+    worker = fixer._worker
+    desktop.select("ghbdtn")
+    fixer._schedule_selection_conversion("RUS", source_layout="EN")
+    wait_for_idle(fixer)
+    fixer.stop()
+    worker.join(1.0)
+
+    assert desktop.text == "привет"
+    assert fixer._worker is worker
+    assert not worker.is_alive()
+    assert fixer.metrics.counter("converted") == 2
+
+
+def test_toggle_back_cancels_pending_conversion() -> None:
+    desktop = SimulatedDesktop(ax_read_supported=False, ax_write_supported=False, clipboard_text="user clipboard")
+    fixer = make_worker_fixer(desktop, layout_switch_settle_delay_seconds=5.0)
+    desktop.select("ghbdtn")
+
+    started = time.monotonic()
+    fixer._schedule_selection_conversion("RUS", source_layout="EN")
+    fixer._schedule_selection_conversion("EN", source_layout="RUS")
+    wait_for_idle(fixer)
+
+    assert time.monotonic() - started < 2.0
+    assert desktop.text == "ghbdtn"
+    assert desktop.read_clipboard() == "user clipboard"
+    assert fixer.metrics.counter("converted") == 0
+
+
+def test_latest_target_wins_after_cancelled_sleep() -> None:
+    desktop = SimulatedDesktop(ax_read_supported=False, ax_write_supported=False, clipboard_text="user clipboard")
+    fixer = make_worker_fixer(desktop, layout_switch_settle_delay_seconds=0.05)
+    desktop.select("ghbdtn")
+
+    fixer._schedule_selection_conversion("RUS", source_layout="EN")
+    time.sleep(0.01)
+    fixer._schedule_selection_conversion("EN", source_layout="RUS")
+    fixer._schedule_selection_conversion("RUS", source_layout="EN")
+    wait_for_idle(fixer)
+    desktop.settle()
+
+    assert desktop.text == "привет"
+    assert desktop.read_clipboard() == "user clipboard"
+    assert fixer.metrics.counter("converted") == 1
+
+
+def test_cancelled_paste_carries_saved_clipboard_to_next_run() -> None:
+    desktop = SimulatedDesktop(ax_read_supported=False, ax_write_supported=False, clipboard_text="user clipboard")
+    fixer = make_worker_fixer(desktop, paste_restore_delay_seconds=5.0)
+    desktop.select("ghbdtn")
+
+    fixer._schedule_selection_conversion("RUS", source_layout="EN")
+    deadline = time.monotonic() + 5.0
+    while not fixer._replacement_sent and time.monotonic() < deadline:
+        time.sleep(0.001)
+    desktop.settle()
+    desktop.select("привет")
+    fixer.paste_restore_delay_seconds = 0
+    fixer._schedule_selection_conversion("EN", source_layout="RUS")
+    wait_for_idle(fixer)
+    desktop.settle()
+
+    assert desktop.text == "ghbdtn"
+    assert desktop.read_clipboard() == "user clipboard"
+    assert fixer.metrics.counter("cancelled") == 1
+    assert fixer.metrics.counter("replace_clipboard") == 2
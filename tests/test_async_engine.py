@@ -0,0 +1,251 @@
+import asyncio
+import time
+
+import pytest
+
+from layout_autofix.app import AutoLayoutFixer
+from layout_autofix.async_engine import AsyncLayoutFixer, create_fixer
+from layout_autofix.keystrokes import KeystrokeRecorder
+from layout_autofix.metrics import ConversionMetrics
+from layout_autofix.simulation import SimulatedAsyncLayoutFixer, SimulatedDesktop, VirtualTimeEventLoop
+
+
+def run_virtual(scenario, **desktop_options):
+    loop = VirtualTimeEventLoop()
+    desktop = SimulatedDesktop(clock=loop.time, **desktop_options)
+    fixer = SimulatedAsyncLayoutFixer(
+        desktop,
+        auto_direction_confidence_threshold=2.0,
+        metrics=ConversionMetrics(clock=loop.time),
+    )
+    try:
+        elapsed = loop.run_until_complete(timed(scenario(fixer, desktop)))
+    finally:
+        if fixer._io_executor is not None:
+            fixer._io_executor.shutdown()
+        loop.close()
+    return fixer, desktop, elapsed
+
+
+async def timed(coroutine) -> float:
+    started = asyncio.get_running_loop().time()
+    await coroutine
+    return asyncio.get_running_loop().time() - started
+
+
+async def wait_for_idle(fixer: AsyncLayoutFixer) -> None:
+    while fixer._conversion_active.is_set():
+        await asyncio.sleep(0.01)
+
+
+async def drive_conversion_loop(fixer: AsyncLayoutFixer, switches) -> None:
+    converter = asyncio.create_task(fixer._conversion_loop())
+    await switches()
+    await wait_for_idle(fixer)
+    fixer._stop_event.set()
+    fixer._wake_for_stop()
+    await converter
+
+
+def test_clipboard_path_runs_in_virtual_time() -> None:
+    async def scenario(fixer, desktop):
+        desktop.select("ghbdtn")
+        await fixer._convert_selected_text_async("RUS", source_layout="EN")
+
+    started = time.monotonic()
+    fixer, desktop, elapsed = run_virtual(
+        scenario,
+        clipboard_text="user clipboard",
+        ax_read_supported=False,
+        ax_write_supported=False,
+        copy_latency_seconds=0.05,
+        paste_latency_seconds=0.05,
+    )
+
+    assert time.monotonic() - started < elapsed
+    assert desktop.text == "привет"
+    assert desktop.read_clipboard() == "user clipboard"
+    assert fixer.metrics.counter("converted") == 1
+    # Switch settle, a copy seen at the second poll, paste settle and the paste-restore wait.
+    assert elapsed == pytest.approx(0.12 + 0.06 + 0.02 + 0.2)
+
+
+def test_accessibility_read_does_not_wait_for_switch_settle() -> None:
+    async def scenario(fixer, desktop):
+        desktop.select("ghbdtn")
+        await fixer._convert_selected_text_async("RUS", source_layout="EN")
+
+    fixer, desktop, elapsed = run_virtual(scenario)
+
+    assert desktop.text == "привет"
+    assert elapsed < 0.12
+    assert "switch_settle" not in fixer.metrics.snapshot()["stages"]
+
+
+def test_copy_wait_polls_stop_at_the_deadline() -> None:
+    async def scenario(fixer, desktop):
+        fixer.selection_copy_poll_interval_seconds = 0.1
+        await fixer._convert_selected_text_async("RUS", source_layout="EN")
+
+    fixer, desktop, elapsed = run_virtual(
+        scenario,
+        clipboard_text="user clipboard",
+        ax_read_supported=False,
+        ax_write_supported=False,
+    )
+
+    assert fixer.metrics.counter("no_selection") == 1
+    assert desktop.shortcuts == ["c", "c"]
+    assert desktop.read_clipboard() == "user clipboard"
+    assert elapsed == pytest.approx(0.12 + 2 * 0.35)
+
+
+def test_toggle_back_cancels_running_conversion() -> None:
+    async def scenario(fixer, desktop):
+        desktop.select("ghbdtn")
+
+        async def switches():
+            fixer._enqueue_conversion("RUS", "EN")
+            await asyncio.sleep(0.05)
+            fixer._enqueue_conversion("EN", "RUS")
+
+        await drive_conversion_loop(fixer, switches)
+
+    fixer, desktop, elapsed = run_virtual(
+        scenario,
+        clipboard_text="user clipboard",
+        ax_read_supported=False,
+        ax_write_supported=False,
+    )
+
+    assert desktop.text == "ghbdtn"
+    assert desktop.shortcuts == []
+    assert desktop.read_clipboard() == "user clipboard"
+    assert fixer.metrics.counter("cancelled") == 1
+    assert fixer.metrics.counter("toggled_back") == 1
+    assert elapsed < 0.12
+
+
+def test_latest_target_wins_after_cancellation() -> None:
+    async def scenario(fixer, desktop):
+        desktop.select("ghbdtn")
+
+        async def switches():
+            fixer._enqueue_conversion("RUS", "EN")
+            await asyncio.sleep(0.05)
+            fixer._enqueue_conversion("EN", "RUS")
+            fixer._enqueue_conversion("RUS", "EN")
+
+        await drive_conversion_loop(fixer, switches)
+
+    fixer, desktop, _elapsed = run_virtual(
+        scenario,
+        clipboard_text="user clipboard",
+        ax_read_supported=False,
+        ax_write_supported=False,
+    )
+    desktop.settle()
+
+    assert desktop.text == "привет"
+    assert desktop.read_clipboard() == "user clipboard"
+    assert fixer.metrics.counter("coalesced") == 1
+    assert fixer.metrics.counter("converted") == 1
+
+
+def test_run_async_converts_after_layout_change() -> None:
+    desktop = SimulatedDesktop()
+    fixer = SimulatedAsyncLayoutFixer(
+        desktop,
+        layout_poll_interval_seconds=0.01,
+        layout_switch_settle_delay_seconds=0,
+        auto_direction_confidence_threshold=2.0,
+    )
+    desktop.select("ghbdtn")
+
+    async def scenario():
+        runner = asyncio.create_task(fixer.run_async())
+        while fixer._loop is None or fixer._get_current_layout() is None:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.02)
+        fixer.layout_source.set_layout("RUS")
+        deadline = time.monotonic() + 5.0
+        while desktop.text != "привет" and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        fixer.stop()
+        await asyncio.wait_for(runner, 5.0)
+
+    asyncio.run(scenario())
+
+    assert desktop.text == "привет"
+    assert fixer._loop is None
+
+
+def test_create_fixer_selects_engine() -> None:
+    assert type(create_fixer("threaded")) is AutoLayoutFixer
+    assert isinstance(create_fixer("asyncio"), AsyncLayoutFixer)
+    with pytest.raises(ValueError, match="engine must be one of"):
+        create_fixer("gevent")
+
+
+def test_switching_back_reverts_without_capture() -> None:
+    revert_seconds = []
+
+    async def scenario(fixer, desktop):
+        desktop.select("ghbdtn", prefix="> ")
+        await fixer._convert_selected_text_async("RUS", source_layout="EN")
+        revert_seconds.append(await timed(fixer._convert_selected_text_async("EN", source_layout="RUS")))
+
+    fixer, desktop, _elapsed = run_virtual(scenario)
+
+    assert desktop.text == "> ghbdtn"
+    assert fixer.metrics.counter("reverted") == 1
+    assert fixer.accessibility.calls["selected_text"] == 3
+    assert desktop.shortcuts == []
+    assert revert_seconds == [0]
+
+
+def test_paste_wait_ends_when_the_paste_lands() -> None:
+    async def scenario(fixer, desktop):
+        desktop.select("ghbdtn")
+        await fixer._convert_selected_text_async("RUS", source_layout="EN")
+
+    fixer, desktop, elapsed = run_virtual(
+        scenario,
+        clipboard_text="user clipboard",
+        ax_write_supported=False,
+        paste_latency_seconds=0.05,
+    )
+
+    assert desktop.text == "привет"
+    assert desktop.read_clipboard() == "user clipboard"
+    assert fixer.metrics.counter("paste_confirmed") == 1
+    # Switch settle and the paste itself, not the 0.2 s paste-restore bound.
+    assert elapsed == pytest.approx(0.12 + 0.05, abs=0.011)
+
+
+def test_paste_wait_is_bounded_by_paste_restore_delay() -> None:
+    async def scenario(fixer, desktop):
+        desktop.select("ghbdtn")
+        await fixer._convert_selected_text_async("RUS", source_layout="EN")
+
+    fixer, _desktop, elapsed = run_virtual(scenario, ax_write_supported=False, paste_latency_seconds=1.0)
+
+    assert fixer.metrics.counter("paste_unconfirmed") == 1
+    assert elapsed == pytest.approx(0.12 + 0.2)
+
+
+def test_typed_word_is_retyped_after_the_switch_settle() -> None:
+    async def scenario(fixer, desktop):
+        fixer.keystroke_recorder = KeystrokeRecorder(secure_input=lambda: False)
+        for char in "ghbdtn":
+            desktop.type_text(char)
+            fixer.keystroke_recorder.key_pressed(char)
+        await fixer._convert_selected_text_async("RUS", source_layout="EN")
+
+    fixer, desktop, elapsed = run_virtual(scenario, ax_read_supported=False, ax_write_supported=False)
+
+    assert desktop.text == "привет"
+    assert desktop.shortcuts == ["backspace*6"]
+    assert fixer.metrics.counter("retyped") == 1
+    # Only the keystrokes wait for the layout switch settle; there is no copy or paste wait.
+    assert elapsed == pytest.approx(0.12)
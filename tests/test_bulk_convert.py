@@ -0,0 +1,112 @@
+import io
+import subprocess
+import sys
+
+from layout_autofix.bulk_convert import (
+    ConvertOptions,
+    convert_chunk,
+    convert_chunks,
+    iter_input_chunks,
+    iter_mapped_chunks,
+    iter_stream_chunks,
+    utf8_cut,
+)
+from layout_autofix.detector import switch_layout
+
+
+TEXT = "ghbdtn vbh\nhello world\nруддщ\nцена 100₽ 🙂\n" * 50
+EN_TO_RU = ConvertOptions(to_layout="RUS", from_layout="EN")
+
+
+def test_utf8_cut_never_splits_a_character() -> None:
+    data = "aп€🙂".encode("utf-8")
+    for end in range(len(data) + 1):
+        cut = utf8_cut(data, 0, end)
+        assert cut <= end
+        data[:cut].decode("utf-8")
+    assert utf8_cut(data, 0, len(data)) == len(data)
+
+
+def test_chunks_respect_utf8_and_line_boundaries() -> None:
+    data = TEXT.encode("utf-8")
+    for line_aligned in (False, True):
+        mapped = list(iter_mapped_chunks(data, 24, line_aligned=line_aligned))
+        streamed = list(iter_stream_chunks(io.BytesIO(data), 24, line_aligned=line_aligned))
+        for chunks in (mapped, streamed):
+            assert b"".join(chunks) == data
+            for chunk in chunks:
+                chunk.decode("utf-8")
+        assert max(map(len, mapped)) <= 24
+        if line_aligned:
+            # Every line fits in a chunk, so no line is split.
+            assert all(chunk.endswith(b"\n") for chunk in mapped + streamed)
+
+
+def test_chunked_conversion_matches_whole_text() -> None:
+    output = io.BytesIO()
+    stats = convert_chunks(iter_mapped_chunks(TEXT.encode("utf-8"), 7, line_aligned=False), output.write, EN_TO_RU)
+
+    assert output.getvalue().decode("utf-8") == switch_layout(TEXT, "RUS", "EN")
+    assert stats.bytes_in == len(TEXT.encode("utf-8"))
+    assert stats.lines == 200
+    assert stats.max_chunk_bytes <= 7
+
+
+def test_invalid_utf8_passes_through() -> None:
+    result = convert_chunk(b"ghbdtn \xff\xfe\n", EN_TO_RU)
+
+    assert result.output == "привет ".encode("utf-8") + b"\xff\xfe\n"
+
+
+def test_only_changed_lines_count_as_converted() -> None:
+    text = "ghbdtn vbh\nпривет мир\n123 456\nlkbyyfz cnhjrf ghbdtn\nпока"
+    for chunk_bytes in (len(text.encode("utf-8")), 5, 3):
+        stats = convert_chunks(
+            iter_mapped_chunks(text.encode("utf-8"), chunk_bytes, line_aligned=False),
+            io.BytesIO().write,
+            EN_TO_RU,
+        )
+        assert (stats.lines, stats.lines_converted) == (5, 2)
+
+    stats = convert_chunks(iter_mapped_chunks("привет\nvbh".encode("utf-8"), 4, line_aligned=False), len, EN_TO_RU)
+    assert (stats.lines, stats.lines_converted) == (2, 1)
+    stats = convert_chunks(iter_mapped_chunks("привет мир\n".encode("utf-8"), 4, line_aligned=False), len, EN_TO_RU)
+    assert (stats.lines, stats.lines_converted) == (1, 0)
+
+
+def test_auto_picks_direction_per_line() -> None:
+    result = convert_chunk(
+        "ghbdtn vbh\nhello world\nруддщ цщкдв\nпривет мир\n".encode("utf-8"),
+        ConvertOptions(auto=True),
+    )
+
+    assert result.output.decode("utf-8") == "привет мир\nhello world\nhello world\nпривет мир\n"
+    assert (result.lines, result.lines_converted) == (4, 2)
+
+
+def test_process_pool_keeps_input_order(tmp_path) -> None:
+    source = tmp_path / "chat.txt"
+    source.write_text(TEXT, encoding="utf-8")
+    output = io.BytesIO()
+
+    stats = convert_chunks(
+        iter_input_chunks(str(source), 64, line_aligned=True),
+        output.write,
+        ConvertOptions(auto=True),
+        workers=2,
+    )
+
+    assert output.getvalue() == convert_chunk(TEXT.encode("utf-8"), ConvertOptions(auto=True)).output
+    assert stats.chunks > 4
+
+
+def test_cli_converts_stdin() -> None:
+    result = subprocess.run(
+        [sys.executable, "-m", "layout_autofix", "convert", "--to", "RUS", "--workers", "1"],
+        input="ghbdtn\n".encode("utf-8"),
+        capture_output=True,
+        check=True,
+    )
+
+    assert result.stdout.decode("utf-8") == "привет\n"
+    assert b"event=convert_finished" in result.stderr
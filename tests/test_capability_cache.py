@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from layout_autofix.capability_cache import CapabilityCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_unknown_app_is_probed() -> None:
+    cache = CapabilityCache(path=None)
+
+    assert cache.known_method("com.example.app", "capture") is None
+
+
+def test_recorded_method_is_returned_until_reprobe() -> None:
+    cache = CapabilityCache(path=None, reprobe_every=3)
+    cache.record("app", "capture", "clipboard")
+
+    answers = [cache.known_method("app", "capture") for _ in range(6)]
+
+    assert answers == ["clipboard", "clipboard", None, "clipboard", "clipboard", None]
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache = CapabilityCache(path=None, ttl_seconds=60, clock=clock)
+    cache.record("app", "replace", "clipboard")
+
+    clock.now += 59
+    assert cache.known_method("app", "replace") == "clipboard"
+    clock.now += 1
+    assert cache.known_method("app", "replace") is None
+    assert cache.known_method("app", "replace") is None
+
+
+def test_record_rejects_unknown_methods() -> None:
+    with pytest.raises(ValueError):
+        CapabilityCache(path=None).record("app", "capture", "telepathy")
+
+
+def test_cache_persists_across_instances(tmp_path: Path) -> None:
+    clock = FakeClock()
+    cache = CapabilityCache(path=tmp_path / "capabilities.json", clock=clock)
+    cache.record("app", "capture", "clipboard")
+    cache.record("app", "copy_shortcut", "quartz")
+    cache.save(force=True)
+
+    reloaded = CapabilityCache(path=tmp_path / "capabilities.json", clock=clock)
+
+    assert reloaded.known_method("app", "capture") == "clipboard"
+    assert reloaded.known_method("app", "copy_shortcut") == "quartz"
+    assert reloaded.known_method("other", "capture") is None
+
+
+def test_cache_keeps_a_bounded_number_of_apps() -> None:
+    clock = FakeClock()
+    cache = CapabilityCache(path=None, max_apps=2, clock=clock)
+    for app_id in ("first", "second", "third"):
+        clock.now += 1
+        cache.record(app_id, "capture", "ax")
+
+    assert cache.known_method("first", "capture") is None
+    assert cache.known_method("third", "capture") == "ax"
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from layout_autofix.classifier import (
+    LayoutClassifier,
+    NgramModel,
+    decode_models,
+    default_classifier,
+    encode_models,
+)
+from layout_autofix.detector import switch_layout
+
+
+@pytest.mark.parametrize(
+    ("text", "target_layout"),
+    [
+        ("hello world", "RUS"),
+        ("привет, мир.", "RUS"),
+        ("спасибо", "EN"),
+        ("database", "RUS"),
+        ("puzzle", "RUS"),
+        ("бархат", "EN"),
+    ],
+)
+def test_correct_text_is_recognised(text: str, target_layout: str) -> None:
+    classifier = default_classifier()
+    converted = switch_layout(text, to_layout=target_layout)
+
+    assert classifier.confidence_already_correct(text, converted) > 0.9
+
+
+@pytest.mark.parametrize(
+    ("text", "target_layout"),
+    [
+        ("ghbdtn", "RUS"),
+        ("Ntcnbhjdfybt", "RUS"),
+        ("руддщ", "EN"),
+        ("ыщкеув", "EN"),
+        (",fh[fn", "RUS"),
+    ],
+)
+def test_wrong_layout_text_is_recognised(text: str, target_layout: str) -> None:
+    classifier = default_classifier()
+    converted = switch_layout(text, to_layout=target_layout)
+
+    assert classifier.confidence_already_correct(text, converted) < 0.1
+
+
+def test_text_without_letters_has_no_evidence() -> None:
+    assert default_classifier().confidence_already_correct("123 !?", "123 !?") == 0.5
+
+
+def test_model_round_trips_through_binary_format() -> None:
+    model = NgramModel("en", "ab", 16.0, 1.5, bytes(range(27)))
+
+    (decoded,) = decode_models(encode_models([model]))
+
+    assert decoded == model
+
+
+def test_decode_rejects_truncated_model() -> None:
+    payload = encode_models([NgramModel("en", "ab", 16.0, 1.5, bytes(27))])
+
+    with pytest.raises(ValueError, match="truncated"):
+        decode_models(payload[:-1])
+
+
+def test_model_loads_quickly() -> None:
+    started = time.perf_counter()
+    classifier = LayoutClassifier.load()
+
+    assert time.perf_counter() - started < 0.5
+    assert classifier.supports("EN") and classifier.supports("RUS")
@@ -0,0 +1,57 @@
+import argparse
+
+import pytest
+
+from layout_autofix import cli_options
+from layout_autofix.cli_options import add_common_arguments, resolve_common_arguments
+
+
+def build_parser(*, macos_app: bool) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    add_common_arguments(parser, macos_app=macos_app)
+    return parser
+
+
+def option_strings(parser: argparse.ArgumentParser) -> set[str]:
+    return {option for action in parser._actions for option in action.option_strings}
+
+
+def test_cli_and_app_accept_the_same_options() -> None:
+    cli = build_parser(macos_app=False)
+    app = build_parser(macos_app=True)
+
+    assert option_strings(cli) == option_strings(app)
+    assert "--clipboard-capture" in option_strings(app)
+    cli_defaults = vars(cli.parse_args([]))
+    app_defaults = vars(app.parse_args([]))
+    assert cli_defaults.pop("default_trace_level") == "off"
+    assert app_defaults.pop("default_trace_level") == "stages"
+    assert cli_defaults == app_defaults
+
+
+def test_app_does_not_offer_x11_backends() -> None:
+    app = build_parser(macos_app=True)
+    cli = build_parser(macos_app=False)
+
+    with pytest.raises(SystemExit):
+        app.parse_args(["--layout-source", "xkb"])
+    with pytest.raises(SystemExit):
+        app.parse_args(["--clipboard-backend", "x11"])
+    args = cli.parse_args(["--layout-source", "xkb", "--clipboard-backend", "x11"])
+    assert (args.layout_source, args.clipboard_backend) == ("xkb", "x11")
+
+
+def test_resolved_defaults_depend_on_platform_and_entry_point(monkeypatch) -> None:
+    monkeypatch.setattr(cli_options.sys, "platform", "linux")
+    args = build_parser(macos_app=False).parse_args([])
+    assert resolve_common_arguments(args) == "off"
+    assert args.clipboard_capture is False
+
+    monkeypatch.setattr(cli_options.sys, "platform", "darwin")
+    args = build_parser(macos_app=True).parse_args([])
+    assert resolve_common_arguments(args) == "stages"
+    assert args.clipboard_capture is True
+
+    args = build_parser(macos_app=True).parse_args(["--no-debug-events", "--no-clipboard-capture"])
+    assert resolve_common_arguments(args) == "off"
+    assert args.clipboard_capture is False
@@ -0,0 +1,86 @@
+import pytest
+
+from layout_autofix.clipboard import (
+    ClipboardSnapshot,
+    InMemoryClipboard,
+    SubprocessClipboard,
+    create_clipboard_backend,
+)
+from layout_autofix.x11 import X11Clipboard
+
+
+def test_subprocess_clipboard_reads_command_stdout() -> None:
+    clipboard = SubprocessClipboard(read_command=("printf", "copied"))
+
+    assert clipboard.read_text() == "copied"
+
+
+def test_subprocess_clipboard_writes_text_to_command_stdin(tmp_path) -> None:
+    target = tmp_path / "clipboard.txt"
+    clipboard = SubprocessClipboard(write_command=("sh", "-c", f"cat > '{target}'"))
+
+    assert clipboard.write_text("Привет") is True
+    assert target.read_text(encoding="utf-8") == "Привет"
+
+
+def test_subprocess_clipboard_reports_failed_command() -> None:
+    clipboard = SubprocessClipboard(read_command=("false",), write_command=("false",))
+
+    assert clipboard.read_text() is None
+    assert clipboard.write_text("text") is False
+
+
+def test_subprocess_clipboard_reports_missing_command() -> None:
+    clipboard = SubprocessClipboard(read_command=("layout-autofix-missing-command",))
+
+    assert clipboard.read_text() is None
+
+
+def test_subprocess_snapshot_keeps_raw_bytes(tmp_path) -> None:
+    store = tmp_path / "clipboard.bin"
+    store.write_bytes(b"caf\xc3\xa9 \xff\xfe")
+    clipboard = SubprocessClipboard(read_command=("cat", str(store)), write_command=("sh", "-c", f"cat > '{store}'"))
+
+    snapshot = clipboard.snapshot()
+    store.write_bytes(b"converted")
+
+    assert snapshot.size == 8
+    assert clipboard.restore(snapshot) is True
+    assert store.read_bytes() == b"caf\xc3\xa9 \xff\xfe"
+    assert clipboard.snapshot(max_bytes=4) is None
+
+
+def test_in_memory_snapshot_round_trip() -> None:
+    clipboard = InMemoryClipboard(text="saved")
+    snapshot = clipboard.snapshot()
+    clipboard.write_text("new")
+
+    assert snapshot == ClipboardSnapshot.of_text("saved", change_count=0)
+    assert clipboard.restore(snapshot) is True
+    assert clipboard.read_text() == "saved"
+
+
+def test_in_memory_clipboard_round_trip() -> None:
+    clipboard = InMemoryClipboard(text="saved")
+
+    assert clipboard.read_text() == "saved"
+    assert clipboard.write_text("new") is True
+    assert clipboard.read_text() == "new"
+    assert clipboard.reads == 2
+    assert clipboard.writes == ["new"]
+
+
+def test_create_clipboard_backend_subprocess_kind() -> None:
+    assert isinstance(create_clipboard_backend("subprocess"), SubprocessClipboard)
+
+
+def test_create_clipboard_backend_rejects_unknown_kind() -> None:
+    with pytest.raises(ValueError, match="clipboard backend must be one of"):
+        create_clipboard_backend("xclip")
+
+
+def test_create_clipboard_backend_x11_kind_connects_lazily() -> None:
+    clipboard = create_clipboard_backend("x11")
+
+    assert isinstance(clipboard, X11Clipboard)
+    assert not clipboard.connection._alive
@@ -1,6 +1,7 @@
 import pytest
 
-from layout_autofix.detector import switch_layout
+from layout_autofix import detector
+from layout_autofix.detector import EN_TO_RU, RU_TO_EN, switch_layout, switch_layout_batch
 
 
 def test_switch_layout_en_to_ru_word() -> None:
@@ -18,3 +19,72 @@ def test_switch_layout_keeps_letter_case() -> None:
 def test_switch_layout_raises_for_unknown_target_layout() -> None:
     with pytest.raises(ValueError, match="to_layout must be EN or RUS"):
         switch_layout("hello", to_layout="DE")
+
+
+def test_legacy_char_maps_are_cached_and_read_only() -> None:
+    assert detector.EN_TO_RU is EN_TO_RU
+    assert EN_TO_RU["g"] == "п" and RU_TO_EN["п"] == "g"
+    with pytest.raises(TypeError):
+        EN_TO_RU["g"] = "x"
+    assert "EN_TO_RU" not in detector.__all__
+
+
+def _switch_layout_per_char(word: str, to_layout: str) -> str:
+    mapping = EN_TO_RU if to_layout == "RUS" else RU_TO_EN
+    converted: list[str] = []
+    for ch in word:
+        base = mapping.get(ch.lower())
+        if base is None:
+            converted.append(ch)
+            continue
+        converted.append(base.upper() if ch.isupper() else base)
+    return "".join(converted)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Hello, World! {QWERTY} ~`[];',./ 123",
+        "Привет, МИР! ЁЖЭХЪБЮ ёжэхъбю Щи",
+        "mixed Текст KK tab\tnew\nline \U0001f600",
+    ],
+)
+@pytest.mark.parametrize("to_layout", ["EN", "RUS"])
+def test_switch_layout_matches_per_char_conversion(text: str, to_layout: str) -> None:
+    assert switch_layout(text, to_layout=to_layout) == _switch_layout_per_char(text, to_layout)
+
+
+def test_switch_layout_batch_matches_per_string_conversion() -> None:
+    words = ["ghbdtn", "", "Ghbdtn vbh", "руддщ", "\U0001f600 ok", "a\x00b", "rfr ltkf"]
+
+    assert switch_layout_batch(words, "RUS") == [switch_layout(word, "RUS") for word in words]
+    assert switch_layout_batch(iter(words), "EN") == [switch_layout(word, "EN") for word in words]
+    assert switch_layout_batch([], "RUS") == []
+
+
+def test_switch_layout_batch_validates_arguments_once() -> None:
+    with pytest.raises(ValueError, match="to_layout must be EN or RUS"):
+        switch_layout_batch(["hello"], to_layout="DE")
+    with pytest.raises(ValueError, match="backend must be one of"):
+        switch_layout_batch(["hello"], "RUS", backend="gpu")
+
+
+def test_switch_layout_batch_numpy_array_keeps_shape_and_order() -> None:
+    numpy = pytest.importorskip("numpy")
+    words = numpy.asarray([["ghbdtn", "Vbh"], ["123 {}", "руддщ"]])
+
+    converted = switch_layout_batch(words, "RUS")
+
+    assert converted.shape == words.shape
+    assert converted.tolist() == [[switch_layout(word, "RUS") for word in row] for row in words.tolist()]
+    assert switch_layout_batch(words.ravel().tolist(), "RUS", backend="numpy") == converted.ravel().tolist()
+
+
+def test_switch_layout_batch_numpy_keeps_trailing_nuls_of_list_items() -> None:
+    pytest.importorskip("numpy")
+    words = ["ghbdtn\x00", "\x00", "vbh\x00\x00", "a\x00b", ""]
+
+    expected = [switch_layout(word, "RUS") for word in words]
+
+    assert switch_layout_batch(words, "RUS", backend="numpy") == expected
+    assert switch_layout_batch(iter(words), "RUS", backend="numpy") == expected
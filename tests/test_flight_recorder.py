@@ -0,0 +1,137 @@
+import json
+import os
+
+from layout_autofix.flight_recorder import DUMP_FILE_PREFIX, FlightRecorder
+from layout_autofix.metrics import ConversionMetrics
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        self.now += 0.5
+        return self.now
+
+
+def read_dump(path):
+    with path.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def make_fixer(tmp_path, desktop: SimulatedDesktop, fixer_class=SimulatedLayoutFixer) -> SimulatedLayoutFixer:
+    return fixer_class(
+        desktop,
+        settle_delay_seconds=0,
+        layout_switch_settle_delay_seconds=0,
+        paste_restore_delay_seconds=0,
+        auto_direction_confidence_threshold=2.0,
+        flight_recorder=FlightRecorder(dump_dir=tmp_path),
+    )
+
+
+def test_ring_keeps_only_the_latest_events() -> None:
+    recorder = FlightRecorder(capacity=3, clock=FakeClock())
+    for index in range(5):
+        recorder.record("tick", index=index)
+
+    assert recorder.events() == [
+        {"t": 1.5, "event": "tick", "index": 2},
+        {"t": 2.0, "event": "tick", "index": 3},
+        {"t": 2.5, "event": "tick", "index": 4},
+    ]
+
+
+def test_dump_writes_header_and_events_and_prunes_old_dumps(tmp_path) -> None:
+    recorder = FlightRecorder(dump_dir=tmp_path, max_dumps=2, clock=FakeClock())
+    recorder.record("converted")
+
+    paths = []
+    for age in (3, 2, 1):
+        path = recorder.dump("manual")
+        os.utime(path, (1_000_000 - age, 1_000_000 - age))
+        paths.append(path)
+
+    header, event = read_dump(paths[-1])
+    assert header["event"] == "flight_recorder_dump"
+    assert header["reason"] == "manual"
+    assert header["events"] == 1
+    assert event == {"t": 0.5, "event": "converted"}
+    assert len(list(tmp_path.glob(f"{DUMP_FILE_PREFIX}*.jsonl"))) == 2
+    assert not paths[0].exists()
+
+
+def test_dump_to_unwritable_directory_returns_none(tmp_path) -> None:
+    blocker = tmp_path / "file"
+    blocker.write_text("", encoding="utf-8")
+
+    assert FlightRecorder(dump_dir=blocker / "dumps").dump("manual") is None
+
+
+def test_metrics_feed_the_recorder() -> None:
+    recorder = FlightRecorder(clock=FakeClock())
+    metrics = ConversionMetrics(clock=lambda: 0.0, flight_recorder=recorder)
+
+    metrics.increment("converted")
+    metrics.record("ax_read", 0.0125)
+
+    assert recorder.events() == [
+        {"t": 0.5, "event": "converted"},
+        {"t": 1.0, "event": "stage", "stage": "ax_read", "ms": 12.5},
+    ]
+
+
+def test_conversion_events_carry_no_text(tmp_path) -> None:
+    desktop = SimulatedDesktop(clipboard_text="secret clipboard", ax_read_supported=False, ax_write_supported=False)
+    fixer = make_fixer(tmp_path, desktop)
+    desktop.select("ghbdtn")
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    events = {event["event"]: event for event in fixer.flight_recorder.events()}
+    assert events["convert_started"]["target_layout"] == "RUS"
+    assert events["selection_captured"]["text_len"] == 6
+    assert events["selection_captured"]["clipboard_bytes"] == 16
+    assert events["selection_replaced"]["success"] is True
+    dumped = json.dumps(fixer.flight_recorder.events(), ensure_ascii=False)
+    for text in ("ghbdtn", "привет", "secret clipboard"):
+        assert text not in dumped
+
+
+def test_conversion_exception_dumps_automatically(tmp_path) -> None:
+    class FailingFixer(SimulatedLayoutFixer):
+        def _converted_text(self, selected_text, target_layout, source_layout):
+            raise KeyError("boom")
+
+    desktop = SimulatedDesktop()
+    fixer = make_fixer(tmp_path, desktop, FailingFixer)
+    desktop.select("ghbdtn")
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    (dump,) = tmp_path.glob(f"{DUMP_FILE_PREFIX}*-exception.jsonl")
+    header, *events = read_dump(dump)
+    assert header["reason"] == "exception"
+    assert events[-1]["event"] == "exception_raised"
+    assert events[-1]["type"] == "KeyError"
+    assert fixer.metrics.counter("exceptions") == 1
+
+
+def test_session_trace_streams_events_as_they_happen(tmp_path) -> None:
+    path = tmp_path / "traces" / "session.jsonl"
+    recorder = FlightRecorder(capacity=1, clock=FakeClock(), trace_path=path)
+    recorder.record("layout_changed", from_layout="EN", to_layout="RUS")
+    recorder.record("copy_latency", ms=12.5)
+
+    # Line buffered: readable before the recorder is closed, and past the ring's capacity.
+    header, *events = read_dump(path)
+    recorder.close()
+    recorder.record("after_close")
+
+    assert header["event"] == "session_trace_started"
+    assert events == [
+        {"t": 1.0, "event": "layout_changed", "from_layout": "EN", "to_layout": "RUS"},
+        {"t": 1.5, "event": "copy_latency", "ms": 12.5},
+    ]
+    assert len(read_dump(path)) == 3
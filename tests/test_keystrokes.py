@@ -0,0 +1,117 @@
+import pytest
+
+from layout_autofix.keystrokes import KeystrokeRecorder, TypedWordBuffer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def type_keys(recorder: KeystrokeRecorder, keys) -> None:
+    for key in keys:
+        recorder.key_pressed(key)
+        recorder.key_released(key)
+
+
+def make_recorder(**options) -> KeystrokeRecorder:
+    options.setdefault("secure_input", lambda: False)
+    return KeystrokeRecorder(**options)
+
+
+def test_last_word_keeps_trailing_spaces() -> None:
+    buffer = TypedWordBuffer()
+    for char in "ghbdtn vbh  ":
+        buffer.type_char(char)
+
+    typed = buffer.last_word()
+
+    assert (typed.word, typed.trailing, typed.length) == ("vbh", "  ", 5)
+    buffer.backspace()
+    buffer.backspace()
+    buffer.backspace()
+    assert buffer.last_word().word == "vb"
+
+
+def test_buffer_caps_memory_and_drops_a_cut_off_word() -> None:
+    buffer = TypedWordBuffer(max_chars=8)
+    for char in "a" * 100:
+        buffer.type_char(char)
+
+    assert len(buffer) == 8
+    # The word may have started before the oldest character kept.
+    assert buffer.last_word() is None
+    buffer.type_char(" ")
+    buffer.type_char("b")
+    assert buffer.last_word().word == "b"
+    with pytest.raises(ValueError, match="max_chars"):
+        TypedWordBuffer(max_chars=1)
+
+
+def test_replace_only_applies_to_an_unchanged_buffer() -> None:
+    buffer = TypedWordBuffer()
+    for char in "ghbdtn ":
+        buffer.type_char(char)
+    typed = buffer.last_word()
+
+    assert buffer.replace(typed, "привет ")
+    assert buffer.last_word().word == "привет"
+    assert not buffer.replace(typed, "ghbdtn ")
+
+
+def test_recorder_resets_on_caret_and_focus_changes() -> None:
+    recorder = make_recorder()
+    for reset in (["enter"], ["left"], ["cmd", "a"], ["alt", "backspace"]):
+        type_keys(recorder, "ghbdtn")
+        for key in reset:
+            recorder.key_pressed(key)
+        for key in reset:
+            recorder.key_released(key)
+        assert recorder.buffer.last_word() is None, reset
+
+    type_keys(recorder, "ghbdtn")
+    recorder.mouse_clicked()
+    assert recorder.buffer.last_word() is None
+
+
+def test_recorder_tracks_typing_and_ignores_the_layout_hotkey() -> None:
+    recorder = make_recorder()
+    type_keys(recorder, ["shift", "G", "h", "b", "x", "backspace", "d", "t", "n", "space"])
+    recorder.key_pressed("ctrl")
+    recorder.key_pressed("space")
+    recorder.key_released("space")
+    recorder.key_released("ctrl")
+
+    typed = recorder.buffer.last_word()
+    assert (typed.word, typed.trailing) == ("Ghbdtn", " ")
+
+
+def test_recorder_drops_content_under_secure_input() -> None:
+    secure = False
+    recorder = make_recorder(secure_input=lambda: secure)
+    type_keys(recorder, "ghbdtn")
+
+    secure = True
+    type_keys(recorder, "hunter2")
+
+    assert len(recorder.buffer) == 0
+
+
+def test_only_the_fixers_own_injected_keys_are_ignored() -> None:
+    clock = FakeClock()
+    recorder = make_recorder(clock=clock)
+    type_keys(recorder, "ghbdtn")
+
+    with recorder.own_input():
+        recorder.key_pressed("backspace", injected=True)
+    clock.now = 0.1
+    recorder.key_pressed("x", injected=True)
+    assert recorder.buffer.last_word().word == "ghbdtn"
+
+    # A text expander or another automation tool typed something.
+    clock.now = 10.0
+    recorder.key_pressed("x", injected=True)
+    assert recorder.buffer.last_word() is None
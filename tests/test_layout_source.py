@@ -0,0 +1,158 @@
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from layout_autofix import layout_source
+from layout_autofix.app import AutoLayoutFixer
+from layout_autofix.layout_source import (
+    DefaultsPollingLayoutSource,
+    InMemoryLayoutSource,
+    InputSourceNotificationLayoutSource,
+    create_layout_source,
+    read_layout_from_defaults,
+    resolve_layout_name,
+)
+from layout_autofix.x11 import XkbLayoutSource
+
+
+class RecordingFixer(AutoLayoutFixer):
+    def __init__(self, source: InMemoryLayoutSource) -> None:
+        super().__init__(layout_poll_interval_seconds=5.0, layout_source=source)
+        self.scheduled: list[str] = []
+        self.scheduled_event = threading.Event()
+        self.started_event = threading.Event()
+
+    def _check_ax_permission(self, *, prompt: bool) -> bool:
+        self.started_event.set()
+        return True
+
+    def _schedule_selection_conversion(self, target_layout: str, source_layout: str | None = None) -> None:
+        self.scheduled.append(target_layout)
+        self.scheduled_event.set()
+
+
+def test_resolve_layout_name_matches_known_layouts() -> None:
+    assert resolve_layout_name('"Russian - PC"') == "RUS"
+    assert resolve_layout_name("ABC") == "EN"
+    assert resolve_layout_name("U.S.") == "EN"
+    assert resolve_layout_name("German") is None
+
+
+def test_read_layout_from_defaults_uses_last_layout_name(monkeypatch) -> None:
+    output = (
+        '(\n    {\n        "KeyboardLayout Name" = ABC;\n    },\n'
+        '    {\n        "KeyboardLayout Name" = Russian;\n    }\n)\n'
+    )
+    monkeypatch.setattr(subprocess, "check_output", lambda *args, **kwargs: output)
+
+    assert read_layout_from_defaults() == "RUS"
+
+
+def test_polling_source_reads_layout_on_every_call(monkeypatch) -> None:
+    calls: list[list[str]] = []
+
+    def fake_check_output(args, **kwargs):
+        calls.append(args)
+        return '"KeyboardLayout Name" = ABC;'
+
+    monkeypatch.setattr(subprocess, "check_output", fake_check_output)
+    source = DefaultsPollingLayoutSource()
+
+    assert source.current_layout() == "EN"
+    assert source.current_layout() == "EN"
+    assert len(calls) == 2
+
+
+def fake_core_foundation(sources: list[dict[str, str]]) -> SimpleNamespace:
+    return SimpleNamespace(
+        CFPreferencesAppSynchronize=lambda domain: True,
+        CFPreferencesCopyAppValue=lambda key, domain: sources,
+    )
+
+
+def test_notification_source_reads_preferences_in_process(monkeypatch) -> None:
+    sources = [{"KeyboardLayout Name": "ABC"}, {"InputSourceKind": "Input Mode"}, {"KeyboardLayout Name": "Russian"}]
+    monkeypatch.setattr(layout_source, "optional_module", lambda name: fake_core_foundation(sources))
+    monkeypatch.setattr(subprocess, "check_output", lambda *args, **kwargs: pytest.fail("defaults was spawned"))
+    source = InputSourceNotificationLayoutSource()
+
+    assert source.current_layout() == "RUS"
+    sources[-1] = {"KeyboardLayout Name": "U.S."}
+    source._on_input_source_changed()
+    assert source.current_layout() == "EN"
+    assert source.spawns == 0
+
+
+def test_notification_source_falls_back_to_defaults(monkeypatch) -> None:
+    monkeypatch.setattr(layout_source, "optional_module", lambda name: None)
+    monkeypatch.setattr(subprocess, "check_output", lambda *args, **kwargs: '"KeyboardLayout Name" = ABC;')
+    source = InputSourceNotificationLayoutSource()
+
+    assert source.current_layout() == "EN"
+    assert source.spawns == 1
+
+
+def test_notification_source_reads_layout_only_on_change() -> None:
+    reads: list[str] = []
+    layouts = iter(["EN", "RUS"])
+
+    def read_layout() -> str | None:
+        layout = next(layouts)
+        reads.append(layout)
+        return layout
+
+    source = InputSourceNotificationLayoutSource(read_layout=read_layout, resync_interval_seconds=60.0)
+
+    assert source.current_layout() == "EN"
+    assert source.current_layout() == "EN"
+    assert source.wait_for_change(0) is False
+
+    source._on_input_source_changed()
+
+    assert source.wait_for_change(0) is True
+    assert source.current_layout() == "RUS"
+    assert reads == ["EN", "RUS"]
+
+
+def test_in_memory_source_wakes_waiter_on_push() -> None:
+    source = InMemoryLayoutSource(layout="EN")
+    timer = threading.Timer(0.01, source.set_layout, args=("RUS",))
+    timer.start()
+
+    started = time.monotonic()
+    assert source.wait_for_change(5.0) is True
+    assert time.monotonic() - started < 1.0
+    assert source.current_layout() == "RUS"
+    timer.join()
+
+
+def test_run_forever_reacts_to_pushed_layout_change() -> None:
+    source = InMemoryLayoutSource(layout="EN")
+    fixer = RecordingFixer(source)
+    watcher = threading.Thread(target=fixer.run_forever, daemon=True)
+    watcher.start()
+
+    assert fixer.started_event.wait(1.0)
+    source.set_layout("RUS")
+
+    assert fixer.scheduled_event.wait(1.0)
+    fixer.stop()
+    watcher.join(1.0)
+    assert not watcher.is_alive()
+    assert fixer.scheduled == ["RUS"]
+
+
+def test_create_layout_source_rejects_unknown_kind() -> None:
+    with pytest.raises(ValueError, match="layout source must be one of"):
+        create_layout_source("inotify")
+
+
+def test_create_layout_source_poll_kind() -> None:
+    assert isinstance(create_layout_source("poll"), DefaultsPollingLayoutSource)
+
+
+def test_create_layout_source_xkb_kind() -> None:
+    assert isinstance(create_layout_source("xkb"), XkbLayoutSource)
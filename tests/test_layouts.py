@@ -0,0 +1,177 @@
+import json
+
+import pytest
+
+from layout_autofix import layouts
+from layout_autofix.detector import switch_layout
+from layout_autofix.layouts import (
+    DEFAULT_LAYOUTS_DIR,
+    KEY_POSITIONS,
+    LayoutRegistry,
+    default_cache_dir,
+    default_registry,
+    parse_keylayout,
+)
+
+KEYLAYOUT = b"""<?xml version="1.1" encoding="UTF-8"?>
+<!DOCTYPE keyboard SYSTEM "file://localhost/System/Library/DTDs/KeyboardLayout.dtd">
+<keyboard group="126" id="-4242" name="Test Cyrillic" maxout="1">
+  <layouts>
+    <layout first="0" last="17" modifiers="mods" mapSet="ansi"/>
+  </layouts>
+  <modifierMap id="mods" defaultIndex="0">
+    <keyMapSelect mapIndex="0">
+      <modifier keys=""/>
+    </keyMapSelect>
+    <keyMapSelect mapIndex="1">
+      <modifier keys="anyShift"/>
+    </keyMapSelect>
+  </modifierMap>
+  <keyMapSet id="ansi">
+    <keyMap index="0">
+      <key code="0" output="&#x0444;"/>
+      <key code="1" action="s-key"/>
+      <key code="12" output="&#x0439;"/>
+      <key code="51" output="&#x0008;"/>
+      <key code="36" output="&#x000D;"/>
+    </keyMap>
+    <keyMap index="1">
+      <key code="0" output="&#x0424;"/>
+    </keyMap>
+  </keyMapSet>
+  <actions>
+    <action id="s-key">
+      <when state="none" output="&#x044B;"/>
+    </action>
+  </actions>
+</keyboard>
+"""
+
+
+def _write_layout(directory, file_name: str, layout_id: str, names: list[str], keys: str) -> None:
+    payload = {"id": layout_id, "names": names, "keys": keys}
+    (directory / file_name).write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+
+def test_builtin_en_rus_tables_keep_classic_mapping() -> None:
+    registry = default_registry()
+    en_to_ru = registry.char_map("EN", "RUS")
+
+    assert len(en_to_ru) == 34
+    assert en_to_ru["`"] == "ё"
+    assert en_to_ru["/"] == "."
+    assert registry.char_map("RUS", "EN") == {value: key for key, value in en_to_ru.items()}
+
+
+@pytest.mark.parametrize(
+    ("system_name", "layout_id"),
+    [
+        ("ABC", "EN"),
+        ("U.S.", "EN"),
+        ("Russian - PC", "RUS"),
+        ("RussianWin", "RUS"),
+        ("Ukrainian-PC", "UKR"),
+        ("Byelorussian", "BEL"),
+        ("Белорусская", "BEL"),
+        ("Dvorak", "DVORAK"),
+        ("Colemak", "COLEMAK"),
+        ("German", None),
+    ],
+)
+def test_registry_resolves_system_layout_names(system_name: str, layout_id: str | None) -> None:
+    assert default_registry().resolve_name(system_name) == layout_id
+
+
+@pytest.mark.parametrize(
+    ("text", "from_layout", "to_layout", "expected"),
+    [
+        ("ghbdsn", "EN", "UKR", "привіт"),
+        ("Lpzreq", "EN", "BEL", "Дзякуй"),
+        ("d.nnr", "DVORAK", "EN", "hello"),
+        ("hfiiy", "COLEMAK", "EN", "hello"),
+        ("привіт", "UKR", "RUS", "привыт"),
+    ],
+)
+def test_switch_layout_handles_registered_pairs(text: str, from_layout: str, to_layout: str, expected: str) -> None:
+    assert switch_layout(text, to_layout=to_layout, from_layout=from_layout) == expected
+
+
+def test_switch_layout_rejects_unknown_pair() -> None:
+    with pytest.raises(ValueError, match="unknown layout pair"):
+        switch_layout("hello", to_layout="DE", from_layout="EN")
+
+
+def test_parse_keylayout_reads_base_key_map() -> None:
+    definition = parse_keylayout(KEYLAYOUT)
+
+    assert definition.layout_id == "TEST-CYRILLIC"
+    assert definition.names == ("test cyrillic",)
+    assert definition.keys == {0: "ф", 1: "ы", 12: "й"}
+
+
+def test_keylayout_pairs_with_builtin_layouts(tmp_path) -> None:
+    (tmp_path / "Test.keylayout").write_bytes(KEYLAYOUT)
+
+    registry = LayoutRegistry.load((DEFAULT_LAYOUTS_DIR, tmp_path), cache_dir=None)
+
+    assert registry.resolve_name("Test Cyrillic") == "TEST-CYRILLIC"
+    assert "asq".translate(registry.translation_table("EN", "TEST-CYRILLIC")) == "фый"
+
+
+def test_registry_rejects_malformed_definition(tmp_path) -> None:
+    _write_layout(tmp_path, "short.json", "SHORT", ["short"], "abc")
+
+    registry = LayoutRegistry.load((tmp_path,), cache_dir=None)
+
+    assert registry.layouts == {}
+
+
+def test_compiled_tables_are_cached_by_file_hash(tmp_path, monkeypatch) -> None:
+    layouts_dir = tmp_path / "layouts"
+    layouts_dir.mkdir()
+    cache_dir = tmp_path / "cache"
+    en_keys = "`1234567890-=qwertyuiop[]\\asdfghjkl;'zxcvbnm,./"
+    _write_layout(layouts_dir, "en.json", "EN", ["abc"], en_keys)
+    _write_layout(layouts_dir, "alt.json", "ALT", ["alt"], en_keys.replace("q", "й"))
+
+    first = LayoutRegistry.load((layouts_dir,), cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("layout-tables-*.marshal"))) == 1
+
+    def fail_parse(*args, **kwargs):
+        raise AssertionError("cached registry must not re-parse layout files")
+
+    monkeypatch.setattr(layouts, "load_layout_file", fail_parse)
+    cached = LayoutRegistry.load((layouts_dir,), cache_dir=cache_dir)
+    assert cached.translation_table("EN", "ALT") == first.translation_table("EN", "ALT")
+    assert cached.resolve_name("Alt layout") == "ALT"
+
+    monkeypatch.undo()
+    _write_layout(layouts_dir, "alt.json", "ALT", ["alt"], en_keys.replace("w", "ц"))
+    rebuilt = LayoutRegistry.load((layouts_dir,), cache_dir=cache_dir)
+    assert "qw".translate(rebuilt.translation_table("EN", "ALT")) == "qц"
+    assert len(list(cache_dir.glob("layout-tables-*.marshal"))) == 1
+
+
+def test_library_loads_never_write_a_cache(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    LayoutRegistry.load((DEFAULT_LAYOUTS_DIR,))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_default_cache_dir_follows_the_platform(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(layouts.sys, "platform", "linux")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert default_cache_dir() == tmp_path / "xdg" / "layout-autofix"
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    assert default_cache_dir() == tmp_path / ".cache" / "layout-autofix"
+
+    monkeypatch.setattr(layouts.sys, "platform", "darwin")
+    assert default_cache_dir() == tmp_path / "Library" / "Caches" / "LayoutAutofix"
+
+
+def test_key_positions_cover_ansi_main_block() -> None:
+    assert len(KEY_POSITIONS) == len(set(KEY_POSITIONS)) == 47
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+from layout_autofix.lazy_imports import module_available, optional_module
+
+
+def test_missing_module_is_none_and_cached() -> None:
+    assert optional_module("layout_autofix_no_such_framework") is None
+    assert optional_module("json") is optional_module("json")
+    assert optional_module.cache_info().hits >= 1
+
+
+def test_module_available_does_not_import() -> None:
+    assert module_available("json")
+    assert not module_available("layout_autofix_no_such_framework")
+    assert not module_available("layout_autofix_no_such_package.child")
+
+
+def test_auto_backends_are_chosen_without_importing_frameworks(tmp_path) -> None:
+    for name in ("AppKit", "Foundation"):
+        (tmp_path / f"{name}.py").write_text("raise AssertionError('imported while choosing a backend')\n")
+    script = (
+        "import sys\n"
+        "from layout_autofix.clipboard import create_clipboard_backend\n"
+        "from layout_autofix.layout_source import create_layout_source\n"
+        "clipboard = create_clipboard_backend('auto')\n"
+        "source = create_layout_source('auto')\n"
+        "print(type(clipboard).__name__, type(source).__name__)\n"
+        "print(','.join(name for name in ('AppKit', 'Foundation') if name in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join((str(tmp_path), os.getcwd()))},
+    )
+
+    chosen, imported = (result.stdout.splitlines() + [""])[:2]
+    assert chosen == "PasteboardClipboard InputSourceNotificationLayoutSource"
+    assert imported == ""
+
+
+def test_cli_import_defers_frameworks() -> None:
+    script = (
+        "import sys\n"
+        "import layout_autofix.__main__\n"
+        "from layout_autofix.app import create_fixer\n"
+        "from layout_autofix.clipboard import SubprocessClipboard\n"
+        "from layout_autofix.layout_source import InMemoryLayoutSource\n"
+        "create_fixer('threaded', layout_source=InMemoryLayoutSource('EN'), clipboard=SubprocessClipboard())\n"
+        "heavy = ('asyncio', 'pynput', 'objc', 'AppKit', 'Foundation', 'Quartz', 'HIServices')\n"
+        "print(','.join(name for name in heavy if name in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
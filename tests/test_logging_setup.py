@@ -0,0 +1,94 @@
+import gzip
+import logging
+import queue
+import threading
+
+import pytest
+
+from layout_autofix import logging_setup
+from layout_autofix.logging_setup import (
+    BoundedQueueHandler,
+    RecordBuffer,
+    configure_logging,
+    dropped_log_records,
+    stop_logging,
+)
+
+
+def make_record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.INFO, __file__, 0, message, None, None)
+
+
+def test_records_are_written_by_the_listener_thread(tmp_path) -> None:
+    log_file = tmp_path / "app.log"
+    writers: list[str] = []
+
+    class ThreadRecordingFilter(logging.Filter):
+        def filter(self, record: logging.LogRecord) -> bool:
+            writers.append(threading.current_thread().name)
+            return True
+
+    configure_logging(log_level="DEBUG", log_file=str(log_file), enable_console=False)
+    try:
+        logging_setup._listener.handlers[0].addFilter(ThreadRecordingFilter())
+        logging.getLogger("layout_autofix.test").debug("event=probe value=%s", 42)
+    finally:
+        stop_logging()
+        logging.basicConfig(handlers=[logging.NullHandler()], force=True)
+
+    assert "event=probe value=42" in log_file.read_text(encoding="utf-8")
+    assert writers and threading.current_thread().name not in writers
+
+
+def test_full_queue_drops_and_reports_records() -> None:
+    log_queue: queue.Queue = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue)
+
+    for index in range(5):
+        handler.handle(make_record(f"event=burst index={index}"))
+
+    assert handler.dropped == 3
+    assert log_queue.qsize() == 2
+
+    log_queue.get_nowait()
+    log_queue.get_nowait()
+    handler.handle(make_record("event=after_burst"))
+
+    messages = [log_queue.get_nowait().getMessage() for _ in range(log_queue.qsize())]
+    assert messages == ["event=after_burst", "event=log_records_dropped dropped=3 total_dropped=3"]
+
+
+def test_record_buffer_is_bounded_and_keeps_order() -> None:
+    buffer = RecordBuffer(maxsize=3, linger_seconds=0.01)
+    for index in range(3):
+        buffer.put_nowait(index)
+    with pytest.raises(queue.Full):
+        buffer.put_nowait(3)
+
+    received: list[object] = []
+    reader = threading.Thread(target=lambda: received.extend(buffer.get() for _ in range(4)))
+    reader.start()
+    buffer.put(3)
+    reader.join(1.0)
+
+    assert received == [0, 1, 2, 3]
+    assert buffer.qsize() == 0
+
+
+def test_rotated_logs_are_compressed(tmp_path) -> None:
+    log_file = tmp_path / "app.log"
+    configure_logging(log_level="INFO", log_file=str(log_file), enable_console=False)
+    try:
+        file_handler = logging_setup._listener.handlers[0]
+        logging.getLogger("layout_autofix.test").info("event=before_rollover")
+        logging_setup._listener.stop()
+        file_handler.doRollover()
+    finally:
+        logging_setup._listener = None
+        file_handler.close()
+        logging.basicConfig(handlers=[logging.NullHandler()], force=True)
+
+    with gzip.open(tmp_path / "app.log.1.gz", "rt", encoding="utf-8") as rotated:
+        assert "event=before_rollover" in rotated.read()
+    assert not (tmp_path / "app.log.1").exists()
+    assert dropped_log_records() == 0
@@ -0,0 +1,71 @@
+from layout_autofix.metrics import BUCKET_BOUNDS_SECONDS, ConversionMetrics, LatencyHistogram, format_summary
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_histogram_percentiles_stay_within_bucket_resolution() -> None:
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+
+    assert histogram.count == 1000
+    assert 0.5 <= histogram.percentile(0.50) <= 0.5 * 1.2
+    assert 0.99 <= histogram.percentile(0.99) <= 1.0
+    assert histogram.percentile(1.0) == 1.0
+
+
+def test_histogram_memory_is_fixed() -> None:
+    histogram = LatencyHistogram()
+    for index in range(10_000):
+        histogram.record(index * 1e-4)
+    histogram.record(1e6)
+
+    assert len(histogram.counts) == len(BUCKET_BOUNDS_SECONDS) + 1
+    assert histogram.percentile(1.0) == 1e6
+
+
+def test_time_stage_records_elapsed_clock_time() -> None:
+    clock = FakeClock()
+    metrics = ConversionMetrics(clock=clock)
+
+    with metrics.time_stage("paste_restore"):
+        clock.now += 0.2
+
+    stage = metrics.snapshot()["stages"]["paste_restore"]
+    assert stage["count"] == 1
+    assert abs(stage["mean_ms"] - 200) < 1e-6
+
+
+def test_snapshot_orders_stages_in_pipeline_order() -> None:
+    metrics = ConversionMetrics()
+    metrics.record("total", 0.4)
+    metrics.record("switch_settle", 0.12)
+    metrics.increment("capture_ax")
+
+    snapshot = metrics.snapshot()
+
+    assert list(snapshot["stages"]) == ["switch_settle", "total"]
+    assert snapshot["counters"] == {"capture_ax": 1}
+
+
+def test_format_summary_lists_slowest_stages() -> None:
+    metrics = ConversionMetrics()
+    assert format_summary(metrics.snapshot()) == ["No conversions yet"]
+
+    metrics.record("switch_settle", 0.12)
+    metrics.record("paste_restore", 0.2)
+    metrics.record("total", 0.4)
+    metrics.increment("converted")
+    metrics.increment("capture_clipboard")
+
+    lines = format_summary(metrics.snapshot(), top_stages=1)
+
+    assert lines[0].startswith("Runs: 1 (converted 1)")
+    assert lines[1] == "Time per conversion: paste_restore 200 ms"
+    assert "clipboard 1" in lines[2]
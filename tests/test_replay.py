@@ -0,0 +1,154 @@
+import json
+
+import pytest
+
+from layout_autofix.flight_recorder import FlightRecorder
+from layout_autofix.replay import (
+    TraceSwitch,
+    load_traces,
+    main,
+    parse_option_grid,
+    parse_trace,
+    read_trace,
+    replay,
+)
+from layout_autofix.scheduler import VirtualScheduler
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer
+
+
+def write_trace(path, records) -> None:
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write(json.dumps({"event": "session_trace_started"}) + "\n")
+        for record in records:
+            handle.write(json.dumps(record) + "\n")
+
+
+def test_recorded_session_round_trips_into_switches(tmp_path) -> None:
+    path = tmp_path / "session.jsonl"
+    scheduler = VirtualScheduler(now=100.0)
+    desktop = SimulatedDesktop(
+        clipboard_text="saved",
+        ax_write_supported=False,
+        copy_latency_seconds=0.04,
+        clock=scheduler.monotonic,
+        sleep=scheduler.sleep,
+    )
+    fixer = SimulatedLayoutFixer(
+        desktop,
+        scheduler=scheduler,
+        auto_direction_confidence_threshold=2.0,
+        flight_recorder=FlightRecorder(clock=scheduler.monotonic, trace_path=path),
+    )
+    desktop.select("ghbdtn")
+    fixer.flight_recorder.record("layout_changed", from_layout="EN", to_layout="RUS")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    fixer.flight_recorder.close()
+
+    (switch,) = parse_trace(read_trace(path))
+
+    assert (switch.at, switch.source_layout, switch.target_layout) == (100.0, "EN", "RUS")
+    assert (switch.text_len, switch.ax_read, switch.ax_write) == (6, True, False)
+    assert switch.ax_latency_seconds is not None
+
+
+def test_parse_trace_reads_clipboard_timings() -> None:
+    switches = parse_trace(
+        [
+            {"event": "flight_recorder_dump", "reason": "manual"},
+            {"t": 1.0, "event": "capture_clipboard"},
+            {"t": 5.0, "event": "layout_changed", "from_layout": "RUS", "to_layout": "EN"},
+            {"t": 5.2, "event": "capture_clipboard"},
+            {"t": 5.2, "event": "copy_latency", "ms": 45.0},
+            {"t": 5.2, "event": "selection_captured", "text_len": 11},
+            {"t": 5.3, "event": "replace_clipboard"},
+            {"t": 5.35, "event": "paste_confirmed"},
+            {"t": 5.35, "event": "stage", "stage": "paste_restore", "ms": 60.0},
+            {"t": 9.0, "event": "layout_changed", "from_layout": "EN", "to_layout": "RUS"},
+        ]
+    )
+
+    assert switches == [
+        TraceSwitch(
+            at=5.0,
+            source_layout="RUS",
+            target_layout="EN",
+            text_len=11,
+            ax_read=False,
+            ax_write=False,
+            copy_latency_seconds=0.045,
+            paste_latency_seconds=0.06,
+        ),
+        TraceSwitch(at=9.0, source_layout="EN", target_layout="RUS"),
+    ]
+
+
+def test_replay_converts_each_switch_and_keeps_the_clipboard() -> None:
+    switches = [
+        TraceSwitch(at=0.0, source_layout="EN", target_layout="RUS", text_len=6, ax_read=True, ax_write=True),
+        TraceSwitch(at=5.0, source_layout="RUS", target_layout="EN", text_len=12, copy_latency_seconds=0.1),
+    ]
+
+    result = replay(switches)
+    summary = result.summary()
+
+    assert (result.switches, result.conversions, result.succeeded, result.clipboard_lost) == (2, 2, 2, 0)
+    assert summary["latency_ms"]["count"] == 2
+    assert result.virtual_seconds > 5.0
+
+
+def test_replay_shows_a_copy_timeout_too_short_for_a_slow_app() -> None:
+    switches = [TraceSwitch(at=0.0, source_layout="EN", target_layout="RUS", copy_latency_seconds=0.3)]
+
+    assert replay(switches, selection_copy_wait_timeout_seconds=0.1).succeeded == 0
+    assert replay(switches, selection_copy_wait_timeout_seconds=0.5).succeeded == 1
+
+
+def test_toggle_back_burst_counts_as_one_conversion() -> None:
+    switches = [
+        TraceSwitch(at=0.0, source_layout="EN", target_layout="RUS"),
+        TraceSwitch(at=0.05, source_layout="RUS", target_layout="EN"),
+    ]
+
+    result = replay(switches)
+
+    # Switched back before the settle delay: nothing to convert, text left as typed.
+    assert (result.switches, result.conversions, result.succeeded) == (2, 1, 1)
+
+
+def test_option_grid_is_the_cartesian_product() -> None:
+    grid = parse_option_grid(["layout-switch-settle-delay-seconds=0.05,0.12", "revert_window_seconds=0"])
+
+    assert grid == [
+        {"layout_switch_settle_delay_seconds": 0.05, "revert_window_seconds": 0.0},
+        {"layout_switch_settle_delay_seconds": 0.12, "revert_window_seconds": 0.0},
+    ]
+    assert parse_option_grid([]) == [{}]
+    with pytest.raises(ValueError, match="NAME=VALUE"):
+        parse_option_grid(["clipboard=1"])
+
+
+def test_repeated_traces_are_laid_end_to_end(tmp_path) -> None:
+    path = tmp_path / "session.jsonl"
+    write_trace(
+        path,
+        [
+            {"t": 50.0, "event": "layout_changed", "from_layout": "EN", "to_layout": "RUS"},
+            {"t": 51.0, "event": "layout_changed", "from_layout": "RUS", "to_layout": "EN"},
+        ],
+    )
+
+    assert [switch.at for switch in load_traces([path], repeat=2, gap_seconds=10.0)] == [50.0, 51.0, 61.0, 62.0]
+
+
+def test_cli_prints_one_summary_per_combination(tmp_path, capsys) -> None:
+    path = tmp_path / "session.jsonl"
+    write_trace(path, [{"t": 1.0, "event": "layout_changed", "from_layout": "EN", "to_layout": "RUS"}])
+
+    main([str(path), "--set", "paste_restore_delay_seconds=0.1,0.2", "--repeat", "3"])
+
+    results = json.loads(capsys.readouterr().out)
+    assert [result["options"] for result in results] == [
+        {"paste_restore_delay_seconds": 0.1},
+        {"paste_restore_delay_seconds": 0.2},
+    ]
+    assert all(result["succeeded"] == 3 for result in results)
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from layout_autofix.scheduler import SystemScheduler, VirtualScheduler
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer
+
+
+def test_virtual_wait_runs_due_timers_and_jumps_to_the_deadline() -> None:
+    scheduler = VirtualScheduler(now=10.0)
+    event = threading.Event()
+    fired: list[float] = []
+    scheduler.call_later(0.5, lambda: fired.append(scheduler.monotonic()))
+    scheduler.call_later(2.0, event.set)
+    scheduler.call_later(5.0, lambda: fired.append(scheduler.monotonic()))
+
+    assert not scheduler.wait(event, 1.0)
+    assert (fired, scheduler.monotonic()) == ([10.5], 11.0)
+    assert scheduler.wait(event, 10.0)
+    assert scheduler.monotonic() == 12.0
+    assert scheduler.run_next()
+    assert fired == [10.5, 15.0]
+    assert not scheduler.run_next()
+
+
+def test_system_scheduler_wait_returns_early_when_set() -> None:
+    event = threading.Event()
+    event.set()
+
+    assert SystemScheduler().wait(event, 10.0)
+
+
+def test_fixer_delays_pass_in_virtual_time() -> None:
+    scheduler = VirtualScheduler()
+    desktop = SimulatedDesktop(
+        clipboard_text="saved",
+        ax_read_supported=False,
+        ax_write_supported=False,
+        copy_latency_seconds=0.2,
+        paste_latency_seconds=0.05,
+        clock=scheduler.monotonic,
+        sleep=scheduler.sleep,
+    )
+    fixer = SimulatedLayoutFixer(
+        desktop,
+        scheduler=scheduler,
+        auto_direction_confidence_threshold=2.0,
+        selection_copy_wait_timeout_seconds=0.35,
+        paste_restore_delay_seconds=0.5,
+    )
+    desktop.select("ghbdtn")
+
+    started = time.perf_counter()
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert time.perf_counter() - started < 0.2
+    assert desktop.text == "привет"
+    assert desktop.read_clipboard() == "saved"
+    # The switch settle delay, then a copy that took 0.2 s.
+    assert scheduler.monotonic() >= fixer.layout_switch_settle_delay_seconds + 0.2
+
+
+def test_revert_window_runs_on_the_scheduler_clock() -> None:
+    scheduler = VirtualScheduler()
+    desktop = SimulatedDesktop(clock=scheduler.monotonic, sleep=scheduler.sleep)
+    fixer = SimulatedLayoutFixer(desktop, scheduler=scheduler, auto_direction_confidence_threshold=2.0)
+    desktop.select("ghbdtn", prefix="> ")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    scheduler.sleep(fixer.revert_window_seconds + 1)
+    fixer._convert_selected_text_after_switch("EN", source_layout="RUS")
+
+    assert fixer.metrics.counter("reverted") == 0
+    assert desktop.text == "> привет"
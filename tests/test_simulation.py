@@ -0,0 +1,228 @@
+import time
+
+from layout_autofix.keystrokes import KeystrokeRecorder
+from layout_autofix.scheduler import VirtualScheduler
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_fixer(desktop: SimulatedDesktop, **options) -> SimulatedLayoutFixer:
+    return SimulatedLayoutFixer(
+        desktop,
+        **options,
+        settle_delay_seconds=0,
+        layout_switch_settle_delay_seconds=0,
+        selection_copy_wait_timeout_seconds=1.0,
+        selection_copy_poll_interval_seconds=0.001,
+        paste_restore_delay_seconds=0.05,
+        auto_direction_confidence_threshold=2.0,
+    )
+
+
+def test_desktop_applies_copy_after_latency() -> None:
+    clock = FakeClock()
+    desktop = SimulatedDesktop(clipboard_text="old", copy_latency_seconds=0.01, clock=clock)
+    desktop.select("ghbdtn")
+
+    desktop.press_shortcut("c")
+    assert desktop.read_clipboard() == "old"
+
+    clock.now = 0.01
+    assert desktop.read_clipboard() == "ghbdtn"
+    assert desktop.read_change_count() == 1
+
+
+def test_desktop_paste_reads_clipboard_when_processed() -> None:
+    clock = FakeClock()
+    desktop = SimulatedDesktop(paste_latency_seconds=0.05, clock=clock)
+    desktop.select("ghbdtn", prefix="> ")
+    desktop.write_clipboard("привет")
+
+    desktop.press_shortcut("v")
+    desktop.write_clipboard("restored too early")
+    clock.now = 0.05
+    desktop.settle()
+
+    assert desktop.text == "> restored too early"
+    assert desktop.replaced_at == 0.05
+
+
+def test_simulated_fixer_converts_via_ax() -> None:
+    desktop = SimulatedDesktop(clipboard_text="keep")
+    desktop.select("ghbdtn", prefix="> ")
+
+    make_fixer(desktop)._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert desktop.text == "> привет"
+    assert desktop.shortcuts == []
+    assert desktop.read_clipboard() == "keep"
+
+
+def test_simulated_fixer_converts_via_clipboard_and_restores_it() -> None:
+    desktop = SimulatedDesktop(
+        clipboard_text="keep",
+        ax_read_supported=False,
+        ax_write_supported=False,
+        copy_latency_seconds=0.005,
+        paste_latency_seconds=0.01,
+    )
+    desktop.select("ghbdtn", prefix="> ")
+
+    make_fixer(desktop)._convert_selected_text_after_switch("RUS", source_layout="EN")
+    desktop.settle()
+
+    assert desktop.text == "> привет"
+    assert desktop.shortcuts == ["c", "v"]
+    assert desktop.read_clipboard() == "keep"
+
+
+def test_without_clipboard_capture_an_unreadable_selection_is_left_alone() -> None:
+    desktop = SimulatedDesktop(clipboard_text="keep", ax_read_supported=False)
+    desktop.select("ghbdtn", prefix="> ")
+    fixer = make_fixer(desktop, clipboard_capture=False)
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert desktop.text == "> ghbdtn"
+    assert desktop.shortcuts == []
+    assert fixer.metrics.counter("capture_failed") == 1
+
+
+def test_switching_back_restores_original_without_capture() -> None:
+    desktop = SimulatedDesktop(clipboard_text="keep")
+    desktop.select("ghbdtn", prefix="> ", suffix=" <")
+    fixer = make_fixer(desktop)
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    reads = fixer.accessibility.calls["selected_text"]
+
+    fixer._convert_selected_text_after_switch("EN", source_layout="RUS")
+
+    assert desktop.text == "> ghbdtn <"
+    # Only the caret check and the reselected text are read; nothing is copied.
+    assert fixer.accessibility.calls["selected_text"] == reads + 2
+    assert desktop.shortcuts == []
+    assert fixer.metrics.counter("reverted") == 1
+    # Only the first conversion sat out the switch settle.
+    assert fixer.metrics.snapshot()["stages"]["switch_settle"]["count"] == 1
+
+    # Switching forward again re-applies the conversion the same way.
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    assert desktop.text == "> привет <"
+    assert fixer.metrics.counter("reverted") == 2
+
+
+def test_revert_without_accessibility_writes_reselects_with_keystrokes() -> None:
+    desktop = SimulatedDesktop(
+        clipboard_text="keep",
+        ax_write_supported=False,
+        copy_latency_seconds=0.005,
+        paste_latency_seconds=0.01,
+    )
+    desktop.select("ghbdtn", prefix="> ")
+    fixer = make_fixer(desktop)
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    fixer._convert_selected_text_after_switch("EN", source_layout="RUS")
+    desktop.settle()
+
+    assert desktop.text == "> ghbdtn"
+    assert desktop.shortcuts == ["v", "shift+left*6", "v"]
+    assert desktop.read_clipboard() == "keep"
+
+
+def test_new_selection_or_moved_caret_is_not_reverted() -> None:
+    desktop = SimulatedDesktop()
+    fixer = make_fixer(desktop)
+
+    desktop.select("ghbdtn", prefix="> ")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    desktop.select("руддщ", prefix="> ")
+    fixer._convert_selected_text_after_switch("EN", source_layout="RUS")
+    assert desktop.text == "> hello"
+
+    # The caret moved away from the converted text without selecting anything.
+    desktop.select("", prefix="> hello world")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    assert desktop.text == "> hello world"
+    assert (desktop.selection_start, desktop.selection_length) == (len("> hello world"), 0)
+    assert fixer.metrics.counter("reverted") == 0
+
+
+def test_revert_needs_same_focus_and_window() -> None:
+    scheduler = VirtualScheduler()
+    desktop = SimulatedDesktop()
+    fixer = make_fixer(desktop, scheduler=scheduler)
+
+    desktop.select("ghbdtn")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    desktop.move_focus("search")
+    desktop.select("руддщ")
+    fixer._convert_selected_text_after_switch("EN", source_layout="RUS")
+    assert desktop.text == "hello"
+
+    scheduler.sleep(fixer.revert_window_seconds + 1)
+    desktop.select("ghbdtn")
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+    assert desktop.text == "привет"
+    assert fixer.metrics.counter("reverted") == 0
+
+
+def test_paste_restore_delay_is_only_an_upper_bound() -> None:
+    desktop = SimulatedDesktop(clipboard_text="keep", ax_write_supported=False, paste_latency_seconds=0.02)
+    desktop.select("ghbdtn", prefix="> ")
+    fixer = make_fixer(desktop)
+    fixer.paste_restore_delay_seconds = 2.0
+
+    started = time.monotonic()
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert time.monotonic() - started < 1.0
+    assert desktop.text == "> привет"
+    assert desktop.read_clipboard() == "keep"
+    assert fixer.metrics.counter("paste_confirmed") == 1
+
+
+def type_into(desktop: SimulatedDesktop, recorder: KeystrokeRecorder, text: str) -> None:
+    for char in text:
+        desktop.type_text(char)
+        recorder.key_pressed("space" if char == " " else char)
+
+
+def test_last_typed_word_is_retyped_without_the_clipboard() -> None:
+    desktop = SimulatedDesktop(clipboard_text="keep", ax_read_supported=False, ax_write_supported=False)
+    recorder = KeystrokeRecorder(secure_input=lambda: False)
+    fixer = make_fixer(desktop, keystroke_recorder=recorder)
+    desktop.type_text("> ")
+    type_into(desktop, recorder, "ghbdtn ")
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert desktop.text == "> привет "
+    assert desktop.shortcuts == ["backspace*7"]
+    assert desktop.read_change_count() == 0
+    assert fixer.metrics.counter("retyped") == 1
+
+    # The buffer follows the retyped word, so switching back converts it back.
+    fixer._convert_selected_text_after_switch("EN", source_layout="RUS")
+    assert desktop.text == "> ghbdtn "
+    assert desktop.read_change_count() == 0
+
+
+def test_typed_word_in_a_secure_field_is_dropped() -> None:
+    desktop = SimulatedDesktop(secure_field=True)
+    recorder = KeystrokeRecorder(secure_input=lambda: False)
+    fixer = make_fixer(desktop, keystroke_recorder=recorder)
+    type_into(desktop, recorder, "ghbdtn")
+
+    fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    assert desktop.text == "ghbdtn"
+    assert len(recorder.buffer) == 0
+    assert fixer.metrics.counter("typed_word_secure") == 1
@@ -0,0 +1,29 @@
+from layout_autofix import state_files
+from layout_autofix.state_files import default_log_dir, default_state_dir, read_state, write_state
+
+
+def test_default_dirs_follow_the_platform(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("XDG_STATE_HOME", raising=False)
+    monkeypatch.delenv("XDG_DATA_HOME", raising=False)
+    monkeypatch.setattr(state_files.sys, "platform", "linux")
+    assert default_state_dir() == tmp_path / ".local" / "state" / "layout-autofix"
+    assert default_log_dir() == default_state_dir()
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    assert default_state_dir() == tmp_path / "data" / "layout-autofix"
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    assert default_log_dir() == tmp_path / "state" / "layout-autofix"
+
+    monkeypatch.setattr(state_files.sys, "platform", "darwin")
+    assert default_state_dir() == tmp_path / "Library" / "Application Support" / "LayoutAutofix"
+    assert default_log_dir() == tmp_path / "Library" / "Logs" / "LayoutAutofix"
+
+
+def test_state_round_trips_and_ignores_other_versions(tmp_path) -> None:
+    path = tmp_path / "state" / "profiles.json"
+
+    assert write_state(path, 2, {"app": 1})
+    assert read_state(path, 2) == {"app": 1}
+    assert read_state(path, 1) is None
+    path.write_text("{not json", encoding="utf-8")
+    assert read_state(path, 2) is None
@@ -0,0 +1,134 @@
+from pathlib import Path
+
+from layout_autofix.timing_profiles import (
+    MIN_COPY_WAIT_TIMEOUT_SECONDS,
+    TimingDelays,
+    TimingProfileStore,
+)
+
+BOUNDS = TimingDelays(
+    settle_seconds=0.02,
+    layout_switch_settle_seconds=0.12,
+    copy_wait_timeout_seconds=0.35,
+    paste_restore_seconds=0.2,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_store(tmp_path: Path, clock: FakeClock) -> TimingProfileStore:
+    return TimingProfileStore(path=tmp_path / "profiles.json", clock=clock)
+
+
+def test_unknown_and_young_profiles_use_configured_delays(tmp_path: Path) -> None:
+    store = make_store(tmp_path, FakeClock())
+    assert store.delays_for(None, BOUNDS) == BOUNDS
+    assert store.delays_for("com.apple.TextEdit", BOUNDS) == BOUNDS
+
+    store.record_copy_latency("com.apple.TextEdit", 0.01)
+    store.record_copy_latency("com.apple.TextEdit", 0.01)
+
+    assert store.delays_for("com.apple.TextEdit", BOUNDS) == BOUNDS
+
+
+def test_fast_app_gets_shorter_measured_delays_within_bounds(tmp_path: Path) -> None:
+    store = make_store(tmp_path, FakeClock())
+    for _ in range(10):
+        store.record_copy_latency("com.apple.TextEdit", 0.01)
+        store.record_paste_latency("com.apple.TextEdit", 0.01)
+
+    delays = store.delays_for("com.apple.TextEdit", BOUNDS)
+
+    assert delays.paste_restore_seconds < BOUNDS.paste_restore_seconds / 2
+    assert delays.copy_wait_timeout_seconds == MIN_COPY_WAIT_TIMEOUT_SECONDS
+    assert delays.settle_seconds <= BOUNDS.settle_seconds
+    # Nothing measures how long the layout hotkey's modifiers stay down.
+    assert delays.layout_switch_settle_seconds == BOUNDS.layout_switch_settle_seconds
+
+
+def test_copy_latency_alone_never_shortens_the_paste_restore(tmp_path: Path) -> None:
+    store = make_store(tmp_path, FakeClock())
+    for _ in range(10):
+        store.record_copy_latency("com.example.unobservable", 0.01)
+
+    delays = store.delays_for("com.example.unobservable", BOUNDS)
+
+    assert delays.copy_wait_timeout_seconds < BOUNDS.copy_wait_timeout_seconds
+    assert delays.paste_restore_seconds == BOUNDS.paste_restore_seconds
+    assert delays.layout_switch_settle_seconds == BOUNDS.layout_switch_settle_seconds
+
+
+def test_slow_app_keeps_configured_delays(tmp_path: Path) -> None:
+    store = make_store(tmp_path, FakeClock())
+    for latency in (0.25, 0.3, 0.28, 0.4):
+        store.record_copy_latency("com.tinyspeck.slackmacgap", latency)
+
+    assert store.delays_for("com.tinyspeck.slackmacgap", BOUNDS) == BOUNDS
+
+
+def test_jittery_app_keeps_more_room_than_steady_one(tmp_path: Path) -> None:
+    store = make_store(tmp_path, FakeClock())
+    for latency in (0.02, 0.02, 0.02, 0.02):
+        store.record_paste_latency("steady", latency)
+    for latency in (0.005, 0.035, 0.005, 0.035):
+        store.record_paste_latency("jittery", latency)
+
+    steady = store.delays_for("steady", BOUNDS)
+    jittery = store.delays_for("jittery", BOUNDS)
+
+    assert jittery.paste_restore_seconds > steady.paste_restore_seconds
+
+
+def test_profiles_decay_back_to_configured_delays(tmp_path: Path) -> None:
+    clock = FakeClock()
+    store = make_store(tmp_path, clock)
+    for _ in range(10):
+        store.record_paste_latency("app", 0.01)
+    fresh = store.delays_for("app", BOUNDS)
+
+    clock.now += store.half_life_seconds
+    half = store.delays_for("app", BOUNDS)
+    clock.now += 20 * store.half_life_seconds
+    stale = store.delays_for("app", BOUNDS)
+
+    assert fresh.paste_restore_seconds < half.paste_restore_seconds < BOUNDS.paste_restore_seconds
+    assert abs(stale.paste_restore_seconds - BOUNDS.paste_restore_seconds) < 1e-6
+
+
+def test_profiles_persist_across_instances(tmp_path: Path) -> None:
+    clock = FakeClock()
+    store = make_store(tmp_path, clock)
+    for _ in range(5):
+        store.record_copy_latency("app", 0.01)
+    for _ in range(3):
+        store.record_paste_latency("app", 0.02)
+    store.save()
+    store.save(force=True)
+
+    reloaded = make_store(tmp_path, clock)
+
+    assert reloaded.profile("app") == store.profile("app")
+    assert reloaded.delays_for("app", BOUNDS) == store.delays_for("app", BOUNDS)
+
+
+def test_corrupt_profiles_file_is_ignored(tmp_path: Path) -> None:
+    (tmp_path / "profiles.json").write_text("{not json", encoding="utf-8")
+
+    assert make_store(tmp_path, FakeClock()).delays_for("app", BOUNDS) == BOUNDS
+
+
+def test_store_keeps_a_bounded_number_of_apps(tmp_path: Path) -> None:
+    clock = FakeClock()
+    store = TimingProfileStore(path=None, clock=clock, max_profiles=2)
+    for app_id in ("first", "second", "third"):
+        clock.now += 1
+        store.record_copy_latency(app_id, 0.01)
+
+    assert store.profile("first") is None
+    assert store.profile("third") is not None
@@ -0,0 +1,89 @@
+import logging
+
+import pytest
+
+from layout_autofix.simulation import SimulatedDesktop, SimulatedLayoutFixer
+from layout_autofix.tracing import TextPreview, TraceRateLimitFilter, resolve_trace_level
+
+
+class SliceCountingText(str):
+    slices = 0
+
+    def __getitem__(self, key):
+        SliceCountingText.slices += 1
+        return str.__getitem__(self, key)
+
+    def replace(self, *args):
+        raise AssertionError("the full text must not be scanned")
+
+
+def make_record(message: str, *args, level: int = logging.DEBUG) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 0, message, args, None)
+
+
+def test_preview_matches_eager_truncation() -> None:
+    for text, limit in (("short", 10), ("a\nb", 10), ("x" * 20, 10), ("\n" * 8, 10), ("abc\n" * 3, 12)):
+        compact = text.replace("\n", "\\n")
+        expected = compact if len(compact) <= limit else compact[:limit] + "..."
+        assert str(TextPreview(text, limit=limit)) == expected
+        assert repr(TextPreview(text, limit=limit)) == repr(expected)
+
+
+def test_preview_only_touches_the_first_limit_characters() -> None:
+    text = SliceCountingText("ghbdtn\n" * 1_000_000)
+    preview = TextPreview(text, limit=12)
+    assert SliceCountingText.slices == 0
+
+    assert str(preview) == "ghbdtn\\nghbd..."
+    assert SliceCountingText.slices == 1
+
+
+def test_hidden_preview_reports_only_the_length() -> None:
+    assert repr(TextPreview("secret", visible=False)) == "<6 chars>"
+
+
+def test_rate_limit_suppresses_and_reports_per_call_site() -> None:
+    now = [0.0]
+    limiter = TraceRateLimitFilter(events_per_second=2, clock=lambda: now[0])
+
+    chatty = [limiter.filter(make_record("event=clipboard_read_ok text_len=%s", index)) for index in range(5)]
+    assert chatty == [True, True, False, False, False]
+    assert limiter.filter(make_record("event=send_shortcut key=%s", "v"))
+    assert limiter.filter(make_record("event=chatty_warning", level=logging.WARNING))
+
+    now[0] = 1.0
+    record = make_record("event=clipboard_read_ok text_len=%s", 6)
+    assert limiter.filter(record)
+    assert record.getMessage() == "event=clipboard_read_ok text_len=6 trace_suppressed=3"
+
+
+def test_trace_level_resolution() -> None:
+    assert resolve_trace_level(None, debug_events=None) == "off"
+    assert resolve_trace_level(None, debug_events=None, default="stages") == "stages"
+    assert resolve_trace_level(None, debug_events=True, default="stages") == "payload"
+    assert resolve_trace_level(None, debug_events=False, default="stages") == "off"
+    assert resolve_trace_level("stages", debug_events=True) == "stages"
+    with pytest.raises(ValueError, match="trace level must be one of"):
+        resolve_trace_level("verbose", debug_events=None)
+
+
+def test_stages_tier_logs_events_without_text(caplog) -> None:
+    desktop = SimulatedDesktop(clipboard_text="secret clipboard", ax_read_supported=False, ax_write_supported=False)
+    fixer = SimulatedLayoutFixer(
+        desktop,
+        settle_delay_seconds=0,
+        layout_switch_settle_delay_seconds=0,
+        paste_restore_delay_seconds=0,
+        auto_direction_confidence_threshold=2.0,
+        trace_level="stages",
+    )
+    desktop.select("ghbdtn")
+
+    with caplog.at_level(logging.DEBUG, logger="layout_autofix.app"):
+        fixer._convert_selected_text_after_switch("RUS", source_layout="EN")
+
+    debug_lines = "\n".join(record.getMessage() for record in caplog.records if record.levelno == logging.DEBUG)
+    assert fixer.debug_event_logging
+    assert "event=clipboard_restored success=True items=1 types=1 bytes=16" in debug_lines
+    for text in ("ghbdtn", "привет", "secret clipboard"):
+        assert text not in debug_lines
@@ -0,0 +1,155 @@
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from layout_autofix.accessibility import AX_ERROR_ATTRIBUTE_UNSUPPORTED, AX_ERROR_SUCCESS, AXSession
+from layout_autofix.x11 import (
+    X11Clipboard,
+    X11PrimarySelection,
+    X11SelectionConnection,
+    XkbLayoutSource,
+    _libx11,
+    parse_rules_names,
+    xkb_layout_id,
+)
+
+
+class FakeSelections:
+    # Client IDs live in the high bits, as with resource_id_mask 0x1fffff.
+    def __init__(self, owner: int | None, text: str | None) -> None:
+        self.primary_owner = owner
+        self.text = text
+        self.reads = 0
+
+    def start(self) -> bool:
+        return True
+
+    def focused_window(self) -> int | None:
+        return 0x0400_0007
+
+    def owner(self, selection: str) -> int | None:
+        return self.primary_owner
+
+    def same_client(self, first: int, second: int) -> bool:
+        return first >> 21 == second >> 21
+
+    def read_text(self, selection: str) -> str | None:
+        self.reads += 1
+        return self.text
+
+
+@pytest.fixture
+def x_display():
+    pytest.importorskip("Xlib.display")
+    if _libx11() is None:
+        pytest.skip("needs libX11")
+    if os.environ.get("DISPLAY"):
+        yield os.environ["DISPLAY"]
+        return
+    if shutil.which("Xvfb") is None:
+        pytest.skip("needs an X server or Xvfb")
+    display = ":97"
+    server = subprocess.Popen(["Xvfb", display, "-nolisten", "tcp"], stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 5.0
+        while not os.path.exists(f"/tmp/.X11-unix/X{display[1:]}"):
+            if time.monotonic() > deadline:
+                pytest.skip("Xvfb did not start")
+            time.sleep(0.05)
+        yield display
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def wait_until(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_rules_names_give_one_layout_per_group() -> None:
+    groups = parse_rules_names(b"evdev\0pc105\0us,ru,us\0,,dvorak\0grp:alt_shift_toggle\0")
+
+    assert groups == [("us", ""), ("ru", ""), ("us", "dvorak")]
+    assert [xkb_layout_id(*group) for group in groups] == ["EN", "RUS", "DVORAK"]
+    assert parse_rules_names(b"") == []
+
+
+def test_letter_moving_variants_of_cyrillic_layouts_are_unknown() -> None:
+    assert xkb_layout_id("ua") == "UKR"
+    assert xkb_layout_id("us", "intl") == "EN"
+    assert xkb_layout_id("ru", "phonetic") is None
+    assert xkb_layout_id("de") is None
+
+
+def test_primary_selection_of_the_focused_client_is_read() -> None:
+    selections = FakeSelections(owner=0x0400_0001, text="ghbdtn")
+    session = AXSession(X11PrimarySelection(connection=selections))
+
+    assert session.read_selected_text() == "ghbdtn"
+    # Nothing can be written into another client's text: the clipboard paste takes over.
+    assert not session.replace_selected_text("привет")
+    assert session.backend.select_before_caret(0x0400_0007, 6) == AX_ERROR_ATTRIBUTE_UNSUPPORTED
+
+
+def test_primary_selection_left_in_another_client_reads_as_empty() -> None:
+    selections = FakeSelections(owner=0x0600_0001, text="stale")
+    backend = X11PrimarySelection(connection=selections)
+
+    assert backend.selected_text(0x0400_0007) == (AX_ERROR_SUCCESS, "")
+    assert selections.reads == 0
+    selections.primary_owner = None
+    assert backend.selected_text(0x0400_0007) == (AX_ERROR_SUCCESS, "")
+
+
+def test_clipboard_is_served_from_this_process(x_display) -> None:
+    writer = X11Clipboard(connection=X11SelectionConnection(display_name=x_display))
+    reader = X11Clipboard(connection=X11SelectionConnection(display_name=x_display))
+    assert writer.write_text("keep")
+    before = reader.change_count()
+    snapshot = reader.snapshot()
+
+    assert writer.write_text("привет")
+    assert reader.read_text() == "привет"
+    assert before is None or wait_until(lambda: reader.change_count() != before)
+    assert reader.restore(snapshot)
+    assert writer.read_text() == "keep"
+
+
+def test_primary_selection_is_read_without_a_copy_shortcut(x_display) -> None:
+    owner = X11SelectionConnection(display_name=x_display)
+    assert owner.start()
+    assert owner.own("PRIMARY", owner.text_targets("ghbdtn"))
+    backend = X11PrimarySelection(connection=X11SelectionConnection(display_name=x_display))
+
+    assert backend.selected_text(owner._window.id) == (AX_ERROR_SUCCESS, "ghbdtn")
+    assert backend.selected_text(backend.connection._window.id) == (AX_ERROR_SUCCESS, "")
+
+
+def test_xkb_group_changes_are_pushed(x_display) -> None:
+    if shutil.which("setxkbmap") is None:
+        pytest.skip("needs setxkbmap")
+    subprocess.run(["setxkbmap", "-display", x_display, "us,ru"], check=True)
+    source = XkbLayoutSource(display_name=x_display)
+    source.start()
+    library = _libx11()
+    switcher = library.XOpenDisplay(x_display.encode())
+    try:
+        assert source.current_layout() == "EN"
+
+        library.XkbLockGroup(switcher, 0x0100, 1)
+        library.XFlush(switcher)
+
+        assert source.wait_for_change(2.0)
+        assert source.current_layout() == "RUS"
+    finally:
+        library.XkbLockGroup(switcher, 0x0100, 0)
+        library.XCloseDisplay(switcher)
+        source.stop()